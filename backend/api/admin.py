@@ -1,6 +1,57 @@
 from django.contrib import admin
-from .models import Cliente, Articulo
+from django.db import transaction
+from .models import Cliente, Articulo, Importacion, UsuarioCliente
+from .cache import invalidar_catalogo
+from .cambios import eliminar_articulos
+from .precios import fila_historial, registrar_precios
 
 # Register your models here.
-admin.site.register(Cliente)
-admin.site.register(Articulo)
+@admin.register(Cliente)
+class ClienteAdmin(admin.ModelAdmin):
+    # Como en ClienteViewSet, los articulos se borran con su marca de baja antes que el cliente
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            eliminar_articulos(obj.articulos.all())
+            super().delete_model(request, obj)
+        invalidar_catalogo(obj.pk)
+
+    def delete_queryset(self, request, queryset):
+        cliente_ids = list(queryset.values_list('pk', flat=True))
+        with transaction.atomic():
+            eliminar_articulos(Articulo.objects.filter(cliente_id__in=cliente_ids))
+            super().delete_queryset(request, queryset)
+        invalidar_catalogo(*cliente_ids)
+admin.site.register(Importacion)
+
+@admin.register(UsuarioCliente)
+class UsuarioClienteAdmin(admin.ModelAdmin):
+    list_display = ('usuario', 'cliente')
+    list_select_related = ('usuario', 'cliente')
+
+@admin.register(Articulo)
+class ArticuloAdmin(admin.ModelAdmin):
+    list_display = ('codigo', 'descripcion', 'precio', 'cliente')
+    list_filter = ('cliente',)
+    search_fields = ('codigo', 'descripcion')
+    # El listado muestra el nombre del cliente, lo traemos con un JOIN en lugar de una consulta por fila
+    list_select_related = ('cliente',)
+
+    # Las ediciones desde el admin tambien invalidan las respuestas cacheadas del catalogo y registran
+    # los cambios de precio en el historial
+    def save_model(self, request, obj, form, change):
+        cliente_anterior = form.initial.get('cliente')
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if not change or {'cliente', 'codigo', 'precio'} & set(form.changed_data):
+                registrar_precios([fila_historial(obj)])
+        invalidar_catalogo(*filter(None, [cliente_anterior, obj.cliente_id]))
+
+    # Las bajas pasan por `eliminar_articulos`, que deja las marcas para el feed de cambios
+    def delete_model(self, request, obj):
+        eliminar_articulos(Articulo.objects.filter(pk=obj.pk))
+        invalidar_catalogo(obj.cliente_id)
+
+    def delete_queryset(self, request, queryset):
+        cliente_ids = set(queryset.values_list('cliente_id', flat=True))
+        eliminar_articulos(queryset)
+        invalidar_catalogo(*cliente_ids)
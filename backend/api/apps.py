@@ -4,3 +4,18 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from .cambios import crear_secuencia
+        from .clientes import invalidar_clientes
+        from .metrics import instalar_medicion
+        from .models import Cliente, UsuarioCliente
+
+        connection_created.connect(instalar_medicion)
+        for modelo in (Cliente, UsuarioCliente):
+            post_save.connect(invalidar_clientes, sender=modelo)
+            post_delete.connect(invalidar_clientes, sender=modelo)
+        post_save.connect(crear_secuencia, sender=Cliente)
@@ -0,0 +1,116 @@
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.request import Request
+
+from .clientes import acliente_asignado, acliente_de
+from .cache import acachear_contenido, clave_respuesta, etag, etag_coincide, version_catalogo
+from .exporters import EXPORTADORES, FormatoNoDisponible, exportar_csv_async, exportar_en_hilo
+from .filters import filtrar_articulos
+from .metrics import cronometrar
+from .models import Articulo
+from .pagination import ArticuloCursorPagination
+from .serializers import ArticuloListadoSerializer, campos_solicitados
+
+# Vistas async para servidores ASGI (uvicorn, daphne). Usan el ORM async y la descarga se envia con un
+# generador async, asi una descarga larga no ocupa un hilo del servidor mientras se envia
+
+class ArticuloListAsyncView(View):
+    """
+    Listado de articulos con los mismos filtros, ?fields= y paginacion por cursor que /api/v1/articulos/
+    (`{"next", "results"}`). La cantidad total de articulos que cumplen los filtros va en el header
+    `X-Total-Count`.
+    """
+    async def get(self, request, *args, **kwargs):
+        try:
+            cliente = await acliente_asignado(request)
+            articulos = filtrar_articulos(Articulo.objects.all(), request.GET)
+        except ValidationError as e:
+            return JsonResponse(e.detail, status=400)
+        except APIException as e:
+            return JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+        # Los usuarios con cliente solo ven sus articulos, igual que en ArticuloViewSet
+        if cliente is not None:
+            articulos = articulos.filter(cliente=cliente)
+
+        cliente_id = cliente.pk if cliente is not None else request.GET.get('cliente')
+        clave = clave_respuesta('lista-async', cliente_id, await sync_to_async(version_catalogo)(cliente_id), request)
+        valor_etag = etag(clave)
+        if etag_coincide(request, valor_etag):
+            return HttpResponseNotModified(headers={'ETag': valor_etag})
+
+        # El total se guarda junto con la pagina: una respuesta de la cache trae el mismo header
+        cacheado = await cache.aget(clave)
+        if cacheado is not None:
+            contenido, total = cacheado
+        else:
+            serializer = ArticuloListadoSerializer(campos_solicitados(request))
+            paginador = ArticuloCursorPagination()
+            try:
+                pagina = await paginador.apaginate_queryset(articulos.values_list(*serializer.columnas), Request(request))
+            except NotFound as e:
+                return JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+            total = await articulos.acount()
+            contenido = orjson.dumps({'next': paginador.get_next_link(), 'results': serializer.representar(pagina)})
+            await cache.aset(clave, (contenido, total), settings.CATALOGO_CACHE_TIMEOUT)
+
+        response = HttpResponse(contenido, content_type='application/json')
+        response['X-Total-Count'] = total
+        response['ETag'] = valor_etag
+        return response
+
+
+class DownloadAsyncView(View):
+    """
+    Descarga de articulos (?format=xlsx|csv|parquet|arrow) equivalente a /api/v1/download/.
+
+    El CSV se arma directamente en el event loop con `aiterator`. Los demas formatos son CPU intensivos:
+    se arman en el pool acotado de `exportar_en_hilo` (settings.EXPORTACION_HILOS) y sus bloques se envian
+    desde el event loop, que mientras tanto sigue atendiendo otros requests.
+    """
+    async def get(self, request, *args, **kwargs):
+        # El cliente del usuario del token, igual que DownloadExcelView
+        try:
+            cliente = await acliente_de(request)
+        except APIException as e:
+            return JsonResponse({'detail': str(e.detail)}, status=e.status_code)
+        if not cliente:
+            return JsonResponse({"error": "No se encontró ningún cliente"}, status=400)
+
+        formato = request.GET.get('format', 'xlsx')
+        if formato not in EXPORTADORES:
+            return JsonResponse({"error": f"Formato no soportado: {formato}"}, status=400)
+
+        clave = clave_respuesta('descarga-async', cliente.pk, await sync_to_async(version_catalogo)(cliente.pk), request)
+        valor_etag = etag(clave)
+        if etag_coincide(request, valor_etag):
+            return HttpResponseNotModified(headers={'ETag': valor_etag})
+
+        exportar, content_type = EXPORTADORES[formato]
+        contenido = await cache.aget(clave)
+        if contenido is not None:
+            response = HttpResponse(contenido, content_type=content_type)
+        else:
+            articulos = Articulo.objects.filter(cliente=cliente).order_by('id')
+            total = await articulos.acount()
+            if not total:
+                return JsonResponse({"error": "No se encontraron artículos para el cliente"}, status=400)
+
+            if formato == 'csv':
+                bloques = exportar_csv_async(articulos)
+            else:
+                try:
+                    bloques = exportar_en_hilo(cronometrar('render', exportar(articulos)))
+                except FormatoNoDisponible as e:
+                    return JsonResponse({"error": str(e)}, status=400)
+
+            response = StreamingHttpResponse(acachear_contenido(bloques, clave), content_type=content_type)
+            response['X-Total-Count'] = total
+
+        response['Content-Disposition'] = f'attachment; filename="articulos_{cliente.nombre}.{formato}"'
+        response['ETag'] = valor_etag
+        return response
@@ -0,0 +1,102 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.http import parse_etags, quote_etag
+
+# Version del catalogo completo, cambia con cualquier escritura de cualquier cliente
+TODOS = 'todos'
+
+
+def _clave_version(alcance):
+    return f'catalogo:version:{alcance}'
+
+
+def version_catalogo(cliente_id=None):
+    """
+    Devuelve la version actual del catalogo de un cliente (o de todos si no se indica cliente).
+
+    Si la version no esta en la cache (primer uso o expulsada), se inicializa con un valor al azar para que
+    no pueda coincidir con una version usada antes y servir respuestas viejas.
+    """
+    clave = _clave_version(cliente_id or TODOS)
+    version = cache.get(clave)
+    if version is None:
+        cache.add(clave, uuid.uuid4().hex, timeout=None)
+        version = cache.get(clave)
+    return version
+
+
+def invalidar_catalogo(*cliente_ids):
+    """
+    Cambia la version del catalogo de los clientes indicados (y la global), con lo que todas las respuestas
+    cacheadas de esos catalogos dejan de usarse.
+
+    Se escribe un valor nuevo al azar en lugar de incrementar el anterior: `incr` de la cache en archivos
+    lee y reescribe sin bloqueo, y dos invalidaciones simultaneas podian dejar el mismo valor que una
+    lectura ya habia usado para cachear una respuesta vieja. Un `set` incondicional siempre deja una version
+    que nadie uso.
+    """
+    for alcance in {*cliente_ids, TODOS}:
+        cache.set(_clave_version(alcance), uuid.uuid4().hex, timeout=None)
+
+
+def clave_respuesta(prefijo, cliente_id, version, request):
+    """
+    Clave de cache (y ETag) de una respuesta: catalogo, version y la URL completa con sus parametros.
+    """
+    url = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    return f'catalogo:{prefijo}:{cliente_id or TODOS}:{version}:{url}'
+
+
+def etag(clave):
+    return quote_etag(hashlib.md5(clave.encode('utf-8')).hexdigest())
+
+
+def etag_coincide(request, valor):
+    etags = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in etags or valor in etags
+
+
+def cachear_contenido(contenido, clave):
+    """
+    Deja pasar los bloques de una respuesta en streaming y, si el total no supera
+    `CATALOGO_CACHE_MAX_BYTES`, los guarda en la cache al terminar.
+    """
+    limite = settings.CATALOGO_CACHE_MAX_BYTES
+    bloques, total = [], 0
+    for bloque in contenido:
+        if isinstance(bloque, str):
+            bloque = bloque.encode('utf-8')
+        if bloques is not None:
+            total += len(bloque)
+            if total > limite:
+                bloques = None
+            else:
+                bloques.append(bloque)
+        yield bloque
+
+    if bloques is not None:
+        cache.set(clave, b''.join(bloques), settings.CATALOGO_CACHE_TIMEOUT)
+
+
+async def acachear_contenido(contenido, clave):
+    """
+    Version async de `cachear_contenido` para respuestas generadas con un generador async.
+    """
+    limite = settings.CATALOGO_CACHE_MAX_BYTES
+    bloques, total = [], 0
+    async for bloque in contenido:
+        if isinstance(bloque, str):
+            bloque = bloque.encode('utf-8')
+        if bloques is not None:
+            total += len(bloque)
+            if total > limite:
+                bloques = None
+            else:
+                bloques.append(bloque)
+        yield bloque
+
+    if bloques is not None:
+        await cache.aset(clave, b''.join(bloques), settings.CATALOGO_CACHE_TIMEOUT)
@@ -0,0 +1,206 @@
+import base64
+import binascii
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Articulo, ArticuloEliminado, SecuenciaCambios
+from .precios import registrar_precios
+
+# Articulos que se marcan y marcas de baja que se insertan por sentencia
+TAMANO_LOTE = 5000
+
+# Posicion de un cliente que todavia no recibio nada: ((version, id) del ultimo articulo, (version, id) de la ultima baja)
+POSICION_INICIAL = ((0, 0), (0, 0))
+
+
+def crear_secuencia(sender, instance, created, raw=False, **kwargs):
+    """
+    Crea la fila de `SecuenciaCambios` de un cliente nuevo (post_save de Cliente), asi su primera escritura
+    no la tiene que crear.
+    """
+    if created and not raw:
+        SecuenciaCambios.objects.get_or_create(cliente_id=instance.pk)
+
+
+def _siguiente_posicion(cliente_id):
+    secuencia = SecuenciaCambios.objects.filter(cliente_id=cliente_id)
+    # El UPDATE bloquea la fila del cliente hasta el commit
+    if not secuencia.update(valor=F('valor') + 1):
+        # Primer cambio del cliente (get_or_create resuelve el caso de dos transacciones que lo crean a la vez)
+        SecuenciaCambios.objects.get_or_create(cliente_id=cliente_id)
+        secuencia.update(valor=F('valor') + 1)
+    return secuencia.values_list('valor', flat=True).get()
+
+
+def sellar_cambios(articulos=(), bajas=()):
+    """
+    Asigna la proxima posicion del feed de cambios a los articulos escritos en la transaccion en curso
+    (`articulos`, pares (id, cliente_id)) y crea las marcas de baja de `bajas` (tuplas (articulo_id,
+    cliente_id, codigo)).
+
+    Cada cliente tiene su secuencia en `SecuenciaCambios`, cuya fila queda bloqueada hasta el commit: la
+    transaccion siguiente del mismo cliente toma la posicion siguiente recien cuando esta se confirmo, por
+    lo que las posiciones de un cliente se hacen visibles en orden y el feed nunca deja atras una
+    transaccion larga. Las escrituras de clientes distintos no se esperan entre si. Con varios clientes las
+    filas se bloquean en orden de cliente, asi dos transacciones no se traban. Se llama dentro de la
+    transaccion que escribio los articulos y al final, para bloquear las filas el menor tiempo posible.
+    Devuelve {cliente_id: posicion asignada}.
+    """
+    ids = defaultdict(set)
+    for pk, cliente_id in articulos:
+        ids[cliente_id].add(pk)
+    bajas = list(bajas)
+    clientes = sorted(ids.keys() | {cliente_id for _, cliente_id, _ in bajas})
+    if not clientes:
+        return {}
+
+    versiones = {}
+    with transaction.atomic(savepoint=False):
+        for cliente_id in clientes:
+            versiones[cliente_id] = version = _siguiente_posicion(cliente_id)
+            pendientes = sorted(ids[cliente_id])
+            for inicio in range(0, len(pendientes), TAMANO_LOTE):
+                Articulo.objects.filter(pk__in=pendientes[inicio:inicio + TAMANO_LOTE]).update(version=version)
+        ahora = timezone.now()
+        ArticuloEliminado.objects.bulk_create(
+            [
+                ArticuloEliminado(articulo_id=pk, cliente_id=cliente_id, codigo=codigo, eliminado=ahora, version=versiones[cliente_id])
+                for pk, cliente_id, codigo in bajas
+            ],
+            batch_size=TAMANO_LOTE,
+        )
+    return versiones
+
+
+def eliminar_articulos(articulos):
+    """
+    Borra los articulos de un queryset dejando una `ArticuloEliminado` por cada uno, en la misma transaccion.
+    Todas las bajas de articulos pasan por aca para que el feed de cambios las informe. Devuelve la
+    cantidad de articulos borrados.
+    """
+    with transaction.atomic():
+        bajas = list(articulos.values_list('id', 'cliente_id', 'codigo').iterator(chunk_size=TAMANO_LOTE))
+        eliminados, _ = articulos.delete()
+        # La baja tambien queda en el historial de precios, para las consultas por fecha
+        registrar_precios((pk, cliente_id, codigo, None) for pk, cliente_id, codigo in bajas)
+        sellar_cambios(bajas=bajas)
+    return eliminados
+
+
+def codificar_token(posiciones):
+    """
+    Token opaco con la posicion del feed en cada cliente: {cliente_id: ((version, id) del ultimo articulo,
+    (version, id) de la ultima baja)}. Los clientes que no figuran arrancan desde el principio.
+    """
+    texto = ','.join(
+        f'{cliente_id}:{version_articulo}:{articulo}:{version_baja}:{baja}'
+        for cliente_id, ((version_articulo, articulo), (version_baja, baja)) in sorted(posiciones.items())
+    )
+    return base64.urlsafe_b64encode(texto.encode('ascii')).decode('ascii')
+
+
+def decodificar_token(token):
+    if not token:
+        return {}
+    try:
+        posiciones = {}
+        for segmento in filter(None, base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii').split(',')):
+            cliente_id, version_articulo, articulo, version_baja, baja = map(int, segmento.split(':'))
+            posiciones[cliente_id] = ((version_articulo, articulo), (version_baja, baja))
+        return posiciones
+    except (TypeError, ValueError, UnicodeError, binascii.Error):
+        raise ValidationError({'since': 'Token invalido.'})
+
+
+def _desde(queryset, posicion):
+    version, pk = posicion
+    return queryset.filter(Q(version__gt=version) | Q(version=version, id__gt=pk)).order_by('version', 'id')
+
+
+def _cambios_cliente(cliente_id, posicion, ultima, tamano):
+    """
+    Hasta `tamano` cambios de un cliente posteriores a `posicion`: (cambios, posicion siguiente, completo).
+
+    Las altas y modificaciones salen de `Articulo` por (cliente, version, id) y las bajas de
+    `ArticuloEliminado` por (cliente_id, version, id), las dos recorridas por indice desde la posicion. Se
+    mezclan en orden de posicion. `ultima` es la ultima posicion asignada al cliente, leida antes: si se
+    entrego todo, la posicion siguiente queda despues de ella (todo lo anterior ya estaba confirmado) y el
+    cliente no se vuelve a consultar hasta que tenga cambios nuevos.
+    """
+    posicion_articulos, posicion_bajas = posicion
+    # Una fila de mas de cada lado para saber si quedan cambios sin hacer otra consulta
+    modificados = list(
+        _desde(Articulo.objects.filter(cliente_id=cliente_id), posicion_articulos)
+        .values_list('version', 'id', 'cliente_id', 'codigo', 'descripcion', 'precio', 'actualizado')[:tamano + 1]
+    )
+    eliminados = list(
+        _desde(ArticuloEliminado.objects.filter(cliente_id=cliente_id), posicion_bajas)
+        .values_list('version', 'id', 'articulo_id', 'cliente_id', 'codigo', 'eliminado')[:tamano + 1]
+    )
+
+    # Mezcla por posicion; en la misma posicion, primero las modificaciones
+    filas = sorted(
+        [(fila[0], 0, fila) for fila in modificados] + [(fila[0], 1, fila) for fila in eliminados],
+        key=lambda fila: (fila[0], fila[1], fila[2][1]),
+    )
+    completo = len(filas) <= tamano
+
+    cambios = []
+    for _, es_baja, fila in filas[:tamano]:
+        if es_baja:
+            version, pk, articulo_id, cliente, codigo, eliminado = fila
+            posicion_bajas = (version, pk)
+            cambios.append({'id': articulo_id, 'cliente': cliente, 'codigo': codigo, 'eliminado': True, 'fecha': eliminado})
+        else:
+            version, pk, cliente, codigo, descripcion, precio, actualizado = fila
+            posicion_articulos = (version, pk)
+            cambios.append({
+                'id': pk, 'cliente': cliente, 'codigo': codigo, 'descripcion': descripcion,
+                'precio': f'{precio:.2f}', 'eliminado': False, 'fecha': actualizado,
+            })
+
+    if completo:
+        # Cada lado por separado: una posicion confirmada despues de leer `ultima` pudo llegar a un solo lado
+        posicion_articulos = (max(ultima, posicion_articulos[0]) + 1, 0)
+        posicion_bajas = (max(ultima, posicion_bajas[0]) + 1, 0)
+    return cambios, (posicion_articulos, posicion_bajas), completo
+
+
+def cambios_articulos(token=None, cliente_id=None, tamano=500):
+    """
+    Devuelve los cambios del catalogo posteriores a `token`: (cambios, token siguiente, hay_mas).
+
+    Las posiciones son de cada cliente (`sellar_cambios`) y el token guarda hasta donde se leyo cada uno.
+    Los clientes se recorren en orden de id y de cada uno se devuelven sus cambios en orden de posicion,
+    hasta juntar `tamano`. Un cliente sin cambios desde el token no se consulta (alcanza con su fila de
+    `SecuenciaCambios`), asi el costo depende de cuantos cambios hubo y no del tamaño del catalogo. Un
+    articulo modificado varias veces aparece una sola vez, con su estado actual.
+
+    Las posiciones se asignan en el orden de los commits: una transaccion todavia abierta no tiene posicion
+    visible, y cuando se confirma toma una mayor que todas las ya informadas de su cliente.
+    """
+    posiciones = decodificar_token(token)
+
+    secuencias = SecuenciaCambios.objects.order_by('cliente_id')
+    if cliente_id is not None:
+        secuencias = secuencias.filter(cliente_id=cliente_id)
+
+    cambios = []
+    with transaction.atomic():
+        for cliente, ultima in secuencias.values_list('cliente_id', 'valor'):
+            posicion = posiciones.get(cliente, POSICION_INICIAL)
+            if min(posicion[0][0], posicion[1][0]) > ultima:
+                continue
+            if len(cambios) == tamano:
+                return cambios, codificar_token(posiciones), True
+
+            nuevos, posiciones[cliente], completo = _cambios_cliente(cliente, posicion, ultima, tamano - len(cambios))
+            cambios.extend(nuevos)
+            if not completo:
+                return cambios, codificar_token(posiciones), True
+
+    return cambios, codificar_token(posiciones), False
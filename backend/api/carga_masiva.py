@@ -0,0 +1,315 @@
+import csv
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from .cache import invalidar_catalogo
+from .cambios import sellar_cambios
+from .exporters import _pyarrow
+from .models import Articulo, CargaDatos
+from .precios import registrar_precios
+
+# Carga masiva de datos (semillas y restauraciones), ver `manage.py cargar_datos`
+
+# Filas por INSERT y por transaccion. Despues de cada lote se guarda el avance en `CargaDatos`
+TAMANO_LOTE = 5000
+
+FORMATOS = ('.json', '.jsonl', '.ndjson', '.csv', '.parquet')
+
+# Caracteres que se leen por vez de un `.json`
+TAMANO_BLOQUE_JSON = 1024 * 1024
+
+
+class DatosInvalidos(Exception):
+    """
+    El archivo no se puede cargar: formato desconocido, modelo inexistente o campos que no son del modelo.
+    """
+
+
+def elementos_json(archivo, tamano_bloque=TAMANO_BLOQUE_JSON):
+    """
+    Recorre los elementos de un arreglo JSON leyendo el archivo de a `tamano_bloque` caracteres: `json.load`
+    armaba en memoria la lista completa antes de devolver el primer registro. Cada elemento se decodifica
+    con `raw_decode` apenas esta completo en el buffer, que solo guarda lo que todavia no se decodifico.
+    """
+    decodificador = json.JSONDecoder()
+    buffer, posicion, fin_archivo = '', 0, False
+
+    def leer():
+        nonlocal buffer, posicion, fin_archivo
+        bloque = archivo.read(tamano_bloque)
+        fin_archivo = not bloque
+        buffer, posicion = buffer[posicion:] + bloque, 0
+
+    def caracter():
+        # Proximo caracter que no es espacio, o '' al final del archivo
+        nonlocal posicion
+        while True:
+            while posicion < len(buffer) and buffer[posicion] in ' \t\r\n':
+                posicion += 1
+            if posicion < len(buffer) or fin_archivo:
+                return buffer[posicion:posicion + 1]
+            leer()
+
+    def esperar(esperados):
+        nonlocal posicion
+        encontrado = caracter()
+        if encontrado not in esperados:
+            raise DatosInvalidos(f"JSON invalido: se esperaba {' o '.join(esperados)} y se encontro {encontrado or 'el final del archivo'}")
+        posicion += 1
+        return encontrado
+
+    esperar('[')
+    if caracter() == ']':
+        return
+    while True:
+        caracter()
+        while True:
+            try:
+                elemento, fin = decodificador.raw_decode(buffer, posicion)
+            except json.JSONDecodeError as e:
+                if fin_archivo:
+                    raise DatosInvalidos(f'JSON invalido: {e}')
+                leer()
+                continue
+            # Un numero al final del buffer puede seguir en el bloque siguiente
+            if fin == len(buffer) and not fin_archivo:
+                leer()
+                continue
+            break
+        posicion = fin
+        yield elemento
+        if esperar(',]') == ']':
+            return
+
+
+def _registros_planos(filas, modelo):
+    # Registros sin "model"/"fields" (CSV, Parquet o JSON Lines plano): todos son de `modelo`
+    if modelo is None:
+        raise DatosInvalidos('Los archivos CSV, Parquet o JSON Lines sin "model" necesitan --modelo')
+    for fila in filas:
+        fila = dict(fila)
+        pk = fila.pop('pk', None)
+        if pk is None:
+            pk = fila.pop('id', None)
+        yield modelo, pk, fila
+
+
+def leer_registros(ruta, modelo=None):
+    """
+    Recorre los registros de un archivo de datos y devuelve tuplas (modelo, pk, campos).
+
+    - `.json`: fixture de Django (lista de {"model", "pk", "fields"}), como los de `dumpdata`
+    - `.jsonl` / `.ndjson`: un registro por linea, con el formato de las fixtures o plano ({"id": 1, "codigo": ...})
+    - `.csv`: con encabezado, una columna por campo
+    - `.parquet`: una columna por campo, se lee de a record batches
+
+    Los archivos se leen a medida que se recorren, sin cargarlos enteros en memoria (el `.json` con
+    `elementos_json`). Los registros planos son del modelo `modelo` ("api.articulo").
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == '.json':
+        with open(ruta, encoding='utf-8') as archivo:
+            for registro in elementos_json(archivo):
+                yield registro['model'], registro.get('pk'), registro['fields']
+
+    elif extension in ('.jsonl', '.ndjson'):
+        with open(ruta, encoding='utf-8') as archivo:
+            lineas = (json.loads(linea) for linea in archivo if linea.strip())
+            for registro in lineas:
+                if 'model' in registro and 'fields' in registro:
+                    yield registro['model'], registro.get('pk'), registro['fields']
+                else:
+                    yield from _registros_planos([registro], modelo)
+
+    elif extension == '.csv':
+        with open(ruta, encoding='utf-8', newline='') as archivo:
+            yield from _registros_planos(csv.DictReader(archivo), modelo)
+
+    elif extension == '.parquet':
+        pa = _pyarrow()
+        lotes = pa.parquet.ParquetFile(ruta).iter_batches(batch_size=TAMANO_LOTE)
+        yield from _registros_planos((fila for lote in lotes for fila in lote.to_pylist()), modelo)
+
+    else:
+        raise DatosInvalidos(f"Formato no soportado: {extension} (se aceptan {', '.join(FORMATOS)})")
+
+
+def _modelo(etiqueta, modelos):
+    if etiqueta not in modelos:
+        try:
+            modelos[etiqueta] = apps.get_model(etiqueta)
+        except (LookupError, ValueError):
+            raise DatosInvalidos(f'No existe el modelo {etiqueta}')
+    return modelos[etiqueta]
+
+
+def instancia(modelo, pk, campos):
+    """
+    Arma la instancia de un registro convirtiendo cada valor con el `to_python` de su campo. Las FK se
+    indican con el id del objeto relacionado, con el nombre del campo (`cliente`) o su columna (`cliente_id`).
+    """
+    objeto = modelo()
+    if pk is not None:
+        objeto.pk = modelo._meta.pk.to_python(pk)
+    for nombre, valor in campos.items():
+        try:
+            campo = modelo._meta.get_field(nombre)
+        except FieldDoesNotExist:
+            raise DatosInvalidos(f'{modelo._meta.label} no tiene el campo {nombre}')
+        # En CSV los campos nulos llegan vacios
+        if valor == '' and campo.null:
+            valor = None
+        setattr(objeto, campo.attname, campo.to_python(valor))
+    return objeto
+
+
+def clave_archivo(ruta):
+    """
+    Identifica un archivo por su ruta, tamaño y fecha de modificacion: si el archivo cambia, se carga de nuevo.
+    """
+    datos = os.stat(ruta)
+    return hashlib.blake2b(f'{os.path.abspath(ruta)}:{datos.st_size}:{datos.st_mtime_ns}'.encode('utf-8'), digest_size=16).hexdigest()
+
+
+@contextmanager
+def verificaciones_diferidas():
+    """
+    Difiere la verificacion de las FK mientras dura la carga.
+
+    En MySQL se desactiva `foreign_key_checks` en la sesion para que InnoDB no busque el padre de cada
+    fila; las FK de cada lote las controla `verificar_relaciones` antes de confirmarlo. `unique_checks` se
+    deja activo porque la carga se apoya en los indices unicos para ignorar las filas que ya existen. En
+    SQLite y PostgreSQL las FK que crea Django ya son DEFERRABLE INITIALLY DEFERRED y se verifican al
+    confirmar cada lote.
+    """
+    if connection.vendor != 'mysql':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SET foreign_key_checks = 0')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SET foreign_key_checks = 1')
+
+
+def verificar_relaciones(objetos):
+    """
+    Controla que existan los objetos a los que apuntan las FK de `objetos` ({modelo: [instancias]}), con una
+    consulta por FK y en la misma transaccion que el lote, despues de insertarlo: un padre que viene antes en
+    el lote ya esta en la base. Sin esto, en MySQL (sin `foreign_key_checks`) una fila con una FK rota se
+    insertaba sin error. Lanza `DatosInvalidos` con los ids que no existen.
+    """
+    for modelo, instancias in objetos.items():
+        for campo in modelo._meta.concrete_fields:
+            # Las FK sin constraint en la base (db_constraint=False) admiten ids inexistentes a proposito
+            if not campo.many_to_one or not campo.db_constraint:
+                continue
+            ids = {getattr(instancia, campo.attname) for instancia in instancias} - {None}
+            destino = campo.target_field.attname
+            existentes = set(campo.related_model._base_manager.filter(**{f'{destino}__in': ids}).values_list(destino, flat=True))
+            faltantes = sorted(ids - existentes)
+            if faltantes:
+                raise DatosInvalidos(
+                    f"{modelo._meta.label}.{campo.name} apunta a {campo.related_model._meta.label} que no existen: "
+                    f"{', '.join(map(str, faltantes[:10]))}{'...' if len(faltantes) > 10 else ''}"
+                )
+
+
+def _articulos_insertados(articulos):
+    # Los articulos del lote que se insertaron (los unicos sin posicion en el feed de cambios: los ya
+    # confirmados la tienen), buscados por su clave unica. No alcanza con `version__isnull=True`: tambien
+    # traeria los articulos que otra conexion acaba de confirmar y todavia no sello
+    claves = {(articulo.cliente_id, articulo.codigo) for articulo in articulos}
+    candidatos = Articulo.objects.filter(
+        cliente_id__in={cliente_id for cliente_id, _ in claves},
+        codigo__in={codigo for _, codigo in claves},
+        version__isnull=True,
+    ).values_list('id', 'cliente_id', 'codigo', 'precio')
+    return [fila for fila in candidatos if (fila[1], fila[2]) in claves]
+
+
+def cargar_archivo(ruta, modelo=None, tamano_lote=TAMANO_LOTE, al_guardar_lote=None):
+    """
+    Carga los registros de un archivo con `bulk_create` de a `tamano_lote` filas y devuelve
+    {'filas', 'cargadas', 'segundos', 'omitido', 'articulos_omitidos'}.
+
+    Cada lote se inserta en su propia transaccion junto con el avance del archivo en `CargaDatos`. Si la
+    carga se corta, la siguiente saltea las filas ya confirmadas y un archivo que ya se cargo completo no se
+    vuelve a leer. Las filas que ya existen en la base (misma pk o clave unica) se dejan como estan, por
+    lo que tambien se puede cargar sobre datos previos. `al_guardar_lote` se llama despues de cada lote con
+    las filas cargadas en esta ejecucion y los segundos transcurridos. `articulos_omitidos` cuenta los
+    articulos del archivo que no se insertaron (ya existian, o MySQL los descarto con INSERT IGNORE).
+    """
+    inicio = time.perf_counter()
+    clave = clave_archivo(ruta)
+    avance, _ = CargaDatos.objects.get_or_create(clave=clave, defaults={'archivo': os.path.basename(ruta)})
+    if avance.completa:
+        return {'filas': avance.filas, 'cargadas': 0, 'segundos': 0.0, 'omitido': True, 'articulos_omitidos': 0}
+
+    modelos = {}
+    clientes = set()
+    registros = islice(leer_registros(ruta, modelo), avance.filas, None)
+    filas = avance.filas
+    articulos_omitidos = 0
+    with verificaciones_diferidas():
+        while True:
+            lote = list(islice(registros, tamano_lote))
+            if not lote:
+                break
+
+            # Un lote puede tener registros de varios modelos (fixtures): un bulk_create por cada tramo
+            with transaction.atomic():
+                tramo, actual, objetos = [], None, {}
+                for etiqueta, pk, campos in lote:
+                    modelo_registro = _modelo(etiqueta, modelos)
+                    if modelo_registro is not actual and tramo:
+                        actual.objects.bulk_create(tramo, ignore_conflicts=True)
+                        tramo = []
+                    actual = modelo_registro
+                    objeto = instancia(modelo_registro, pk, campos)
+                    if modelo_registro is Articulo:
+                        clientes.add(objeto.cliente_id)
+                    tramo.append(objeto)
+                    objetos.setdefault(modelo_registro, []).append(objeto)
+                actual.objects.bulk_create(tramo, ignore_conflicts=True)
+                verificar_relaciones(objetos)
+
+                # Los articulos insertados en este lote empiezan su historial de precios y entran al feed.
+                # Los que ya existian no cambian
+                if Articulo in objetos:
+                    nuevos = _articulos_insertados(objetos[Articulo])
+                    articulos_omitidos += len(objetos[Articulo]) - len(nuevos)
+                    registrar_precios(nuevos, nuevos=True)
+                    sellar_cambios((pk, cliente_id) for pk, cliente_id, _, _ in nuevos)
+
+                filas += len(lote)
+                CargaDatos.objects.filter(pk=clave).update(filas=filas)
+
+            if al_guardar_lote:
+                al_guardar_lote(filas - avance.filas, time.perf_counter() - inicio)
+
+    # Con pks explicitas las secuencias de PostgreSQL quedan atras (en MySQL y SQLite no hace nada)
+    sentencias = connection.ops.sequence_reset_sql(no_style(), list(modelos.values()))
+    if sentencias:
+        with connection.cursor() as cursor:
+            for sentencia in sentencias:
+                cursor.execute(sentencia)
+
+    CargaDatos.objects.filter(pk=clave).update(completa=True)
+    if clientes:
+        invalidar_catalogo(*clientes)
+    return {
+        'filas': filas, 'cargadas': filas - avance.filas, 'segundos': time.perf_counter() - inicio, 'omitido': False,
+        'articulos_omitidos': articulos_omitidos,
+    }
@@ -0,0 +1,109 @@
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.exceptions import PermissionDenied
+
+from .models import Cliente
+
+# Cache en memoria del proceso: {usuario_id (o _ANONIMO): (cliente, vence)}. Se vacia cuando cambia un
+# Cliente o un UsuarioCliente de este proceso; los cambios hechos desde otro proceso se ven al vencer el TTL
+_ANONIMO = 'anonimo'
+_cache = {}
+_lock = threading.Lock()
+
+
+def _cacheado(clave, buscar):
+    ahora = time.monotonic()
+    with _lock:
+        entrada = _cache.get(clave)
+    if entrada is not None and entrada[1] > ahora:
+        return entrada[0]
+
+    cliente = buscar()
+    with _lock:
+        _cache[clave] = (cliente, ahora + settings.CLIENTE_CACHE_TTL)
+    return cliente
+
+
+def invalidar_clientes(**kwargs):
+    """
+    Vacia la cache de clientes. Se conecta a post_save / post_delete de Cliente y UsuarioCliente.
+    """
+    with _lock:
+        _cache.clear()
+
+
+def primer_cliente():
+    """
+    Cliente de los requests anonimos: el de menor id, como hasta ahora (se busca por la clave primaria).
+    """
+    return _cacheado(_ANONIMO, lambda: Cliente.objects.order_by('pk').first())
+
+
+def cliente_asignado(usuario):
+    """
+    Devuelve el cliente del usuario autenticado, o None si el request es anonimo o de un usuario staff sin
+    cliente (administradores, que ven todos los clientes). Un usuario comun sin cliente no tiene acceso.
+    """
+    if usuario is None or not usuario.is_authenticated:
+        return None
+
+    cliente = _cacheado(usuario.pk, lambda: Cliente.objects.filter(usuarios__usuario_id=usuario.pk).first())
+    if cliente is None and not usuario.is_staff:
+        raise PermissionDenied('El usuario no tiene un cliente asignado.')
+    return cliente
+
+
+def cliente_de(request):
+    """
+    Cliente con el que trabaja un request: el asignado al usuario del token o, sin usuario, el primer cliente.
+    """
+    return cliente_asignado(request.user) or primer_cliente()
+
+
+def clave_token(request):
+    """
+    Clave del header `Authorization: Token <key>` tal como llega, sin buscarla en la base, o None si el
+    request no trae un token.
+    """
+    partes = get_authorization_header(request).split()
+    if len(partes) != 2 or partes[0].lower() != TokenAuthentication.keyword.lower().encode():
+        return None
+    return partes[1].decode(errors='replace')
+
+
+def cliente_de_token(clave):
+    """
+    `cliente_de` para una clave de token guardada sin autenticar (None es un request anonimo). Lanza
+    AuthenticationFailed si el token no existe o PermissionDenied si su usuario no tiene cliente.
+    """
+    if clave is None:
+        return primer_cliente()
+    usuario, _ = TokenAuthentication().authenticate_credentials(clave)
+    return cliente_asignado(usuario) or primer_cliente()
+
+
+async def acliente_asignado(request):
+    """
+    `cliente_asignado` para las vistas async, que no pasan por la autenticacion de DRF. El usuario se busca
+    como en DEFAULT_AUTHENTICATION_CLASSES: el del header `Authorization: Token ...` o, sin token, el de la
+    sesion (activo, como en SessionAuthentication). Puede lanzar AuthenticationFailed (token invalido) o
+    PermissionDenied.
+    """
+    autenticado = await sync_to_async(TokenAuthentication().authenticate)(request)
+    if autenticado:
+        usuario = autenticado[0]
+    else:
+        usuario = await request.auser()
+        usuario = usuario if usuario.is_active else None
+    return await sync_to_async(cliente_asignado)(usuario)
+
+
+async def acliente_de(request):
+    """
+    `cliente_de` para las vistas async, con el usuario del token o de la sesion.
+    """
+    return await acliente_asignado(request) or await sync_to_async(primer_cliente)()
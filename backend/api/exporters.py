@@ -0,0 +1,271 @@
+import asyncio
+import contextvars
+import csv
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+import xlsxwriter
+from django.conf import settings
+from django.db import close_old_connections
+
+from .metrics import contar_filas
+from .models import Articulo
+
+# Mismas columnas que generaba `articulos.values()` en la version anterior de la descarga
+COLUMNAS_EXPORTACION = ('id', 'cliente_id', 'codigo', 'descripcion', 'precio')
+
+# Filas que se traen de la base en cada round trip del cursor
+TAMANO_CHUNK = 2000
+
+# Bytes que se envian al cliente en cada pedazo de la respuesta
+TAMANO_BLOQUE = 64 * 1024
+
+# Filas por row group del Parquet: grupos chicos comprimen peor y hacen mas lenta la lectura
+TAMANO_GRUPO_PARQUET = 64 * 1024
+
+
+class FormatoNoDisponible(Exception):
+    """
+    El formato pedido necesita una dependencia opcional que no esta instalada.
+    """
+
+
+def filas_articulos(articulos):
+    """
+    Recorre el queryset con un cursor del lado del servidor, sin cargar todos los articulos en memoria.
+    """
+    return contar_filas(articulos.values_list(*COLUMNAS_EXPORTACION).iterator(chunk_size=TAMANO_CHUNK))
+
+
+class _Eco:
+    """
+    Objeto tipo archivo que devuelve lo que se le escribe, para que `csv.writer` genere las lineas
+    de a una (patron recomendado por Django para CSVs grandes).
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def exportar_csv(articulos):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(COLUMNAS_EXPORTACION)
+    for fila in filas_articulos(articulos):
+        yield escritor.writerow(fila)
+
+
+async def exportar_csv_async(articulos):
+    """
+    Version async de `exportar_csv`: las filas se leen con `aiterator`, sin ocupar un hilo mientras se envian.
+    """
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(COLUMNAS_EXPORTACION)
+    lineas = []
+    # `values()` y no `values_list()`: en Django 5.1 `values_list().aiterator()` ejecuta la consulta en el
+    # event loop (y falla con SynchronousOnlyOperation) en lugar de hacerlo en un hilo
+    async for fila in articulos.values(*COLUMNAS_EXPORTACION).aiterator(chunk_size=TAMANO_CHUNK):
+        lineas.append(escritor.writerow(fila.values()))
+        if len(lineas) == TAMANO_CHUNK:
+            yield ''.join(lineas)
+            lineas = []
+    if lineas:
+        yield ''.join(lineas)
+
+
+def exportar_xlsx(articulos):
+    """
+    Genera el XLSX con xlsxwriter en modo `constant_memory`: cada fila se baja a disco apenas se escribe.
+
+    Un XLSX es un ZIP cuyo indice va al final, por lo que recien se puede enviar cuando el libro se cierra.
+    El archivo se arma en un temporal y se envia por bloques, de modo que la memoria queda acotada
+    independientemente de la cantidad de articulos.
+    """
+    with tempfile.TemporaryFile() as salida:
+        libro = xlsxwriter.Workbook(salida, {'constant_memory': True})
+        hoja = libro.add_worksheet('Articulos')
+        hoja.write_row(0, 0, COLUMNAS_EXPORTACION)
+        for numero, fila in enumerate(filas_articulos(articulos), start=1):
+            hoja.write_row(numero, 0, fila)
+        libro.close()
+
+        salida.seek(0)
+        while bloque := salida.read(TAMANO_BLOQUE):
+            yield bloque
+
+
+def _pyarrow():
+    # pyarrow es pesado y solo lo usan los formatos columnares, se importa recien cuando se pide uno
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise FormatoNoDisponible('Los formatos parquet y arrow necesitan pyarrow instalado')
+    return pyarrow
+
+
+def esquema_arrow(pa):
+    """
+    Esquema de las columnas exportadas: `codigo` como texto (no se pierden los ceros a la izquierda) y
+    `precio` como decimal con la misma precision que la columna de la base.
+    """
+    precio = Articulo._meta.get_field('precio')
+    return pa.schema([
+        ('id', pa.int64()),
+        ('cliente_id', pa.int64()),
+        ('codigo', pa.string()),
+        ('descripcion', pa.string()),
+        ('precio', pa.decimal128(precio.max_digits, precio.decimal_places)),
+    ])
+
+
+def lotes_arrow(articulos, pa, esquema):
+    """
+    Convierte cada chunk de `filas_articulos` en un RecordBatch, columna por columna.
+    """
+    filas = filas_articulos(articulos)
+    while chunk := list(islice(filas, TAMANO_CHUNK)):
+        columnas = zip(*chunk)
+        yield pa.record_batch([pa.array(valores, type=campo.type) for valores, campo in zip(columnas, esquema)], schema=esquema)
+
+
+class _Bloques:
+    """
+    Destino de escritura de pyarrow que guarda en memoria lo escrito hasta que se retira con `vaciar`.
+    """
+
+    def __init__(self):
+        self.bloques = []
+        self.posicion = 0
+        self.closed = False
+
+    def write(self, datos):
+        self.bloques.append(bytes(datos))
+        self.posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self.posicion
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def vaciar(self):
+        datos = b''.join(self.bloques)
+        self.bloques = []
+        return datos
+
+
+def exportar_arrow(articulos):
+    """
+    Genera un stream Arrow IPC. Cada RecordBatch se envia apenas se escribe, sin pasar por un temporal.
+    """
+    pa = _pyarrow()
+    return _exportar_arrow(articulos, pa, esquema_arrow(pa))
+
+
+def _exportar_arrow(articulos, pa, esquema):
+    destino = _Bloques()
+    with pa.ipc.new_stream(pa.PythonFile(destino, mode='w'), esquema) as escritor:
+        for lote in lotes_arrow(articulos, pa, esquema):
+            escritor.write_batch(lote)
+            yield destino.vaciar()
+    yield destino.vaciar()
+
+
+def exportar_parquet(articulos):
+    """
+    Genera un Parquet comprimido con zstd. Cada row group se envia cuando se completa; el footer con los
+    metadatos sale al final.
+    """
+    pa = _pyarrow()
+    return _exportar_parquet(articulos, pa, esquema_arrow(pa))
+
+
+def _exportar_parquet(articulos, pa, esquema):
+    destino = _Bloques()
+    with pa.parquet.ParquetWriter(pa.PythonFile(destino, mode='w'), esquema, compression='zstd') as escritor:
+        lotes, filas = [], 0
+        for lote in lotes_arrow(articulos, pa, esquema):
+            lotes.append(lote)
+            filas += lote.num_rows
+            if filas >= TAMANO_GRUPO_PARQUET:
+                escritor.write_table(pa.Table.from_batches(lotes, schema=esquema), row_group_size=filas)
+                lotes, filas = [], 0
+                yield destino.vaciar()
+        if lotes:
+            escritor.write_table(pa.Table.from_batches(lotes, schema=esquema), row_group_size=filas)
+    yield destino.vaciar()
+
+
+# formato (y extension del archivo): (generador, content type)
+EXPORTADORES = {
+    'xlsx': (exportar_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': (exportar_csv, 'text/csv; charset=utf-8'),
+    'parquet': (exportar_parquet, 'application/vnd.apache.parquet'),
+    'arrow': (exportar_arrow, 'application/vnd.apache.arrow.stream'),
+}
+
+
+# Hilos que arman los archivos de las descargas async. Acota cuantas exportaciones pesadas corren a la vez
+# sin importar cuantas descargas tenga abiertas el event loop
+_pool_exportacion = None
+_pool_lock = threading.Lock()
+
+
+def _pool():
+    global _pool_exportacion
+    with _pool_lock:
+        if _pool_exportacion is None:
+            _pool_exportacion = ThreadPoolExecutor(max_workers=settings.EXPORTACION_HILOS, thread_name_prefix='exportacion')
+        return _pool_exportacion
+
+
+_FIN = object()
+
+
+async def exportar_en_hilo(bloques, pendientes=4):
+    """
+    Recorre el generador sync `bloques` (por ejemplo `exportar_xlsx(articulos)`) en el pool de exportacion
+    y entrega sus bloques como un generador async.
+
+    El generador se consume entero en un mismo hilo (su cursor pertenece a la conexion de ese hilo). Entre
+    el hilo y el event loop hay una cola de `pendientes` bloques: si el cliente lee lento, el hilo espera en
+    lugar de acumular el archivo en memoria. Si el cliente corta la descarga, el hilo termina en el
+    siguiente bloque.
+    """
+    loop = asyncio.get_running_loop()
+    cola = asyncio.Queue(maxsize=pendientes)
+    cancelada = threading.Event()
+
+    def producir():
+        try:
+            for bloque in bloques:
+                asyncio.run_coroutine_threadsafe(cola.put(bloque), loop).result()
+                if cancelada.is_set():
+                    return
+        except BaseException as e:
+            asyncio.run_coroutine_threadsafe(cola.put(e), loop).result()
+        finally:
+            # La conexion es de este hilo del pool y no la cierra ningun request. Con conexiones persistentes
+            # (DB_CONN_MAX_AGE) queda abierta para la proxima exportacion de este hilo
+            close_old_connections()
+            asyncio.run_coroutine_threadsafe(cola.put(_FIN), loop)
+
+    # Con el contexto del request el hilo ve la medicion de `MetricasMiddleware`
+    tarea = loop.run_in_executor(_pool(), contextvars.copy_context().run, producir)
+    try:
+        while (bloque := await cola.get()) is not _FIN:
+            if isinstance(bloque, BaseException):
+                raise bloque
+            yield bloque
+        await tarea
+    finally:
+        if not tarea.done():
+            cancelada.set()
+            while not cola.empty():
+                cola.get_nowait()
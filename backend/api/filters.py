@@ -0,0 +1,45 @@
+from decimal import Decimal, InvalidOperation
+
+from rest_framework.exceptions import ValidationError
+
+
+def _decimal(params, nombre):
+    valor = params.get(nombre)
+    if valor in (None, ''):
+        return None
+    try:
+        return Decimal(valor)
+    except InvalidOperation:
+        raise ValidationError({nombre: 'Debe ser un número.'})
+
+
+def filtrar_articulos(queryset, params):
+    """
+    Aplica los filtros del listado de articulos:
+
+    - `cliente`: id del cliente
+    - `codigo`: codigo exacto, `codigo_prefijo`: codigos que empiezan con el valor
+    - `descripcion`: busqueda de texto sobre la descripcion (FULLTEXT en MySQL)
+    - `precio_min` / `precio_max`: rango de precios, inclusive
+
+    Todos se resuelven con los indices de `Articulo` (ver migracion 0009).
+    """
+    if cliente := params.get('cliente'):
+        if not cliente.isdigit():
+            raise ValidationError({'cliente': 'Debe ser un id de cliente.'})
+        queryset = queryset.filter(cliente_id=cliente)
+    if codigo := params.get('codigo'):
+        queryset = queryset.filter(codigo=codigo)
+    if prefijo := params.get('codigo_prefijo'):
+        queryset = queryset.filter(codigo__startswith=prefijo)
+    if descripcion := params.get('descripcion'):
+        queryset = queryset.filter(descripcion__busqueda=descripcion)
+
+    precio_min = _decimal(params, 'precio_min')
+    if precio_min is not None:
+        queryset = queryset.filter(precio__gte=precio_min)
+    precio_max = _decimal(params, 'precio_max')
+    if precio_max is not None:
+        queryset = queryset.filter(precio__lte=precio_max)
+
+    return queryset
@@ -0,0 +1,257 @@
+import hashlib
+import unicodedata
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+import pandas as pd
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import invalidar_catalogo
+from .cambios import sellar_cambios
+from .lectores import COLUMNAS
+from .models import Articulo
+from .precios import registrar_precios
+
+# Cantidad de filas que se envian a la base en cada INSERT ... ON DUPLICATE KEY UPDATE
+TAMANO_LOTE = 1000
+
+# Fila de Excel del primer articulo (la 1 es el encabezado)
+PRIMERA_FILA = 2
+
+# Cantidad maxima de errores que se devuelven en la respuesta
+MAXIMO_ERRORES = 1000
+
+CODIGO_MAX = Articulo._meta.get_field('codigo').max_length
+DESCRIPCION_MAX = Articulo._meta.get_field('descripcion').max_length
+PRECIO_ENTEROS = Articulo._meta.get_field('precio').max_digits - Articulo._meta.get_field('precio').decimal_places
+CENTAVOS = Decimal(1).scaleb(-Articulo._meta.get_field('precio').decimal_places)
+
+
+class ArchivoInvalido(Exception):
+    """
+    El archivo tiene filas que no se pueden importar. `errores` tiene un dict por error con la fila
+    de Excel, la columna y el motivo.
+    """
+
+    def __init__(self, errores, total):
+        super().__init__(f"El archivo tiene {total} errores")
+        self.errores = errores
+        self.total = total
+
+
+def en_lotes(filas, tamano):
+    """
+    Agrupa un iterable de filas en listas de a lo sumo `tamano` elementos.
+    """
+    iterador = iter(filas)
+    while lote := list(islice(iterador, tamano)):
+        yield lote
+
+
+def _texto(serie):
+    texto = serie.astype('string').str.strip()
+    # Los codigos numericos que llegan como float (101.0) se guardan como '101'
+    es_float = serie.map(type).eq(float)
+    texto = texto.mask(es_float & texto.str.endswith('.0'), texto.str[:-2])
+    return texto.replace('', pd.NA)
+
+
+def clave_codigo(codigo):
+    """
+    Un codigo como lo compara el indice unico (cliente, codigo) en MySQL: la collation por defecto
+    (utf8mb4_0900_ai_ci) no distingue mayusculas ni acentos, asi que "abc", "ABC" y "ábc" son el mismo articulo.
+    """
+    codigo = codigo.casefold()
+    if codigo.isascii():
+        return codigo
+    return ''.join(c for c in unicodedata.normalize('NFKD', codigo) if not unicodedata.combining(c))
+
+
+def _precio(valor):
+    # Desde el texto del valor y no desde el float: un float redondeado antes de pasar a Decimal puede
+    # quedar del otro lado del medio centavo (2.675 es 2.67499999... en binario)
+    try:
+        precio = Decimal(str(valor).strip()).quantize(CENTAVOS)
+    except (InvalidOperation, ValueError):
+        return None
+    return precio if precio.is_finite() else None
+
+
+def validar_lote(lote, primera_fila, vistos):
+    """
+    Valida y normaliza un lote de filas (codigo, descripcion, precio) con operaciones de pandas por columna.
+
+    - `codigo` y `descripcion` se pasan a texto sin espacios y se controla que existan y su largo maximo
+    - `precio` se convierte a `Decimal` desde su texto, se redondea a 2 decimales y se controla el
+      `max_digits` del modelo
+    - los codigos repetidos en el archivo (dentro del lote o contra `vistos`, los de lotes anteriores)
+      son un error. Se comparan con `clave_codigo`, como el indice unico de la base. `vistos` se
+      actualiza con las claves de los codigos del lote
+
+    Las filas vacias se descartan. Devuelve la lista de filas validas, con el precio como `Decimal`, y la
+    lista de errores por fila.
+    """
+    df = pd.DataFrame(lote, columns=COLUMNAS)
+    df.index = pd.RangeIndex(primera_fila, primera_fila + len(df))
+    df = df[df.notna().any(axis=1)]
+
+    codigo = _texto(df['codigo'])
+    descripcion = _texto(df['descripcion'])
+    clave = codigo.map(clave_codigo, na_action='ignore')
+    # pandas valida el numero por columna; el Decimal se arma del valor original, solo con los que estan en rango
+    numero = pd.to_numeric(df['precio'], errors='coerce')
+    en_rango = numero.abs() < 10 ** PRECIO_ENTEROS
+    precio = df['precio'].where(en_rango).map(_precio, na_action='ignore')
+
+    chequeos = [
+        ('codigo', codigo.isna(), 'El codigo es obligatorio'),
+        ('codigo', codigo.str.len() > CODIGO_MAX, f'El codigo supera los {CODIGO_MAX} caracteres'),
+        ('codigo', clave.notna() & (clave.duplicated() | clave.isin(vistos)), 'El codigo esta repetido en el archivo'),
+        ('descripcion', descripcion.isna(), 'La descripcion es obligatoria'),
+        ('descripcion', descripcion.str.len() > DESCRIPCION_MAX, f'La descripcion supera los {DESCRIPCION_MAX} caracteres'),
+        ('precio', numero.isna() | (en_rango & precio.isna()), 'El precio debe ser un numero'),
+        # 99999999.995 pasa el control del float pero redondeado a centavos tiene un digito entero de mas
+        ('precio', (numero.notna() & ~en_rango) | precio.map(lambda valor: abs(valor) >= 10 ** PRECIO_ENTEROS, na_action='ignore'),
+         f'El precio no puede tener mas de {PRECIO_ENTEROS} digitos enteros'),
+    ]
+
+    invalidas = pd.Series(False, index=df.index)
+    errores = []
+    for columna, mascara, mensaje in chequeos:
+        mascara = mascara.fillna(False).astype(bool)
+        invalidas |= mascara
+        errores.extend({'fila': int(fila), 'columna': columna, 'error': mensaje} for fila in mascara.index[mascara])
+
+    vistos.update(clave.dropna())
+
+    validas = ~invalidas
+    filas = list(zip(codigo[validas], descripcion[validas], precio[validas]))
+    return filas, sorted(errores, key=lambda error: error['fila'])
+
+
+def huella(descripcion, precio):
+    """
+    Hash del contenido de un articulo, para saber si una fila del archivo cambia lo que ya esta grabado.
+    """
+    return hashlib.blake2b(f'{descripcion}\x1f{precio:.2f}'.encode('utf-8'), digest_size=16).digest()
+
+
+def _lotes(hojas, tamano_lote):
+    # Cada hoja se parte en lotes por separado, con su propia numeracion de filas
+    for origen, filas in hojas:
+        for numero, lote in enumerate(en_lotes(filas, tamano_lote)):
+            yield origen, lote, PRIMERA_FILA + numero * tamano_lote
+
+
+def upsert_articulos(cliente, hojas, tamano_lote=TAMANO_LOTE, al_procesar_lote=None, delta=True):
+    """
+    Valida e inserta o actualiza en bloque los articulos de un cliente.
+
+    `hojas` es un iterable de pares (origen, filas), como los que devuelve `leer_archivos`: `origen`
+    identifica el archivo y la hoja en los errores y `filas` son tuplas (codigo, descripcion, precio) en el
+    orden de la hoja. Las hojas se escriben en el orden recibido y un codigo repetido entre hojas es un
+    error, asi el resultado no depende de como se repartio la lectura. Cada lote se
+    valida con `validar_lote` antes de escribirlo. Los codigos existentes del cliente se leen en una sola
+    consulta y las filas se escriben con `bulk_create(update_conflicts=True)`, todo dentro de una unica
+    transaccion. Ante la primera fila invalida se deja de escribir, pero se siguen validando las filas
+    restantes: al final se deshace la transaccion y se lanza `ArchivoInvalido` con todos los errores.
+
+    Con `delta` (el modo por defecto) se guarda la huella de cada articulo existente y solo se escriben
+    las filas nuevas o cuyo contenido cambio: re-subir el archivo descargado con unos pocos precios
+    editados escribe solo esas filas. Sin `delta` se reescriben todas las filas del archivo.
+
+    Los articulos nuevos y los que cambian de precio se agregan al historial de precios
+    (`PrecioHistorico`) con un INSERT en bloque por lote, todos vigentes desde el inicio de la importacion.
+
+    Devuelve la cantidad de filas procesadas, insertadas, actualizadas, omitidas (iguales a lo grabado)
+    y los articulos del cliente que no figuraban en el archivo (sin cambios). Si se indica
+    `al_procesar_lote`, se lo llama despues de cada lote con la cantidad de filas procesadas hasta el momento.
+    """
+    articulos = Articulo.objects.filter(cliente=cliente)
+    # clave_codigo(codigo): (id, precio, huella, codigo). El precio es para saber que filas cambian de precio
+    # (historial) y el codigo el grabado, que puede diferir del archivo en mayusculas o acentos
+    if delta:
+        existentes = {
+            clave_codigo(codigo): (pk, precio, huella(descripcion, precio), codigo)
+            for codigo, pk, descripcion, precio in articulos.values_list('codigo', 'id', 'descripcion', 'precio').iterator(chunk_size=10000)
+        }
+    else:
+        existentes = {
+            clave_codigo(codigo): (pk, precio, None, codigo)
+            for codigo, pk, precio in articulos.values_list('codigo', 'id', 'precio').iterator(chunk_size=10000)
+        }
+    # MySQL no admite indicar las columnas del conflicto, usa cualquier indice unico (unique_articulo_cliente)
+    unique_fields = ['cliente', 'codigo'] if connection.features.supports_update_conflicts_with_target else None
+    # Todos los precios de la importacion quedan vigentes desde el mismo momento
+    ahora = timezone.now()
+
+    vistos = set()
+    errores = []
+    # Ids de los articulos escritos, para marcarlos en el feed de cambios al final de la transaccion
+    escritos = set()
+    total_errores = procesados = insertados = actualizados = omitidos = 0
+
+    with transaction.atomic():
+        for origen, lote, primera_fila in _lotes(hojas, tamano_lote):
+            validas, errores_lote = validar_lote(lote, primera_fila, vistos)
+            total_errores += len(errores_lote)
+            errores.extend({**origen, **error} for error in errores_lote[:MAXIMO_ERRORES - len(errores)])
+            if total_errores:
+                continue
+
+            procesados += len(validas)
+            cambios, precios, nuevos = [], [], {}
+            for codigo, descripcion, precio in validas:
+                actual = existentes.get(clave_codigo(codigo))
+                if actual is None:
+                    insertados += 1
+                    nuevos[clave_codigo(codigo)] = precio
+                elif delta and actual[2] == huella(descripcion, precio):
+                    omitidos += 1
+                    continue
+                else:
+                    actualizados += 1
+                    escritos.add(actual[0])
+                    # Con el codigo grabado el conflicto del upsert encuentra la fila tambien donde la
+                    # comparacion distingue mayusculas (SQLite)
+                    codigo = actual[3]
+                    if actual[1] != precio:
+                        precios.append((actual[0], cliente.pk, codigo, precio))
+                cambios.append(Articulo(cliente=cliente, codigo=codigo, descripcion=descripcion, precio=precio))
+
+            if cambios:
+                Articulo.objects.bulk_create(
+                    cambios,
+                    update_conflicts=True,
+                    unique_fields=unique_fields,
+                    # `actualizado` lo completa bulk_create (auto_now), pero el UPDATE del conflicto solo
+                    # escribe las columnas listadas
+                    update_fields=['descripcion', 'precio', 'actualizado'],
+                )
+
+            # MySQL no devuelve los ids de los articulos insertados, se buscan para su primer precio
+            if nuevos:
+                codigos_nuevos = [articulo.codigo for articulo in cambios if clave_codigo(articulo.codigo) in nuevos]
+                ids_nuevos = dict(articulos.filter(codigo__in=codigos_nuevos).values_list('codigo', 'id'))
+                escritos.update(ids_nuevos.values())
+                precios.extend((pk, cliente.pk, codigo, nuevos[clave_codigo(codigo)]) for codigo, pk in ids_nuevos.items())
+            if precios:
+                registrar_precios(precios, ahora)
+
+            if al_procesar_lote:
+                al_procesar_lote(procesados)
+
+        if total_errores:
+            raise ArchivoInvalido(errores, total_errores)
+        sellar_cambios((pk, cliente.pk) for pk in escritos)
+
+    invalidar_catalogo(cliente.pk)
+
+    return {
+        'procesados': procesados,
+        'insertados': insertados,
+        'actualizados': actualizados,
+        'omitidos': omitidos,
+        'sin_cambios': len(existentes.keys() - vistos),
+    }
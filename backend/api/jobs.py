@@ -0,0 +1,257 @@
+import shutil
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .importers import ArchivoInvalido, upsert_articulos
+from .lectores import leer_archivos
+from .models import Importacion
+
+
+def encolar_importacion(cliente, archivo):
+    """
+    Guarda el archivo subido en `tmp/` y registra una importacion pendiente para el worker.
+    """
+    # `save` copia el archivo por chunks, no lo carga entero en memoria
+    path = default_storage.save(f'tmp/{int(time.time())}_{archivo.name}', archivo)
+    return Importacion.objects.create(cliente=cliente, archivo=path, nombre_archivo=archivo.name)
+
+
+# Bytes que se copian por vez del cuerpo del request al archivo de una carga por partes
+TAMANO_BLOQUE = 64 * 1024
+
+
+class CargaInvalida(Exception):
+    """
+    La parte recibida o el pedido de finalizar no corresponde al estado de la carga.
+    """
+
+
+class CargaDesfasada(CargaInvalida):
+    """
+    La parte no empieza donde termina lo recibido hasta ahora. `recibidos` indica desde donde reanudar.
+    """
+
+    def __init__(self, recibidos):
+        super().__init__(f'La carga continua en el byte {recibidos}')
+        self.recibidos = recibidos
+
+
+def iniciar_carga(cliente, nombre, tamano):
+    """
+    Registra una carga por partes de `tamano` bytes y crea su archivo vacio en `tmp/`.
+    """
+    path = default_storage.save(f'tmp/{int(time.time())}_{nombre}', ContentFile(b''))
+    return Importacion.objects.create(
+        cliente=cliente, archivo=path, nombre_archivo=nombre, tamano=tamano, estado=Importacion.SUBIENDO,
+    )
+
+
+def cargas_de(cliente):
+    """
+    Importaciones visibles para `cliente` (todas si es None). Los ids son correlativos y no alcanzan como secreto.
+    """
+    importaciones = Importacion.objects.all()
+    return importaciones if cliente is None else importaciones.filter(cliente=cliente)
+
+
+def agregar_parte(pk, offset, contenido, cliente=None):
+    """
+    Agrega a una carga por partes lo que se lea de `contenido` (el cuerpo del request), que empieza en el
+    byte `offset`, de a `TAMANO_BLOQUE` bytes, sin cargar la parte entera en memoria.
+
+    `offset` tiene que coincidir con los bytes ya recibidos; si no, se lanza `CargaDesfasada` con el punto
+    desde donde reanudar. El cuerpo se copia primero a un archivo propio de la parte, sin bloquear nada,
+    porque leerlo depende de la red. Con la parte completa se bloquea la fila de la importacion, se vuelve
+    a controlar `offset` y la parte se copia al archivo de la carga, una copia local y corta. Si la misma
+    parte llega dos veces a la vez, la segunda en confirmarse recibe `CargaDesfasada` y no pisa nada; una
+    parte cortada a la mitad no llega al archivo de la carga.
+    Con `cliente`, una carga de otro cliente se trata como inexistente (`Importacion.DoesNotExist`).
+    """
+    cargas = cargas_de(cliente).filter(estado=Importacion.SUBIENDO)
+    importacion = cargas.get(pk=pk)
+    if offset != importacion.recibidos:
+        raise CargaDesfasada(importacion.recibidos)
+
+    parte = f'{importacion.archivo}.{uuid.uuid4().hex}.parte'
+    try:
+        with default_storage.open(parte, 'wb') as archivo:
+            while bloque := contenido.read(TAMANO_BLOQUE):
+                if offset + archivo.tell() + len(bloque) > importacion.tamano:
+                    raise CargaInvalida(f'La carga supera el tamaño declarado ({importacion.tamano} bytes)')
+                archivo.write(bloque)
+
+        with transaction.atomic():
+            importacion = cargas.select_for_update().get(pk=pk)
+            if offset != importacion.recibidos:
+                raise CargaDesfasada(importacion.recibidos)
+
+            with default_storage.open(importacion.archivo, 'r+b') as destino, default_storage.open(parte, 'rb') as origen:
+                destino.seek(offset)
+                shutil.copyfileobj(origen, destino, TAMANO_BLOQUE)
+                destino.truncate()
+                importacion.recibidos = destino.tell()
+
+            importacion.save(update_fields=['recibidos'])
+    finally:
+        default_storage.delete(parte)
+    return importacion
+
+
+def finalizar_carga(pk, cliente=None):
+    """
+    Pasa una carga por partes completa a la cola del worker, que la importa como cualquier otra.
+    """
+    cargas = cargas_de(cliente)
+    completa = cargas.filter(pk=pk, estado=Importacion.SUBIENDO, recibidos=F('tamano')).update(
+        estado=Importacion.PENDIENTE
+    )
+    importacion = cargas.get(pk=pk)
+    if not completa:
+        if importacion.estado != Importacion.SUBIENDO:
+            raise CargaInvalida('La carga ya fue finalizada')
+        raise CargaDesfasada(importacion.recibidos)
+    return importacion
+
+
+def tomar_importacion():
+    """
+    Toma la importacion pendiente mas antigua y la marca como en proceso.
+
+    El cambio de estado se hace con un UPDATE condicionado al estado pendiente, de modo que si varios
+    workers compiten por la misma importacion solo uno la obtiene. Devuelve None si la cola esta vacia.
+    """
+    while True:
+        importacion = Importacion.objects.filter(estado=Importacion.PENDIENTE).order_by('id').first()
+        if importacion is None:
+            return None
+
+        tomada = Importacion.objects.filter(pk=importacion.pk, estado=Importacion.PENDIENTE).update(
+            estado=Importacion.PROCESANDO, iniciada=timezone.now(), intentos=F('intentos') + 1
+        )
+        if tomada:
+            importacion.refresh_from_db()
+            return importacion
+
+
+def clave_avance(pk):
+    return f'importacion:{pk}:avance'
+
+
+def avance_importacion(pk):
+    """
+    Filas procesadas por una importacion en curso, segun su ultimo latido (None si no hay latido vigente).
+    """
+    return cache.get(clave_avance(pk))
+
+
+def recuperar_importaciones():
+    """
+    Devuelve a la cola las importaciones en proceso cuyo worker dejo de publicar su latido (se corto el
+    proceso o la maquina): sin esto quedaban en proceso para siempre. Cada importacion corre en una sola
+    transaccion, asi que la del worker caido se deshizo y se puede repetir. Las que ya se tomaron
+    `IMPORTACION_REINTENTOS` veces quedan con error, por si es el archivo el que tira abajo al worker.
+
+    Devuelve la cantidad de importaciones recuperadas.
+    """
+    # El latido vence a los IMPORTACION_VENCIMIENTO segundos: las tomadas hace menos pueden no tener latido todavia
+    limite = timezone.now() - timedelta(seconds=settings.IMPORTACION_VENCIMIENTO)
+    vencidas = Importacion.objects.filter(estado=Importacion.PROCESANDO, iniciada__lt=limite)
+
+    recuperadas = 0
+    for importacion in vencidas.only('pk', 'archivo', 'intentos'):
+        if avance_importacion(importacion.pk) is not None:
+            continue
+        if importacion.intentos < settings.IMPORTACION_REINTENTOS:
+            cambios = {'estado': Importacion.PENDIENTE, 'iniciada': None}
+        else:
+            cambios = {
+                'estado': Importacion.ERROR,
+                'errores': [f'El worker dejo de responder en los {importacion.intentos} intentos de procesarla'],
+                'finalizada': timezone.now(),
+            }
+        # Condicionado como en `tomar_importacion`: si otro worker la recupero antes, no se toca
+        if vencidas.filter(pk=importacion.pk).update(**cambios):
+            recuperadas += 1
+            if cambios['estado'] == Importacion.ERROR:
+                default_storage.delete(importacion.archivo)
+    return recuperadas
+
+
+class _Avance:
+    """
+    Publica en el cache el avance de una importacion y un latido que indica que el worker sigue vivo.
+
+    La importacion corre dentro de una unica transaccion; guardar el avance en la base desde otra conexion
+    competia por los bloqueos con esa transaccion. El cache no participa de la transaccion: las consultas a
+    `/api/v1/imports/<id>/` ven las filas procesadas mientras el import avanza. Un hilo renueva el latido cada
+    `IMPORTACION_LATIDO` segundos aunque un lote tarde, y la clave vence sola si el worker se corta (ver
+    `recuperar_importaciones`).
+    """
+
+    def __init__(self, importacion):
+        self.clave = clave_avance(importacion.pk)
+        self.procesados = 0
+        self.detenido = threading.Event()
+        self._publicar()
+        self.hilo = threading.Thread(target=self._latir, daemon=True)
+        self.hilo.start()
+
+    def __call__(self, procesados):
+        self.procesados = procesados
+        self._publicar()
+
+    def _publicar(self):
+        cache.set(self.clave, self.procesados, settings.IMPORTACION_VENCIMIENTO)
+
+    def _latir(self):
+        while not self.detenido.wait(settings.IMPORTACION_LATIDO):
+            self._publicar()
+
+    def cerrar(self):
+        self.detenido.set()
+        self.hilo.join()
+        cache.delete(self.clave)
+
+
+def procesar_importacion(importacion):
+    """
+    Ejecuta una importacion tomada por el worker y guarda el resultado (o el error) en la base.
+    """
+    avance = _Avance(importacion)
+    try:
+        try:
+            with default_storage.open(importacion.archivo, 'rb') as archivo:
+                resultado = upsert_articulos(
+                    importacion.cliente,
+                    leer_archivos([(archivo, importacion.nombre_archivo)], settings.IMPORTACION_PROCESOS),
+                    al_procesar_lote=avance,
+                )
+        except ArchivoInvalido as e:
+            importacion.estado = Importacion.ERROR
+            importacion.errores = e.errores
+        except Exception as e:
+            importacion.estado = Importacion.ERROR
+            importacion.errores = [str(e)]
+        else:
+            importacion.estado = Importacion.FINALIZADA
+            for campo, valor in resultado.items():
+                setattr(importacion, campo, valor)
+        finally:
+            default_storage.delete(importacion.archivo)
+
+        importacion.finalizada = timezone.now()
+        importacion.save()
+    finally:
+        # El latido sigue hasta guardar el resultado: sin el, la importacion pareceria abandonada
+        avance.cerrar()
+    return importacion
@@ -0,0 +1,206 @@
+import io
+import os
+import pickle
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import suppress
+from itertools import islice
+
+import pandas as pd
+from openpyxl import load_workbook
+
+# Este modulo no importa nada de Django: sus funciones corren tambien en los procesos de `leer_archivos`
+
+# Columnas del archivo que se importan, el resto se ignora
+COLUMNAS = ('codigo', 'descripcion', 'precio')
+
+# Filas por bloque que un proceso del pool escribe en el archivo temporal de su hoja
+FILAS_POR_BLOQUE = 5000
+
+# Pool de procesos de `leer_archivos`, compartido por los requests del proceso y creado al primer uso
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def leer_filas_xlsx(archivo, hoja=None):
+    """
+    Recorre una hoja de un XLSX (la primera si no se indica) en modo solo lectura y devuelve tuplas
+    (codigo, descripcion, precio).
+
+    `archivo` puede ser una ruta o un archivo abierto (por ejemplo el `UploadedFile` del request). Las filas
+    se leen de a una desde el XML de la hoja, por lo que la memoria usada no depende del tamaño del archivo.
+    """
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = (libro[hoja] if hoja is not None else libro.worksheets[0]).iter_rows(values_only=True)
+        encabezado = [str(valor).strip().lower() if valor is not None else None for valor in next(filas, ())]
+
+        faltantes = [columna for columna in COLUMNAS if columna not in encabezado]
+        if faltantes:
+            raise ValueError(f"Missing columns: {', '.join(faltantes)}")
+        indices = [encabezado.index(columna) for columna in COLUMNAS]
+
+        # Las filas vacias se devuelven igual para no perder la numeracion, las descarta `validar_lote`
+        for fila in filas:
+            yield tuple(fila[i] if i < len(fila) else None for i in indices)
+    finally:
+        libro.close()
+
+
+def leer_filas(archivo, nombre, hoja=None):
+    """
+    Devuelve las filas (codigo, descripcion, precio) de una hoja de un archivo Excel segun su extension.
+
+    Los XLSX se leen fila a fila con `leer_filas_xlsx`. Los XLS (formato binario viejo) solo los puede
+    leer xlrd a traves de pandas, por lo que en ese caso se arma un DataFrame con las columnas importadas.
+    """
+    if nombre.endswith('.xlsx'):
+        return leer_filas_xlsx(archivo, hoja)
+
+    # Sin el dtype pandas convierte codigos como "0101" en el numero 101
+    df = pd.read_excel(archivo, sheet_name=hoja or 0, usecols=list(COLUMNAS), dtype={'codigo': str})
+    return df[list(COLUMNAS)].itertuples(index=False, name=None)
+
+
+def hojas(archivo, nombre):
+    """
+    Devuelve los nombres de las hojas de un archivo Excel, sin leer su contenido.
+    """
+    if nombre.endswith('.xlsx'):
+        libro = load_workbook(archivo, read_only=True)
+        try:
+            return libro.sheetnames
+        finally:
+            libro.close()
+
+    with pd.ExcelFile(archivo) as libro:
+        return libro.sheet_names
+
+
+def leer_hoja(origen, nombre, hoja):
+    """
+    Lee una hoja en un proceso del pool y la guarda en un archivo temporal, en bloques de `FILAS_POR_BLOQUE`
+    filas. Devuelve la ruta del archivo, que se lee (y se borra) con `leer_bloques`.
+
+    Los bloques se guardan con pickle y no en Arrow porque una columna de Excel mezcla numeros, textos y
+    fechas, y `validar_lote` necesita el tipo original de cada celda. `origen` es la ruta del archivo o su
+    contenido.
+    """
+    if isinstance(origen, bytes):
+        origen = io.BytesIO(origen)
+    descriptor, ruta = tempfile.mkstemp(prefix='hoja-', suffix='.bloques')
+    try:
+        with os.fdopen(descriptor, 'wb') as archivo:
+            filas = iter(leer_filas(origen, nombre, hoja))
+            while bloque := list(islice(filas, FILAS_POR_BLOQUE)):
+                pickle.dump(bloque, archivo, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        _borrar(ruta)
+        raise ValueError(f"{nombre} ({hoja}): {e}") from None
+    return ruta
+
+
+def leer_bloques(ruta):
+    """
+    Devuelve de a una las filas que `leer_hoja` guardo en `ruta`, con un bloque en memoria por vez, y
+    borra el archivo al terminar.
+    """
+    try:
+        with open(ruta, 'rb') as archivo:
+            while True:
+                try:
+                    bloque = pickle.load(archivo)
+                except EOFError:
+                    return
+                yield from bloque
+    finally:
+        _borrar(ruta)
+
+
+def _borrar(ruta):
+    with suppress(FileNotFoundError):
+        os.unlink(ruta)
+
+
+def _borrar_resultado(futuro):
+    # Hojas leidas que nadie va a consumir (se corto la importacion antes de llegar a ellas)
+    if not futuro.cancelled() and futuro.exception() is None:
+        _borrar(futuro.result())
+
+
+def pool_de_procesos(procesos=None):
+    """
+    Devuelve el pool de procesos de `leer_archivos`, que se crea en el primer uso con `procesos` procesos
+    (todos los CPUs si es None) y se reutiliza en los requests siguientes: arrancar los procesos (e importar
+    pandas y openpyxl en cada uno) en cada carga costaba mas que leer un archivo chico.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=procesos or os.cpu_count() or 1)
+        return _pool
+
+
+def _descartar_pool(pool):
+    # Un proceso del pool murio (por ejemplo, por falta de memoria): la proxima carga crea otro pool
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _origen(archivo):
+    # Los procesos del pool no comparten el archivo abierto: les pasamos la ruta o, si el archivo
+    # esta en memoria (uploads chicos), su contenido
+    if isinstance(archivo, (str, os.PathLike)):
+        return archivo
+    if hasattr(archivo, 'temporary_file_path'):
+        return archivo.temporary_file_path()
+    archivo.seek(0)
+    return archivo.read()
+
+
+def leer_archivos(archivos, procesos=None):
+    """
+    Lee todas las hojas de uno o varios archivos Excel.
+
+    `archivos` es una lista de pares (archivo, nombre). Devuelve, en el orden de los archivos y sus hojas,
+    pares ({'archivo': nombre, 'hoja': hoja}, filas). Si hay una sola hoja se lee fila a fila en este
+    proceso. Si hay varias, cada hoja se decodifica en un proceso del pool compartido (`pool_de_procesos`,
+    la lectura de XLSX es CPU intensiva) y los resultados se entregan en orden, para que quien escribe en
+    la base procese siempre las filas en el mismo orden. Cada proceso deja su hoja en un archivo temporal y
+    las filas se leen de ahi por bloques: en memoria queda un bloque por vez, no las hojas enteras.
+    """
+    tareas = []
+    for archivo, nombre in archivos:
+        for hoja in hojas(archivo, nombre):
+            tareas.append((archivo, nombre, hoja))
+
+    if len(tareas) == 1:
+        archivo, nombre, hoja = tareas[0]
+        if hasattr(archivo, 'seek'):
+            archivo.seek(0)
+        yield {'archivo': nombre, 'hoja': hoja}, leer_filas(archivo, nombre, hoja)
+        return
+
+    origenes = {id(archivo): _origen(archivo) for archivo, _, _ in tareas}
+    pool = pool_de_procesos(procesos)
+    futuros = []
+    try:
+        futuros = [pool.submit(leer_hoja, origenes[id(archivo)], nombre, hoja) for archivo, nombre, hoja in tareas]
+        for (_, nombre, hoja), futuro in zip(tareas, futuros):
+            ruta = futuro.result()
+            try:
+                yield {'archivo': nombre, 'hoja': hoja}, leer_bloques(ruta)
+            finally:
+                _borrar(ruta)
+    except BrokenProcessPool:
+        _descartar_pool(pool)
+        raise
+    finally:
+        for futuro in futuros:
+            futuro.cancel()
+            futuro.add_done_callback(_borrar_resultado)
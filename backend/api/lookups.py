@@ -0,0 +1,27 @@
+import re
+
+from django.db.models import CharField, Lookup
+from django.db.models.lookups import IContains
+
+# Operadores del modo booleano de MySQL que no dejamos pasar desde el texto del usuario
+OPERADORES_FULLTEXT = re.compile(r'[+\-<>()~*"@]')
+
+
+@CharField.register_lookup
+class Busqueda(Lookup):
+    """
+    Busqueda de texto: `descripcion__busqueda='tornillo acero'`.
+
+    En MySQL usa el indice FULLTEXT (MATCH ... AGAINST en modo booleano, todas las palabras y por prefijo).
+    En el resto de las bases se resuelve como un `icontains`, que alcanza para desarrollo y tests.
+    """
+    lookup_name = 'busqueda'
+
+    def as_mysql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        terminos = [' '.join(f'+{palabra}*' for palabra in OPERADORES_FULLTEXT.sub(' ', str(param)).split()) for param in rhs_params]
+        return f'MATCH ({lhs}) AGAINST ({rhs} IN BOOLEAN MODE)', lhs_params + terminos
+
+    def as_sql(self, compiler, connection):
+        return IContains(self.lhs, self.rhs).as_sql(compiler, connection)
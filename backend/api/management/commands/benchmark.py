@@ -0,0 +1,248 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import xlsxwriter
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.urls import reverse
+
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Articulo, Cliente
+from api.renderers import OrjsonRenderer
+from api.serializers import ArticuloListadoSerializer, ArticuloSerializer
+
+ESCENARIOS = (
+    'upload', 'reupload', 'download_xlsx', 'download_csv', 'list', 'list_page', 'crud',
+    'serialize_drf', 'serialize_values',
+)
+
+# Ciclos alta, consulta, modificacion y baja de un articulo que corre el escenario `crud`
+CICLOS_CRUD = 50
+
+# Articulos por pagina: `list` recorre todo el catalogo pagina por pagina, `list_page` pide solo la primera
+PAGINA_LIST = 1000
+PAGINA_LIST_PAGE = 100
+
+
+def libro_sintetico(filas):
+    """
+    Genera un XLSX con `filas` articulos sinteticos (codigo, descripcion, precio) y devuelve su contenido.
+    """
+    with tempfile.TemporaryFile() as salida:
+        libro = xlsxwriter.Workbook(salida, {'constant_memory': True})
+        hoja = libro.add_worksheet()
+        hoja.write_row(0, 0, ('codigo', 'descripcion', 'precio'))
+        for n in range(1, filas + 1):
+            hoja.write_row(n, 0, (f'ART-{n:07d}', f'Articulo sintetico {n}', round(n % 10000 + 0.99, 2)))
+        libro.close()
+        salida.seek(0)
+        return salida.read()
+
+
+class ContadorConsultas:
+    """
+    Cuenta las consultas SQL de una conexion (con `connection.execute_wrapper`). No usa `connection.queries`
+    como CaptureQueriesContext: cada request del Client lo vacia (request_started llama a reset_queries) y
+    en un escenario con varios requests solo quedaban las consultas del ultimo.
+    """
+
+    def __init__(self):
+        self.cantidad = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.cantidad += 1
+        return execute(sql, params, many, context)
+
+
+def comprobar(response, *estados):
+    if response.status_code not in estados:
+        raise CommandError(
+            f"{response.request['REQUEST_METHOD']} {response.request['PATH_INFO']} respondio "
+            f"{response.status_code}: {response.content[:500]!r}"
+        )
+    return response
+
+
+def medir(funcion, preparar=None):
+    """
+    Ejecuta `funcion` y devuelve el tiempo, el pico de memoria de Python y las consultas SQL que hizo.
+
+    tracemalloc hace mucho mas lento el codigo que mide, por eso el tiempo y las consultas se toman en
+    una primera corrida y la memoria en una segunda. `preparar` deja la base en el mismo estado antes de
+    cada corrida.
+    """
+    if preparar:
+        preparar()
+    cache.clear()
+    consultas = ContadorConsultas()
+    with connection.execute_wrapper(consultas):
+        inicio = time.perf_counter()
+        funcion()
+        segundos = time.perf_counter() - inicio
+
+    if preparar:
+        preparar()
+    cache.clear()
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'segundos': round(segundos, 4),
+        'memoria_pico_mb': round(pico / 1024 / 1024, 2),
+        'consultas': consultas.cantidad,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide tiempo, pico de memoria y consultas de la carga, la descarga y el listado de articulos con '
+        'catalogos sinteticos. Corre sobre una base de test creada para la ocasion (SQLite o MySQL segun '
+        'DATABASES) y guarda los resultados en JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', type=int, nargs='+', default=[1000, 10000], help='Cantidad de articulos (ej: 1000 10000 100000 1000000)')
+        parser.add_argument('--escenarios', nargs='+', choices=ESCENARIOS, default=list(ESCENARIOS))
+        parser.add_argument('--salida', default='benchmarks', help='Directorio donde se guarda el JSON con los resultados')
+        parser.add_argument('--keepdb', action='store_true', help='Reutiliza la base de test entre corridas')
+        parser.add_argument(
+            '--conn-max-age', type=int, default=None,
+            help='Reemplaza CONN_MAX_AGE durante la corrida (0 abre una conexion por request) para comparar la latencia del escenario crud',
+        )
+
+    def handle(self, *args, **options):
+        bases = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+        # Se lee al abrir cada conexion, se puede cambiar aunque la base de test ya este creada
+        if options['conn_max_age'] is not None:
+            connections['default'].settings_dict['CONN_MAX_AGE'] = options['conn_max_age']
+        try:
+            # Cache en memoria para no mezclar las respuestas del benchmark con las del servidor
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+                resultados = self.correr(options['tamanos'], options['escenarios'])
+        finally:
+            teardown_databases(bases, verbosity=0, keepdb=options['keepdb'])
+
+        os.makedirs(options['salida'], exist_ok=True)
+        fecha = datetime.now(timezone.utc)
+        path = os.path.join(options['salida'], f"benchmark_{fecha:%Y%m%d_%H%M%S}.json")
+        with open(path, 'w') as archivo:
+            json.dump({
+                'fecha': fecha.isoformat(),
+                'base': connection.vendor,
+                'conn_max_age': connections['default'].settings_dict['CONN_MAX_AGE'],
+                'resultados': resultados,
+            }, archivo, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {path}"))
+
+    def correr(self, tamanos, escenarios):
+        client = Client()
+        resultados = []
+
+        for filas in tamanos:
+            Cliente.objects.all().delete()
+            Cliente.objects.create(nombre='Benchmark')
+            libro = libro_sintetico(filas)
+
+            def subir():
+                archivo = SimpleUploadedFile('benchmark.xlsx', libro)
+                comprobar(client.post(reverse('upload-excel'), {'file': archivo}), 200)
+
+            def descargar(formato):
+                response = comprobar(client.get(reverse('download-excel'), {'format': formato}), 200)
+                for _ in response.streaming_content:
+                    pass
+
+            def listar(params, todas):
+                # Con `todas` sigue los `next` hasta el final del catalogo
+                url = reverse('articulo-list')
+                while url:
+                    siguiente = comprobar(client.get(url, params), 200).json()['next']
+                    # El `next` ya trae los parametros
+                    url, params = (siguiente if todas else None), None
+
+            def vaciar_catalogo():
+                Articulo.objects.all().delete()
+
+            def serializar_drf():
+                # Serializacion y render de todo el catalogo como lo hacia el listado antes del camino rapido
+                JSONRenderer().render(ArticuloSerializer(Articulo.objects.all(), many=True).data)
+
+            def serializar_values():
+                serializer = ArticuloListadoSerializer()
+                OrjsonRenderer().render(serializer.representar(Articulo.objects.values_list(*serializer.columnas)))
+
+            latencias = []
+
+            def crud():
+                # Requests chicos de ArticuloViewSet: acá pesa abrir la conexion en cada request
+                cliente_id = Cliente.objects.values_list('pk', flat=True).first()
+                latencias.clear()
+                for n in range(CICLOS_CRUD):
+                    datos = {'cliente': cliente_id, 'codigo': f'CRUD-{n}', 'descripcion': 'Articulo CRUD', 'precio': 1}
+                    inicio = time.perf_counter()
+                    response = comprobar(client.post(reverse('articulo-list'), datos, content_type='application/json'), 201)
+                    latencias.append(time.perf_counter() - inicio)
+
+                    url = reverse('articulo-detail', args=[response.json()['id']])
+                    for metodo, argumentos in ((client.get, {}), (client.patch, {'data': {'precio': 2}, 'content_type': 'application/json'}), (client.delete, {})):
+                        inicio = time.perf_counter()
+                        comprobar(metodo(url, **argumentos), 200, 204)
+                        latencias.append(time.perf_counter() - inicio)
+
+            # escenario: (funcion, preparacion antes de cada corrida)
+            pasos = {
+                'upload': (subir, vaciar_catalogo),
+                'reupload': (subir, None),
+                'download_xlsx': (lambda: descargar('xlsx'), None),
+                'download_csv': (lambda: descargar('csv'), None),
+                'list': (lambda: listar({'page_size': PAGINA_LIST}, todas=True), None),
+                'list_page': (lambda: listar({'page_size': PAGINA_LIST_PAGE, 'fields': 'codigo,descripcion,precio'}, todas=False), None),
+                'crud': (crud, None),
+                'serialize_drf': (serializar_drf, None),
+                'serialize_values': (serializar_values, None),
+            }
+
+            # El resto de los escenarios necesita el catalogo cargado
+            if 'upload' not in escenarios:
+                subir()
+
+            for escenario in ESCENARIOS:
+                if escenario not in escenarios:
+                    continue
+                resultado = {'escenario': escenario, 'filas': filas, **medir(*pasos[escenario])}
+                if escenario in ('list', 'list_page'):
+                    resultado['page_size'] = PAGINA_LIST if escenario == 'list' else PAGINA_LIST_PAGE
+                if escenario == 'crud':
+                    # La ultima corrida de `medir` es con tracemalloc: las latencias por request se toman de otra corrida
+                    crud()
+                    percentiles = statistics.quantiles(latencias, n=100)
+                    resultado['requests'] = len(latencias)
+                    resultado['p50_ms'] = round(percentiles[49] * 1000, 2)
+                    resultado['p99_ms'] = round(percentiles[98] * 1000, 2)
+                resultados.append(resultado)
+                self.stdout.write(
+                    f"{escenario:>16} {filas:>9} filas: {resultado['segundos']:>9.3f}s "
+                    f"{resultado['memoria_pico_mb']:>9.2f} MB {resultado['consultas']:>6} consultas"
+                    + (f" p50 {resultado['p50_ms']}ms p99 {resultado['p99_ms']}ms" if 'p50_ms' in resultado else '')
+                    + (f" (paginas de {resultado['page_size']})" if 'page_size' in resultado else '')
+                )
+
+            if Articulo.objects.count() != filas:
+                raise CommandError(f"El catalogo quedo con {Articulo.objects.count()} articulos en lugar de {filas}")
+
+        return resultados
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.carga_masiva import TAMANO_LOTE, DatosInvalidos, cargar_archivo
+from api.exporters import FormatoNoDisponible
+
+
+class Command(BaseCommand):
+    help = (
+        'Carga datos en bloque desde fixtures JSON, JSON Lines, CSV o Parquet (semillas y restauraciones). '
+        'Reemplaza a loaddata para volumenes grandes: inserta por lotes y una carga cortada sigue desde donde quedo'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivos', nargs='+', help='Archivos a cargar, en orden')
+        parser.add_argument('--modelo', help='Modelo de los registros planos (CSV, Parquet, JSON Lines sin "model"), por ejemplo api.articulo')
+        parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help='Filas por INSERT y por transaccion')
+
+    def handle(self, *args, **options):
+        for ruta in options['archivos']:
+            def informar(cargadas, segundos, ruta=ruta):
+                if options['verbosity'] > 1:
+                    self.stdout.write(f"{ruta}: {cargadas} filas ({cargadas / segundos:,.0f} filas/s)")
+
+            try:
+                resultado = cargar_archivo(ruta, options['modelo'], options['lote'], informar)
+            except (DatosInvalidos, FormatoNoDisponible, OSError) as e:
+                raise CommandError(f"{ruta}: {e}")
+
+            if resultado['omitido']:
+                self.stdout.write(f"{ruta}: ya cargado ({resultado['filas']} filas), se omite")
+                continue
+
+            segundos = resultado['segundos']
+            velocidad = resultado['cargadas'] / segundos if segundos else 0
+            self.stdout.write(self.style.SUCCESS(
+                f"{ruta}: {resultado['cargadas']} filas en {segundos:.2f} s ({velocidad:,.0f} filas/s)"
+                + (f", se retomo desde la fila {resultado['filas'] - resultado['cargadas']}" if resultado['filas'] != resultado['cargadas'] else '')
+            ))
+            if resultado['articulos_omitidos']:
+                self.stdout.write(self.style.WARNING(
+                    f"{ruta}: {resultado['articulos_omitidos']} articulos no se insertaron (ya existian o la base los descarto)"
+                ))
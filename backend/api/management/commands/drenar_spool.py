@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, InterfaceError, OperationalError, close_old_connections, connection
+
+from api.importers import ArchivoInvalido
+from api.spool import LoteNoAplicable, aplicar_lote, apartar_lote, lotes_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Aplica en la base los lotes del spool de importaciones (/api/v1/upload/?spool=1)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera cuando el spool esta vacio o la base no responde')
+        parser.add_argument('--una-vez', action='store_true', help='Vacia el spool y termina en lugar de quedar esperando')
+
+    def handle(self, *args, **options):
+        # Un solo drenador aplica los lotes en orden de llegada: dos cargas del mismo cliente se escriben
+        # en el orden en que se recibieron
+        try:
+            while True:
+                close_old_connections()
+                aplicados = self.drenar()
+                if not aplicados:
+                    if options['una_vez']:
+                        return
+                    time.sleep(options['intervalo'])
+        finally:
+            connection.close()
+
+    def drenar(self):
+        """
+        Aplica los lotes pendientes. Devuelve cuantos se aplicaron, o None si la base dejo de responder
+        (el lote queda en el spool y se reintenta en la proxima vuelta).
+
+        Solo se reintentan los errores de conexion (OperationalError e InterfaceError: base caida o
+        reiniciandose, conexion cortada, bloqueo vencido). Los que fallarian igual en cada intento apartan el
+        lote con extension `.error`, para que no frene a los siguientes ni al drenador en cada reinicio: un
+        archivo truncado o corrupto (pyarrow lanza ArrowInvalid, que es un ValueError, u OSError), filas que
+        no pasan la validacion, o un error de datos de la base (un IntegrityError que no es el lote ya
+        aplicado, un DataError).
+        """
+        aplicados = 0
+        for ruta in lotes_pendientes():
+            try:
+                resultado = aplicar_lote(ruta)
+            except (OperationalError, InterfaceError) as e:
+                self.stderr.write(f"Error aplicando {ruta.name}: {e}")
+                return None
+            except FileNotFoundError:
+                # Lo aplico y borro otro drenador
+                continue
+            except (LoteNoAplicable, ArchivoInvalido, DatabaseError, OSError, ValueError) as e:
+                self.stderr.write(f"No se puede aplicar {ruta.name}: {e!r}, se aparta el lote")
+                apartar_lote(ruta)
+                continue
+
+            aplicados += 1
+            estado = 'ya estaba aplicado' if resultado is None else resultado
+            self.stdout.write(f"Lote {ruta.stem}: {estado}")
+        return aplicados
@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from api.jobs import procesar_importacion, recuperar_importaciones, tomar_importacion
+
+
+class Command(BaseCommand):
+    help = 'Procesa las importaciones de Excel encoladas desde /api/v1/upload/?async=1'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Cantidad de importaciones en paralelo')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera cuando la cola esta vacia')
+        parser.add_argument('--una-vez', action='store_true', help='Vacia la cola y termina en lugar de quedar esperando')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Procesando importaciones con {options['workers']} workers")
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for _ in range(options['workers']):
+                executor.submit(self.trabajar, options['intervalo'], options['una_vez'])
+
+    def trabajar(self, intervalo, una_vez):
+        # Cada hilo usa su propia conexion a la base, la cerramos al terminar
+        try:
+            while True:
+                # Como al empezar cada request: descarta la conexion si vencio DB_CONN_MAX_AGE o se corto
+                close_old_connections()
+                try:
+                    # Antes de tomar, devuelve a la cola las que quedaron en proceso por un worker caido
+                    recuperar_importaciones()
+                    importacion = tomar_importacion()
+                except Exception as e:
+                    # Por ejemplo si la base se esta reiniciando, reintentamos en el proximo intervalo
+                    self.stderr.write(f"Error tomando importaciones: {e}")
+                    importacion = None
+
+                if importacion is None:
+                    if una_vez:
+                        return
+                    time.sleep(intervalo)
+                    continue
+
+                importacion = procesar_importacion(importacion)
+                self.stdout.write(f"Importacion {importacion.pk} ({importacion.nombre_archivo}): {importacion.estado}")
+        finally:
+            connection.close()
@@ -0,0 +1,410 @@
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+import xlsxwriter
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings, setup_databases, teardown_databases
+from django.urls import reverse
+
+from api.importers import upsert_articulos
+from api.models import Articulo, Cliente
+
+# Tipos de trafico y su peso por defecto en la mezcla
+MEZCLA = 'lectura=60,escritura=25,upload=10,download=5'
+CATEGORIAS = ('lectura', 'escritura', 'upload', 'download')
+
+# Como termina cada request. `conflicto` es un rechazo esperable (codigo repetido en un alta), `bloqueo`
+# un lock wait timeout de MySQL o "database is locked" de SQLite y `deadlock` un deadlock detectado por la base
+RESULTADOS = ('ok', 'conflicto', 'bloqueo', 'deadlock', 'error')
+
+
+def leer_mezcla(texto):
+    """
+    Convierte 'lectura=60,escritura=25,...' en {categoria: peso}. Las categorias que no se indican no se usan.
+    """
+    pesos = {}
+    for parte in texto.split(','):
+        categoria, _, peso = parte.partition('=')
+        categoria = categoria.strip()
+        if categoria not in CATEGORIAS:
+            raise CommandError(f"Categoria desconocida en --mezcla: {categoria} (se aceptan {', '.join(CATEGORIAS)})")
+        try:
+            pesos[categoria] = float(peso)
+        except ValueError:
+            raise CommandError(f'Peso invalido en --mezcla: {parte}')
+    if not any(pesos.values()):
+        raise CommandError('--mezcla necesita al menos una categoria con peso mayor a cero')
+    return pesos
+
+
+def clasificar(estado, texto):
+    """
+    Clasifica un request segun su estado HTTP y el texto de la respuesta o de la excepcion.
+    """
+    if 0 < estado < 400:
+        return 'ok'
+    texto = texto.lower()
+    if 'deadlock' in texto:
+        return 'deadlock'
+    if 'lock wait timeout' in texto or 'database is locked' in texto or 'database table is locked' in texto:
+        return 'bloqueo'
+    if estado in (400, 409) and ('ya existe' in texto or 'unique' in texto):
+        return 'conflicto'
+    return 'error'
+
+
+def percentil(ordenados, p):
+    # Percentil por rango mas cercano sobre una lista ya ordenada
+    return ordenados[min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))]
+
+
+def libro(codigos, precios):
+    """
+    Contenido de un XLSX con los articulos `codigos` en ese orden y los precios indicados.
+    """
+    with tempfile.TemporaryFile() as salida:
+        libro = xlsxwriter.Workbook(salida, {'constant_memory': True})
+        hoja = libro.add_worksheet()
+        hoja.write_row(0, 0, ('codigo', 'descripcion', 'precio'))
+        for n, (codigo, precio) in enumerate(zip(codigos, precios), start=1):
+            hoja.write_row(n, 0, (codigo, f'Articulo {codigo}', precio))
+        libro.close()
+        salida.seek(0)
+        return salida.read()
+
+
+class ClienteLocal:
+    """
+    Requests a la aplicacion de este proceso con `django.test.Client`, uno por hilo. Cada hilo usa su
+    propia conexion a la base, como los hilos de un servidor.
+    """
+
+    def __init__(self):
+        self.hilo = threading.local()
+
+    def pedir(self, metodo, ruta, params=None, datos=None, archivo=None):
+        if not hasattr(self.hilo, 'client'):
+            self.hilo.client = Client(raise_request_exception=False)
+        client = self.hilo.client
+
+        if archivo is not None:
+            response = client.post(ruta, {'file': SimpleUploadedFile(*archivo)})
+        elif datos is not None:
+            response = getattr(client, metodo)(ruta, json.dumps(datos), content_type='application/json')
+        else:
+            response = getattr(client, metodo)(ruta, params or {})
+
+        cuerpo = b''.join(response.streaming_content) if response.streaming else response.content
+        # Las excepciones no capturadas por la vista (500) quedan en exc_info, no en el cuerpo. La señal que
+        # la guarda es de todo el proceso, asi que un 500 de otro hilo puede dejarla en esta respuesta: solo
+        # se usa si esta tambien es un 500
+        if response.status_code >= 500 and getattr(response, 'exc_info', None):
+            cuerpo += str(response.exc_info[1]).encode('utf-8')
+        return response.status_code, cuerpo
+
+    def cerrar(self):
+        connection.close()
+
+
+class ClienteRemoto:
+    """
+    Requests HTTP a un servidor en `url` (http://localhost:8000), con el token indicado si hay uno.
+    """
+
+    def __init__(self, url, token=None, timeout=60):
+        self.url = url.rstrip('/')
+        self.headers = {'Authorization': f'Token {token}'} if token else {}
+        self.timeout = timeout
+
+    def pedir(self, metodo, ruta, params=None, datos=None, archivo=None):
+        url = self.url + ruta + (('&' if '?' in ruta else '?') + urlencode(params) if params else '')
+        headers = dict(self.headers)
+        cuerpo = None
+        if archivo is not None:
+            limite = uuid.uuid4().hex
+            nombre, contenido = archivo
+            cuerpo = (
+                f'--{limite}\r\nContent-Disposition: form-data; name="file"; filename="{nombre}"\r\n'
+                f'Content-Type: application/octet-stream\r\n\r\n'
+            ).encode('utf-8') + contenido + f'\r\n--{limite}--\r\n'.encode('utf-8')
+            headers['Content-Type'] = f'multipart/form-data; boundary={limite}'
+        elif datos is not None:
+            cuerpo = json.dumps(datos).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+
+        request = urllib.request.Request(url, data=cuerpo, headers=headers, method=metodo.upper())
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+        except OSError as e:
+            # Conexion rechazada o timeout: el request no llego a tener estado HTTP
+            return 0, str(e).encode('utf-8')
+
+    def cerrar(self):
+        pass
+
+
+class Estadisticas:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.resultados = defaultdict(Counter)
+        self.ejemplos = {}
+
+    def registrar(self, operacion, segundos, resultado, texto):
+        with self.lock:
+            self.latencias[operacion].append(segundos)
+            self.resultados[operacion][resultado] += 1
+            # Un mensaje de cada tipo de falla, para el informe
+            if resultado not in ('ok', 'conflicto'):
+                self.ejemplos.setdefault(resultado, f'{operacion}: {texto[:300]}')
+
+    def resumen(self, segundos):
+        operaciones = []
+        for operacion in sorted(self.latencias):
+            ordenadas = sorted(self.latencias[operacion])
+            operaciones.append({
+                'operacion': operacion,
+                'requests': len(ordenadas),
+                **{resultado: self.resultados[operacion][resultado] for resultado in RESULTADOS},
+                **{f'p{p}_ms': round(percentil(ordenadas, p) * 1000, 2) for p in (50, 95, 99)},
+                'max_ms': round(ordenadas[-1] * 1000, 2),
+            })
+        total = sum(operacion['requests'] for operacion in operaciones)
+        return {
+            'segundos': round(segundos, 3),
+            'requests': total,
+            'requests_por_segundo': round(total / segundos, 1) if segundos else 0,
+            **{resultado: sum(operacion[resultado] for operacion in operaciones) for resultado in RESULTADOS},
+            'operaciones': operaciones,
+            'ejemplos': self.ejemplos,
+        }
+
+
+class PruebaCarga:
+    """
+    Trafico mixto contra la API desde varios hilos. Cada hilo elige una categoria segun la mezcla:
+
+    - lectura: una pagina del listado o el detalle de un articulo
+    - escritura: PATCH del precio de un articulo existente, o alta de un articulo con un codigo tomado de un
+      rango chico compartido por todos los hilos (compiten por `unique_articulo_cliente`) y su baja
+    - upload: un Excel con articulos existentes en distinto orden en cada hilo y ?delta=0, para que todas
+      las filas se escriban y las cargas simultaneas se bloqueen entre si en el indice unico
+    - download: la descarga en CSV del catalogo
+    """
+
+    def __init__(self, transporte, cliente_id, ids, codigos, pesos, filas_upload, codigos_alta, semilla):
+        self.transporte = transporte
+        self.cliente_id = cliente_id
+        self.ids = ids
+        self.categorias = list(pesos)
+        self.pesos = list(pesos.values())
+        self.codigos_alta = codigos_alta
+        self.semilla = semilla
+        self.estadisticas = Estadisticas()
+
+        aleatorio = random.Random(semilla)
+        self.libros = []
+        if pesos.get('upload'):
+            for _ in range(4):
+                muestra = aleatorio.sample(codigos, min(filas_upload, len(codigos)))
+                self.libros.append(libro(muestra, [round(aleatorio.uniform(1, 1000), 2) for _ in muestra]))
+
+        self.lock = threading.Lock()
+        self.restantes = None
+
+    def correr(self, hilos, duracion, requests):
+        self.restantes = requests
+        inicio = time.perf_counter()
+        fin = inicio + duracion
+        with ThreadPoolExecutor(max_workers=hilos) as executor:
+            for futuro in [executor.submit(self.trabajar, numero, fin) for numero in range(hilos)]:
+                futuro.result()
+        return self.estadisticas.resumen(time.perf_counter() - inicio)
+
+    def tomar(self):
+        if self.restantes is None:
+            return True
+        with self.lock:
+            self.restantes -= 1
+            return self.restantes >= 0
+
+    def trabajar(self, numero, fin):
+        aleatorio = random.Random(self.semilla + numero + 1)
+        try:
+            while time.perf_counter() < fin and self.tomar():
+                categoria = aleatorio.choices(self.categorias, self.pesos)[0]
+                inicio = time.perf_counter()
+                try:
+                    getattr(self, categoria)(aleatorio)
+                except Exception as e:
+                    # Una falla inesperada cuenta como error de esa operacion y el hilo sigue con la prueba
+                    self.estadisticas.registrar(categoria, time.perf_counter() - inicio, 'error', repr(e))
+        finally:
+            self.transporte.cerrar()
+
+    def medir(self, operacion, metodo, ruta, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            estado, cuerpo = self.transporte.pedir(metodo, ruta, **kwargs)
+        except Exception as e:
+            estado, cuerpo = 0, repr(e).encode('utf-8')
+        segundos = time.perf_counter() - inicio
+
+        # Las excepciones de la base van al final del cuerpo en el modo local
+        texto = '' if 0 < estado < 400 else (cuerpo[:1000] + cuerpo[-1000:]).decode('utf-8', 'replace')
+        self.estadisticas.registrar(operacion, segundos, clasificar(estado, texto), texto)
+        return estado, cuerpo
+
+    def lectura(self, aleatorio):
+        if aleatorio.random() < 0.5:
+            self.medir('listar', 'get', reverse('articulo-list'), params={'cliente': self.cliente_id, 'page_size': 50})
+        else:
+            self.medir('detalle', 'get', reverse('articulo-detail', args=[aleatorio.choice(self.ids)]))
+
+    def escritura(self, aleatorio):
+        if aleatorio.random() < 0.5:
+            url = reverse('articulo-detail', args=[aleatorio.choice(self.ids)])
+            self.medir('modificar', 'patch', url, datos={'precio': round(aleatorio.uniform(1, 1000), 2)})
+            return
+
+        codigo = f'CARGA-{aleatorio.randrange(self.codigos_alta)}'
+        datos = {'cliente': self.cliente_id, 'codigo': codigo, 'descripcion': 'Prueba de carga', 'precio': 1}
+        estado, cuerpo = self.medir('alta', 'post', reverse('articulo-list'), datos=datos)
+        if estado != 201:
+            return
+        try:
+            pk = json.loads(cuerpo)['id']
+        except (ValueError, KeyError, TypeError):
+            self.estadisticas.registrar('baja', 0, 'error', f'Respuesta del alta sin id: {cuerpo[:300]!r}')
+            return
+        self.medir('baja', 'delete', reverse('articulo-detail', args=[pk]))
+
+    def upload(self, aleatorio):
+        self.medir('upload', 'post', reverse('upload-excel') + '?delta=0', archivo=('carga.xlsx', aleatorio.choice(self.libros)))
+
+    def download(self, aleatorio):
+        self.medir('download', 'get', reverse('download-excel'), params={'format': 'csv'})
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga: trafico concurrente de lectura, escritura, upload y download contra la API. Informa '
+        'requests por segundo, percentiles de latencia, errores, bloqueos y deadlocks. Sin --url corre dentro '
+        'del proceso sobre una base de test creada para la ocasion (SQLite o MySQL segun DATABASES).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Servidor a probar (http://localhost:8000). Sin --url se usa la aplicacion de este proceso')
+        parser.add_argument('--token', help='Token de la API para los requests a --url')
+        parser.add_argument('--hilos', type=int, default=8, help='Requests simultaneos')
+        parser.add_argument('--duracion', type=float, default=10.0, help='Segundos de prueba')
+        parser.add_argument('--requests', type=int, default=None, help='Corta despues de esta cantidad de requests')
+        parser.add_argument('--mezcla', default=MEZCLA, help=f'Peso de cada tipo de trafico (por defecto {MEZCLA})')
+        parser.add_argument('--articulos', type=int, default=1000, help='Articulos del catalogo inicial (sin --url)')
+        parser.add_argument('--filas-upload', type=int, default=200, help='Filas de cada Excel subido')
+        parser.add_argument('--codigos-alta', type=int, default=20, help='Codigos distintos que usan las altas: menos codigos, mas conflictos')
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--keepdb', action='store_true', help='Reutiliza la base de test entre corridas')
+        parser.add_argument('--salida', default='benchmarks', help='Directorio donde se guarda el JSON con los resultados')
+
+    def handle(self, *args, **options):
+        pesos = leer_mezcla(options['mezcla'])
+        if options['url']:
+            resultado = self.correr_remoto(options, pesos)
+        else:
+            resultado = self.correr_local(options, pesos)
+
+        self.informar(resultado)
+        os.makedirs(options['salida'], exist_ok=True)
+        fecha = datetime.now(timezone.utc)
+        path = os.path.join(options['salida'], f"prueba_carga_{fecha:%Y%m%d_%H%M%S}.json")
+        with open(path, 'w') as archivo:
+            json.dump({'fecha': fecha.isoformat(), 'hilos': options['hilos'], 'mezcla': pesos, **resultado}, archivo, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {path}"))
+
+    def correr_local(self, options, pesos):
+        base = connections['default']
+        with tempfile.TemporaryDirectory() as directorio:
+            # La base de test de SQLite es en memoria y no se comparte entre las conexiones de los hilos
+            if base.vendor == 'sqlite' and not base.settings_dict['TEST'].get('NAME'):
+                base.settings_dict['TEST']['NAME'] = os.path.join(directorio, 'prueba_carga.sqlite3')
+
+            bases = setup_databases(verbosity=0, interactive=False, keepdb=options['keepdb'])
+            # Los 4xx y 5xx se cuentan en el informe, no hace falta el log de cada uno
+            nivel = logging.getLogger('django.request').level
+            logging.getLogger('django.request').setLevel(logging.CRITICAL)
+            try:
+                # Cache en memoria para no mezclar las respuestas de la prueba con las del servidor
+                with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+                    Cliente.objects.all().delete()
+                    cliente = Cliente.objects.create(nombre='Prueba de carga')
+                    filas = [(f'ART-{n:07d}', f'Articulo {n}', n % 1000 + 0.99) for n in range(options['articulos'])]
+                    upsert_articulos(cliente, [({'archivo': 'prueba_carga', 'hoja': None}, filas)])
+                    articulos = dict(Articulo.objects.filter(cliente=cliente).values_list('id', 'codigo'))
+                    connection.close()
+
+                    self.stdout.write(f"Prueba local ({base.vendor}) con {len(articulos)} articulos y {options['hilos']} hilos")
+                    prueba = PruebaCarga(
+                        ClienteLocal(), cliente.pk, list(articulos), list(articulos.values()), pesos,
+                        options['filas_upload'], options['codigos_alta'], options['semilla'],
+                    )
+                    return {'base': base.vendor, **prueba.correr(options['hilos'], options['duracion'], options['requests'])}
+            finally:
+                logging.getLogger('django.request').setLevel(nivel)
+                teardown_databases(bases, verbosity=0, keepdb=options['keepdb'])
+
+    def correr_remoto(self, options, pesos):
+        transporte = ClienteRemoto(options['url'], options['token'])
+        estado, cuerpo = transporte.pedir('get', reverse('cliente-list'))
+        if estado != 200 or not json.loads(cuerpo):
+            raise CommandError(f"No se pudo obtener un cliente de {options['url']} ({estado}): {cuerpo[:300]!r}")
+        cliente_id = json.loads(cuerpo)[0]['id']
+
+        estado, cuerpo = transporte.pedir('get', reverse('articulo-list'), params={'cliente': cliente_id, 'page_size': 10000, 'fields': 'id,codigo'})
+        articulos = json.loads(cuerpo)['results'] if estado == 200 else []
+        if not articulos:
+            raise CommandError(f"El cliente {cliente_id} no tiene articulos para probar")
+
+        self.stdout.write(f"Prueba contra {options['url']} con {len(articulos)} articulos y {options['hilos']} hilos")
+        prueba = PruebaCarga(
+            transporte, cliente_id, [articulo['id'] for articulo in articulos], [articulo['codigo'] for articulo in articulos],
+            pesos, options['filas_upload'], options['codigos_alta'], options['semilla'],
+        )
+        return {'base': options['url'], **prueba.correr(options['hilos'], options['duracion'], options['requests'])}
+
+    def informar(self, resultado):
+        self.stdout.write(
+            f"{'operacion':>10} {'requests':>9} " + ' '.join(f'{nombre:>9}' for nombre in RESULTADOS)
+            + f" {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+        )
+        for operacion in resultado['operaciones']:
+            self.stdout.write(
+                f"{operacion['operacion']:>10} {operacion['requests']:>9} "
+                + ' '.join(f'{operacion[nombre]:>9}' for nombre in RESULTADOS)
+                + ''.join(f" {operacion[clave]:>9.1f}" for clave in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms'))
+            )
+        self.stdout.write(
+            f"{resultado['requests']} requests en {resultado['segundos']} s ({resultado['requests_por_segundo']} req/s): "
+            f"{resultado['deadlock']} deadlocks, {resultado['bloqueo']} bloqueos, {resultado['error']} errores, "
+            f"{resultado['conflicto']} conflictos"
+        )
+        for tipo, ejemplo in resultado['ejemplos'].items():
+            self.stdout.write(f"  {tipo}: {ejemplo}")
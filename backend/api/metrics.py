@@ -0,0 +1,190 @@
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+
+# Limites (en segundos) de los buckets de los histogramas de latencia
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Medicion del request en curso, la crea `MetricasMiddleware`
+_medicion = ContextVar('medicion', default=None)
+
+
+class Medicion:
+    """
+    Lo que se mide de un request: consultas a la base, filas serializadas y tiempo por fase (parse, render).
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.db_segundos = 0.0
+        self.filas = 0
+        self.fases = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_segundos += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+def medir_consulta(execute, sql, params, many, context):
+    """
+    Execute wrapper de todas las conexiones: suma cada consulta a la medicion del contexto actual.
+
+    La medicion se busca en un ContextVar porque la consulta no siempre corre en el hilo del request: el ORM
+    async la ejecuta en un hilo aparte con una copia del contexto, lo mismo que `exportar_en_hilo`.
+    """
+    medicion = _medicion.get()
+    if medicion is None:
+        return execute(sql, params, many, context)
+    return medicion(execute, sql, params, many, context)
+
+
+def instalar_medicion(sender, connection, **kwargs):
+    # Se conecta a `connection_created`. Va primero en la lista para no interferir con los
+    # `connection.execute_wrapper()` que esten activos, que sacan el ultimo al salir
+    if medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, medir_consulta)
+
+
+def activar_medicion(medicion):
+    """
+    Hace que `medicion` sea la del contexto actual; devuelve el token para `terminar_medicion`.
+    """
+    return _medicion.set(medicion)
+
+
+def terminar_medicion(token):
+    _medicion.reset(token)
+
+
+def contar_filas(filas):
+    """
+    Deja pasar las filas de un iterable y las suma a las filas serializadas del request.
+    """
+    medicion = _medicion.get()
+    if medicion is None:
+        yield from filas
+        return
+    cantidad = 0
+    try:
+        for fila in filas:
+            cantidad += 1
+            yield fila
+    finally:
+        medicion.filas += cantidad
+
+
+def cronometrar(fase, iterable):
+    """
+    Suma a `fase` el tiempo que se pasa obteniendo cada elemento de `iterable` (lectura del Excel, armado del
+    archivo exportado), sin contar el tiempo de las consultas que se hagan mientras tanto.
+    """
+    medicion = _medicion.get()
+    if medicion is None:
+        yield from iterable
+        return
+
+    iterador = iter(iterable)
+    while True:
+        inicio, db = time.perf_counter(), medicion.db_segundos
+        try:
+            elemento = next(iterador)
+        except StopIteration:
+            return
+        finally:
+            medicion.fases[fase] += time.perf_counter() - inicio - (medicion.db_segundos - db)
+        yield elemento
+
+
+class _Histograma:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.cantidad = 0
+        self.suma = 0.0
+
+    def observar(self, valor):
+        for i, limite in enumerate(BUCKETS):
+            if valor <= limite:
+                self.buckets[i] += 1
+                break
+        self.cantidad += 1
+        self.suma += valor
+
+
+class Registro:
+    """
+    Metricas acumuladas por este proceso desde que arranco.
+
+    Cada proceso del servidor (por ejemplo cada worker de gunicorn) tiene su propio registro; Prometheus
+    tiene que consultar cada uno o sumarlos por instancia.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencias = defaultdict(_Histograma)
+        self.fases = defaultdict(_Histograma)
+        self.contadores = defaultdict(float)
+
+    def registrar(self, ruta, metodo, estado, segundos, medicion, bytes_enviados):
+        with self.lock:
+            self.latencias[(ruta, metodo, str(estado))].observar(segundos)
+            for fase, duracion in medicion.fases.items():
+                self.fases[(ruta, fase)].observar(duracion)
+            self.fases[(ruta, 'db')].observar(medicion.db_segundos)
+            self.contadores[('api_db_queries_total', ruta)] += medicion.consultas
+            self.contadores[('api_db_seconds_total', ruta)] += medicion.db_segundos
+            self.contadores[('api_rows_serialized_total', ruta)] += medicion.filas
+            self.contadores[('api_response_bytes_total', ruta)] += bytes_enviados
+
+    def exportar(self):
+        """
+        Devuelve las metricas en el formato de texto de Prometheus.
+        """
+        with self.lock:
+            lineas = []
+            lineas += _histograma(
+                'api_request_duration_seconds', 'Duracion de los requests por ruta',
+                ('route', 'method', 'status'), self.latencias,
+            )
+            lineas += _histograma(
+                'api_phase_duration_seconds', 'Duracion de cada fase del request (db, parse, render)',
+                ('route', 'phase'), self.fases,
+            )
+            for nombre in sorted({nombre for nombre, _ in self.contadores}):
+                lineas.append(f'# TYPE {nombre} counter')
+                for (metrica, ruta), valor in sorted(self.contadores.items()):
+                    if metrica == nombre:
+                        lineas.append(f'{nombre}{{route="{ruta}"}} {_numero(valor)}')
+        return '\n'.join(lineas) + '\n'
+
+    def reiniciar(self):
+        with self.lock:
+            self.latencias.clear()
+            self.fases.clear()
+            self.contadores.clear()
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) and not valor.is_integer() else str(int(valor))
+
+
+def _histograma(nombre, ayuda, etiquetas, histogramas):
+    lineas = [f'# HELP {nombre} {ayuda}', f'# TYPE {nombre} histogram']
+    for valores, histograma in sorted(histogramas.items()):
+        base = ','.join(f'{etiqueta}="{valor}"' for etiqueta, valor in zip(etiquetas, valores))
+        acumulado = 0
+        for limite, cantidad in zip(BUCKETS, histograma.buckets):
+            acumulado += cantidad
+            lineas.append(f'{nombre}_bucket{{{base},le="{limite}"}} {acumulado}')
+        lineas.append(f'{nombre}_bucket{{{base},le="+Inf"}} {histograma.cantidad}')
+        lineas.append(f'{nombre}_sum{{{base}}} {_numero(histograma.suma)}')
+        lineas.append(f'{nombre}_count{{{base}}} {histograma.cantidad}')
+    return lineas
+
+
+registro = Registro()
@@ -0,0 +1,104 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .metrics import Medicion, activar_medicion, registro, terminar_medicion
+
+
+class MetricasMiddleware:
+    """
+    Mide cada request: tiempo total, consultas a la base y su tiempo (`metrics.medir_consulta`), filas
+    serializadas, bytes enviados y el tiempo de las fases que marcan las vistas (parse del Excel, render de
+    la descarga).
+
+    Lo medido se devuelve en el header `Server-Timing` y se acumula en `metrics.registro`, que se publica
+    en /api/v1/metrics/. El costo es una lectura de un ContextVar y dos sumas por consulta.
+
+    En las respuestas en streaming los headers salen antes del cuerpo, por lo que `Server-Timing` solo
+    incluye lo hecho hasta ese momento; las metricas se registran cuando termina el envio.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Bajo ASGI la cadena de middlewares es async: sin esto Django pasaria las vistas async a un hilo
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        medicion = Medicion()
+        token = activar_medicion(medicion)
+        try:
+            response = self.get_response(request)
+        finally:
+            terminar_medicion(token)
+        return self.procesar(request, response, medicion)
+
+    async def __acall__(self, request):
+        medicion = Medicion()
+        token = activar_medicion(medicion)
+        try:
+            response = await self.get_response(request)
+        finally:
+            terminar_medicion(token)
+        return self.procesar(request, response, medicion)
+
+    def procesar(self, request, response, medicion):
+        response['Server-Timing'] = server_timing(medicion)
+        ruta = request.resolver_match.view_name if request.resolver_match else 'desconocida'
+
+        if not response.streaming:
+            medicion.filas += filas_serializadas(response)
+            self.registrar(request, response, ruta, medicion, len(response.content))
+        elif response.is_async:
+            response.streaming_content = self.medir_envio_async(response.streaming_content, request, response, ruta, medicion)
+        else:
+            response.streaming_content = self.medir_envio(response.streaming_content, request, response, ruta, medicion)
+        return response
+
+    def medir_envio(self, contenido, request, response, ruta, medicion):
+        # El cuerpo se genera mientras se envia: las consultas y fases de ese momento tambien se miden
+        enviados = 0
+        token = activar_medicion(medicion)
+        try:
+            for bloque in contenido:
+                enviados += len(bloque)
+                yield bloque
+        finally:
+            terminar_medicion(token)
+            self.registrar(request, response, ruta, medicion, enviados)
+
+    async def medir_envio_async(self, contenido, request, response, ruta, medicion):
+        enviados = 0
+        token = activar_medicion(medicion)
+        try:
+            async for bloque in contenido:
+                enviados += len(bloque)
+                yield bloque
+        finally:
+            terminar_medicion(token)
+            self.registrar(request, response, ruta, medicion, enviados)
+
+    def registrar(self, request, response, ruta, medicion, enviados):
+        segundos = time.perf_counter() - medicion.inicio
+        registro.registrar(ruta, request.method, response.status_code, segundos, medicion, enviados)
+
+
+def server_timing(medicion):
+    metricas = [f'db;dur={medicion.db_segundos * 1000:.1f};desc="{medicion.consultas} consultas"']
+    metricas += [f'{fase};dur={segundos * 1000:.1f}' for fase, segundos in medicion.fases.items()]
+    metricas.append(f'total;dur={(time.perf_counter() - medicion.inicio) * 1000:.1f}')
+    return ', '.join(metricas)
+
+
+def filas_serializadas(response):
+    # Solo las respuestas de DRF tienen `data`; el listado paginado trae las filas en `results`
+    datos = getattr(response, 'data', None)
+    if isinstance(datos, dict) and isinstance(datos.get('results'), list):
+        datos = datos['results']
+    return len(datos) if isinstance(datos, list) else 0
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_alter_cliente_nombre'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Importacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.CharField(max_length=255)),
+                ('nombre_archivo', models.CharField(max_length=255)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('finalizada', 'Finalizada'), ('error', 'Error')], db_index=True, default='pendiente', max_length=20)),
+                ('procesados', models.PositiveIntegerField(default=0)),
+                ('insertados', models.PositiveIntegerField(default=0)),
+                ('actualizados', models.PositiveIntegerField(default=0)),
+                ('sin_cambios', models.PositiveIntegerField(default=0)),
+                ('errores', models.JSONField(blank=True, default=list)),
+                ('creada', models.DateTimeField(auto_now_add=True)),
+                ('iniciada', models.DateTimeField(blank=True, null=True)),
+                ('finalizada', models.DateTimeField(blank=True, null=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='importaciones', to='api.cliente')),
+            ],
+        ),
+    ]
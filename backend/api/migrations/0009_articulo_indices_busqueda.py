@@ -0,0 +1,34 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:30
+
+from django.db import migrations, models
+
+
+# El indice FULLTEXT no tiene equivalente en los indices de Django, se crea a mano y solo en MySQL.
+# En otras bases el lookup `busqueda` cae en un icontains (ver api/lookups.py)
+def crear_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('CREATE FULLTEXT INDEX articulo_descripcion_ft ON api_articulo (descripcion)')
+
+
+def eliminar_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX articulo_descripcion_ft ON api_articulo')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_importacion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='articulo',
+            index=models.Index(fields=['codigo'], name='articulo_codigo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articulo',
+            index=models.Index(fields=['cliente', 'precio'], name='articulo_cliente_precio_idx'),
+        ),
+        migrations.RunPython(crear_fulltext, eliminar_fulltext),
+    ]
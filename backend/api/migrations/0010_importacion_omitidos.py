@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_articulo_indices_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacion',
+            name='omitidos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
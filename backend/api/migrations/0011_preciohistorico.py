@@ -0,0 +1,26 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_importacion_omitidos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrecioHistorico',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('precio', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('valid_from', models.DateTimeField()),
+                ('articulo', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='precios', to='api.articulo')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['articulo', 'valid_from'], name='precio_hist_articulo_desde_idx')],
+            },
+        ),
+    ]
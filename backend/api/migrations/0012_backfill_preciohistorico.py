@@ -0,0 +1,32 @@
+from django.db import migrations
+from django.utils import timezone
+
+TAMANO_LOTE = 5000
+
+
+# El historial arranca con el precio actual de cada articulo, vigente desde el momento de la migracion.
+# Los precios anteriores ya se perdieron al sobreescribirse
+def cargar_precios_actuales(apps, schema_editor):
+    Articulo = apps.get_model('api', 'Articulo')
+    PrecioHistorico = apps.get_model('api', 'PrecioHistorico')
+    ahora = timezone.now()
+
+    lote = []
+    for articulo_id, precio in Articulo.objects.values_list('id', 'precio').iterator(chunk_size=TAMANO_LOTE):
+        lote.append(PrecioHistorico(articulo_id=articulo_id, precio=precio, valid_from=ahora))
+        if len(lote) == TAMANO_LOTE:
+            PrecioHistorico.objects.bulk_create(lote)
+            lote = []
+    if lote:
+        PrecioHistorico.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_preciohistorico'),
+    ]
+
+    operations = [
+        migrations.RunPython(cargar_precios_actuales, migrations.RunPython.noop),
+    ]
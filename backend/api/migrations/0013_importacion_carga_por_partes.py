@@ -0,0 +1,28 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_backfill_preciohistorico'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacion',
+            name='recibidos',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importacion',
+            name='tamano',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='importacion',
+            name='estado',
+            field=models.CharField(choices=[('subiendo', 'Subiendo'), ('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('finalizada', 'Finalizada'), ('error', 'Error')], db_index=True, default='pendiente', max_length=20),
+        ),
+    ]
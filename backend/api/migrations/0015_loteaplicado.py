@@ -0,0 +1,24 @@
+# Generated by Django 5.1.2 on 2026-10-18 10:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_usuariocliente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteAplicado',
+            fields=[
+                ('lote', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('nombre_archivo', models.CharField(max_length=255)),
+                ('resultado', models.JSONField(blank=True, default=dict)),
+                ('aplicado', models.DateTimeField(auto_now_add=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lotes_aplicados', to='api.cliente')),
+            ],
+        ),
+    ]
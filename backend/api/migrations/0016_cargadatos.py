@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_loteaplicado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CargaDatos',
+            fields=[
+                ('clave', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('archivo', models.CharField(max_length=255)),
+                ('filas', models.PositiveBigIntegerField(default=0)),
+                ('completa', models.BooleanField(default=False)),
+                ('actualizada', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_cargadatos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticuloEliminado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('articulo_id', models.BigIntegerField()),
+                ('cliente_id', models.BigIntegerField()),
+                ('codigo', models.CharField(max_length=50)),
+                ('eliminado', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='articulo',
+            name='actualizado',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='articulo',
+            index=models.Index(fields=['actualizado', 'id'], name='articulo_actualizado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articulo',
+            index=models.Index(fields=['cliente', 'actualizado', 'id'], name='articulo_cliente_actualiz_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articuloeliminado',
+            index=models.Index(fields=['eliminado', 'id'], name='articulo_elim_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articuloeliminado',
+            index=models.Index(fields=['cliente_id', 'eliminado', 'id'], name='articulo_elim_cliente_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:18
+
+from django.db import migrations, models
+
+
+# Los articulos que ya existen quedan en la posicion 0 del feed: los informa el primer pedido sin token.
+# La fila de la secuencia arranca en 0, las transacciones siguientes toman 1, 2, ...
+def posicion_inicial(apps, schema_editor):
+    apps.get_model('api', 'Articulo').objects.update(version=0)
+    apps.get_model('api', 'SecuenciaCambios').objects.create(pk=1, valor=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_feed_cambios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaCambios',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('valor', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='articulo',
+            name='articulo_actualizado_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='articulo',
+            name='articulo_cliente_actualiz_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='articuloeliminado',
+            name='articulo_elim_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='articuloeliminado',
+            name='articulo_elim_cliente_idx',
+        ),
+        migrations.AddField(
+            model_name='articulo',
+            name='version',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(posicion_inicial, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='articuloeliminado',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='articulo',
+            index=models.Index(fields=['version', 'id'], name='articulo_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articulo',
+            index=models.Index(fields=['cliente', 'version', 'id'], name='articulo_cliente_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articuloeliminado',
+            index=models.Index(fields=['version', 'id'], name='articulo_elim_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='articuloeliminado',
+            index=models.Index(fields=['cliente_id', 'version', 'id'], name='articulo_elim_cliente_idx'),
+        ),
+    ]
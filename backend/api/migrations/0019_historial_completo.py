@@ -0,0 +1,80 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:22
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+TAMANO_LOTE = 5000
+
+
+def _insertar(PrecioHistorico, filas):
+    lote = []
+    for fila in filas:
+        lote.append(PrecioHistorico(**fila))
+        if len(lote) == TAMANO_LOTE:
+            PrecioHistorico.objects.bulk_create(lote)
+            lote = []
+    if lote:
+        PrecioHistorico.objects.bulk_create(lote)
+
+
+# Completa el historial para que las consultas por fecha no necesiten los articulos:
+# - cliente y codigo de cada fila, del articulo o, si ya se borro, de su marca de baja (las bajas anteriores a
+#   la migracion 0017 no dejaron marca y sus filas quedan sin cliente: no aparecen en las consultas)
+# - una fila sin precio por cada baja con marca
+# - una fila con el precio actual de los articulos sin historial, vigente desde la migracion
+def completar_historial(apps, schema_editor):
+    Articulo = apps.get_model('api', 'Articulo')
+    ArticuloEliminado = apps.get_model('api', 'ArticuloEliminado')
+    PrecioHistorico = apps.get_model('api', 'PrecioHistorico')
+
+    for Origen, columna in ((Articulo, 'id'), (ArticuloEliminado, 'articulo_id')):
+        origen = Origen.objects.filter(**{columna: OuterRef('articulo_id')})
+        PrecioHistorico.objects.filter(cliente_id__isnull=True).update(
+            cliente_id=Subquery(origen.values('cliente_id')[:1]),
+            codigo=Subquery(origen.values('codigo')[:1]),
+        )
+
+    _insertar(PrecioHistorico, (
+        {'articulo_id': articulo_id, 'cliente_id': cliente_id, 'codigo': codigo, 'precio': None, 'valid_from': eliminado}
+        for articulo_id, cliente_id, codigo, eliminado
+        in ArticuloEliminado.objects.values_list('articulo_id', 'cliente_id', 'codigo', 'eliminado').iterator(chunk_size=TAMANO_LOTE)
+    ))
+
+    ahora = timezone.now()
+    sin_historial = Articulo.objects.filter(~Exists(PrecioHistorico.objects.filter(articulo_id=OuterRef('pk'))))
+    _insertar(PrecioHistorico, (
+        {'articulo_id': articulo_id, 'cliente_id': cliente_id, 'codigo': codigo, 'precio': precio, 'valid_from': ahora}
+        for articulo_id, cliente_id, codigo, precio
+        in sin_historial.values_list('id', 'cliente_id', 'codigo', 'precio').iterator(chunk_size=TAMANO_LOTE)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_feed_por_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='preciohistorico',
+            name='cliente_id',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='preciohistorico',
+            name='codigo',
+            field=models.CharField(max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='preciohistorico',
+            name='precio',
+            field=models.DecimalField(decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='preciohistorico',
+            index=models.Index(fields=['cliente_id', 'valid_from'], name='precio_hist_cliente_desde_idx'),
+        ),
+        migrations.RunPython(completar_historial, migrations.RunPython.noop),
+    ]
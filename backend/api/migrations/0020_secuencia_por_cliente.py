@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.db.models import Max
+
+
+# Cada cliente arranca su secuencia en la ultima posicion global: las posiciones nuevas quedan despues de
+# todas las ya asignadas. Los tokens del feed anteriores dejan de ser validos (el cliente del feed vuelve
+# a empezar sin token)
+def secuencia_por_cliente(apps, schema_editor):
+    SecuenciaCambios = apps.get_model('api', 'SecuenciaCambios')
+    ultima = SecuenciaCambios.objects.aggregate(ultima=Max('valor'))['ultima'] or 0
+    SecuenciaCambios.objects.all().delete()
+
+    clientes = set(apps.get_model('api', 'Articulo').objects.values_list('cliente_id', flat=True).distinct())
+    clientes |= set(apps.get_model('api', 'ArticuloEliminado').objects.values_list('cliente_id', flat=True).distinct())
+    SecuenciaCambios.objects.bulk_create([SecuenciaCambios(cliente_id=cliente_id, valor=ultima) for cliente_id in sorted(clientes)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_historial_completo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='secuenciacambios',
+            name='cliente_id',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(secuencia_por_cliente, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='secuenciacambios',
+            name='cliente_id',
+            field=models.BigIntegerField(unique=True),
+        ),
+    ]
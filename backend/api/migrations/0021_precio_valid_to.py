@@ -0,0 +1,47 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+TAMANO_LOTE = 5000
+
+
+# Cierra cada fila del historial con el valid_from de la siguiente del mismo articulo. Se calcula recorriendo
+# el historial en orden (MySQL no permite un UPDATE con una subconsulta sobre la misma tabla)
+def completar_valid_to(apps, schema_editor):
+    PrecioHistorico = apps.get_model('api', 'PrecioHistorico')
+
+    lote, anterior = [], None
+    filas = PrecioHistorico.objects.order_by('articulo_id', 'valid_from', 'id').values_list('id', 'articulo_id', 'valid_from')
+    for pk, articulo_id, valid_from in filas.iterator(chunk_size=TAMANO_LOTE):
+        if anterior is not None and anterior[1] == articulo_id:
+            lote.append(PrecioHistorico(id=anterior[0], valid_to=valid_from))
+            if len(lote) == TAMANO_LOTE:
+                PrecioHistorico.objects.bulk_update(lote, ['valid_to'])
+                lote = []
+        anterior = pk, articulo_id
+    if lote:
+        PrecioHistorico.objects.bulk_update(lote, ['valid_to'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_secuencia_por_cliente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='preciohistorico',
+            name='valid_to',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(completar_valid_to, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='preciohistorico',
+            name='precio_hist_cliente_desde_idx',
+        ),
+        migrations.AddIndex(
+            model_name='preciohistorico',
+            index=models.Index(fields=['cliente_id', 'valid_to'], name='precio_hist_cliente_hasta_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 11:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_precio_valid_to'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importacion',
+            name='intentos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+
+from . import lookups  # noqa: F401 registra el lookup `busqueda`
 
 # Create your models here.
 class Cliente(models.Model):
@@ -14,12 +17,175 @@ class Articulo(models.Model):
     codigo = models.CharField(max_length=50, null=False, blank=False)
     descripcion = models.CharField(max_length=100, null=False, blank=False)
     precio = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, null=False)
+    # Ultima modificacion, se informa en el feed de cambios (/api/v1/articulos/changes/). `save` y
+    # `bulk_create` la completan solos; `bulk_update` y los upserts en bloque la tienen que incluir
+    actualizado = models.DateTimeField(auto_now=True)
+    # Posicion en el feed de cambios de su cliente: la asigna `cambios.sellar_cambios` al final de la
+    # transaccion que escribe el articulo, en el orden en que se confirman las transacciones. Null hasta entonces
+    version = models.BigIntegerField(null=True, blank=True, editable=False)
 
     class Meta:
         unique_together = ['cliente', 'codigo']
         constraints = [
             models.UniqueConstraint(fields=['cliente', 'codigo'], name='unique_articulo_cliente', violation_error_message="El codigo del articulo ya existe para este cliente")
         ]
+        # Indices de los filtros del listado. El FULLTEXT de descripcion solo existe en MySQL (migracion 0009)
+        indexes = [
+            models.Index(fields=['codigo'], name='articulo_codigo_idx'),
+            models.Index(fields=['cliente', 'precio'], name='articulo_cliente_precio_idx'),
+            # Recorrido del feed de cambios por (version, id), de todos los clientes o de uno
+            models.Index(fields=['version', 'id'], name='articulo_version_idx'),
+            models.Index(fields=['cliente', 'version', 'id'], name='articulo_cliente_version_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        articulo = super().from_db(db, field_names, values)
+        # Cliente y codigo con que se leyo, para saber en `save` si el articulo se paso a otro cliente
+        articulo._guardado = (articulo.__dict__.get('cliente_id'), articulo.__dict__.get('codigo'))
+        return articulo
+
+    def save(self, *args, **kwargs):
+        # Cada guardado entra al feed de cambios en la misma transaccion. Las escrituras en bloque
+        # (bulk_create, bulk_update, update) no pasan por aca y llaman a `sellar_cambios` por su cuenta
+        from .cambios import sellar_cambios
+
+        cliente_anterior, codigo_anterior = getattr(self, '_guardado', (None, None))
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Si cambio de cliente, el feed del cliente anterior lo informa como baja
+            bajas = [(self.pk, cliente_anterior, codigo_anterior)] if cliente_anterior not in (None, self.cliente_id) else []
+            sellar_cambios([(self.pk, self.cliente_id)], bajas)
+        self._guardado = (self.cliente_id, self.codigo)
 
     def __str__(self):
         return f"{self.cliente.nombre} - {self.codigo} - {self.descripcion} - {self.precio}"
+
+# Importaciones de archivos Excel que se procesan en segundo plano (ver `manage.py procesar_importaciones`)
+class Importacion(models.Model):
+    # Carga por partes en curso (/api/v1/uploads/), el worker todavia no la toma
+    SUBIENDO = 'subiendo'
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    FINALIZADA = 'finalizada'
+    ERROR = 'error'
+    ESTADOS = [
+        (SUBIENDO, 'Subiendo'),
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (FINALIZADA, 'Finalizada'),
+        (ERROR, 'Error'),
+    ]
+
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='importaciones')
+    archivo = models.CharField(max_length=255)
+    nombre_archivo = models.CharField(max_length=255)
+    # Tamaño total declarado y bytes recibidos de las cargas por partes
+    tamano = models.PositiveBigIntegerField(null=True, blank=True)
+    recibidos = models.PositiveBigIntegerField(default=0)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE, db_index=True)
+    procesados = models.PositiveIntegerField(default=0)
+    insertados = models.PositiveIntegerField(default=0)
+    actualizados = models.PositiveIntegerField(default=0)
+    omitidos = models.PositiveIntegerField(default=0)
+    sin_cambios = models.PositiveIntegerField(default=0)
+    errores = models.JSONField(default=list, blank=True)
+    creada = models.DateTimeField(auto_now_add=True)
+    iniciada = models.DateTimeField(null=True, blank=True)
+    finalizada = models.DateTimeField(null=True, blank=True)
+    # Veces que un worker la tomo (ver `jobs.recuperar_importaciones`)
+    intentos = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre_archivo} - {self.estado}"
+
+# Historial de precios de los articulos. Cada fila es el estado del articulo (cliente, codigo y precio) vigente
+# desde `valid_from` hasta `valid_to`, que se completa al agregar la fila siguiente del mismo articulo (null
+# mientras sigue vigente); una fila sin precio es la baja del articulo (ver `precios.precios_vigentes`)
+class PrecioHistorico(models.Model):
+    # Sin FK en la base: el historial es para auditoria y se conserva aunque se borre el articulo. Ademas
+    # asi las bajas de articulos siguen siendo un DELETE directo, sin buscar antes las filas relacionadas.
+    # Sin indice propio: lo cubre el indice (articulo, valid_from)
+    articulo = models.ForeignKey(Articulo, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='precios')
+    # Copiados del articulo, asi las consultas por fecha no dependen de la fila actual. Null solo en filas de
+    # articulos borrados antes de que existieran estas columnas (migracion 0019)
+    cliente_id = models.BigIntegerField(null=True)
+    codigo = models.CharField(max_length=50, null=True)
+    precio = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    valid_from = models.DateTimeField()
+    valid_to = models.DateTimeField(null=True)
+
+    class Meta:
+        # (articulo, valid_from): el historial de un articulo y el cierre de su fila vigente.
+        # (cliente_id, valid_to): las filas de un cliente vigentes en una fecha, sin recorrer las ya cerradas
+        indexes = [
+            models.Index(fields=['articulo', 'valid_from'], name='precio_hist_articulo_desde_idx'),
+            models.Index(fields=['cliente_id', 'valid_to'], name='precio_hist_cliente_hasta_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.articulo_id} - {self.precio} - {self.valid_from}"
+
+# Cliente de cada usuario de la API. El usuario se identifica con su token (`Authorization: Token ...`) y
+# solo ve y modifica los articulos de su cliente (ver `clientes.cliente_de`)
+class UsuarioCliente(models.Model):
+    usuario = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='usuario_cliente')
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='usuarios')
+
+    def __str__(self):
+        return f"{self.usuario} - {self.cliente}"
+
+# Lotes del spool de importaciones ya escritos en la base (ver `spool.aplicar_lote`). Se registran en la
+# misma transaccion que los articulos: un lote que ya figura aca no se vuelve a aplicar
+class LoteAplicado(models.Model):
+    lote = models.CharField(max_length=64, primary_key=True)
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name='lotes_aplicados')
+    nombre_archivo = models.CharField(max_length=255)
+    resultado = models.JSONField(default=dict, blank=True)
+    aplicado = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.lote} - {self.nombre_archivo}"
+
+# Avance de las cargas masivas de `manage.py cargar_datos`: filas de cada archivo ya confirmadas en la base.
+# Se actualiza en la misma transaccion que cada lote, asi una carga cortada sigue desde donde quedo
+class CargaDatos(models.Model):
+    # Hash de la ruta, el tamaño y la fecha de modificacion del archivo (`carga_masiva.clave_archivo`)
+    clave = models.CharField(max_length=32, primary_key=True)
+    archivo = models.CharField(max_length=255)
+    filas = models.PositiveBigIntegerField(default=0)
+    completa = models.BooleanField(default=False)
+    actualizada = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.archivo} - {self.filas} filas"
+
+# Marca de baja de cada articulo borrado, para que el feed de cambios informe las bajas. Guarda los datos
+# que identifican al articulo porque la fila original ya no existe (ver `cambios.eliminar_articulos`)
+class ArticuloEliminado(models.Model):
+    articulo_id = models.BigIntegerField()
+    cliente_id = models.BigIntegerField()
+    codigo = models.CharField(max_length=50)
+    eliminado = models.DateTimeField()
+    # Posicion en el feed de cambios, como `Articulo.version`
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['version', 'id'], name='articulo_elim_version_idx'),
+            models.Index(fields=['cliente_id', 'version', 'id'], name='articulo_elim_cliente_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.articulo_id} - {self.codigo} - {self.eliminado}"
+
+# Ultima posicion asignada en el feed de cambios de cada cliente. `cambios.sellar_cambios` la incrementa con
+# la fila bloqueada hasta el commit, asi las posiciones de un cliente se confirman en orden sin que las
+# escrituras de otros clientes esperen. Como en ArticuloEliminado, el cliente no es un FK: sus bajas se
+# siguen informando despues de borrarlo
+class SecuenciaCambios(models.Model):
+    cliente_id = models.BigIntegerField(unique=True)
+    valor = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return str(self.valor)
@@ -0,0 +1,110 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class ArticuloCursorPagination(BasePagination):
+    """
+    Paginacion por keyset sobre (cliente_id, id).
+
+    En lugar de un OFFSET, cada pagina arranca despues del ultimo (cliente_id, id) de la anterior, por lo
+    que el costo de una pagina no depende de cuantas paginas haya antes. En MySQL el indice del FK
+    `cliente_id` incluye la PK, asi que el recorrido usa ese indice.
+
+    El listado siempre se pagina: sin `page_size` cada pagina trae `page_size` (100) articulos y `next`
+    apunta a la siguiente. Un listado completo sin limite armaba en memoria todo el catalogo en cada request.
+    """
+    page_size = 100
+    max_page_size = 10000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('cliente_id', 'id')
+    invalid_cursor_message = 'Cursor invalido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, page_size = self.pagina(queryset, request)
+        return self.recortar(list(queryset), page_size)
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        `paginate_queryset` con el ORM async, para las vistas async. `request` es un `Request` de DRF.
+        """
+        queryset, page_size = self.pagina(queryset, request)
+        return self.recortar([fila async for fila in queryset], page_size)
+
+    def pagina(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        posicion = self.decode_cursor(request)
+        if posicion is not None:
+            cliente_id, pk = posicion
+            queryset = queryset.filter(Q(cliente_id__gt=cliente_id) | Q(cliente_id=cliente_id, pk__gt=pk))
+
+        # Traemos una fila de mas para saber si hay pagina siguiente sin hacer un COUNT
+        return queryset[:page_size + 1], page_size
+
+    def recortar(self, resultados, page_size):
+        self.has_next = len(resultados) > page_size
+        resultados = resultados[:page_size]
+        self.next_position = self.posicion(resultados[-1]) if self.has_next else None
+        return resultados
+
+    def posicion(self, fila):
+        # Instancias del modelo o filas de `values_list('id', 'cliente_id', ...)` (ArticuloListadoSerializer y
+        # `precios_vigentes`, sobre las filas del historial)
+        if isinstance(fila, tuple):
+            return fila[1], fila[0]
+        return fila.cliente_id, fila.pk
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            cliente_id, pk = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split(':')
+            return int(cliente_id), int(pk)
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, posicion):
+        encoded = base64.urlsafe_b64encode('{}:{}'.format(*posicion).encode('ascii')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,57 @@
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import PrecioHistorico
+
+# Filas del historial que se insertan por sentencia
+TAMANO_LOTE = 5000
+
+
+def fila_historial(articulo):
+    """
+    Lo que se guarda en el historial de un articulo: (articulo_id, cliente_id, codigo, precio). Cuando
+    cambia, el articulo necesita una fila nueva.
+    """
+    return articulo.pk, articulo.cliente_id, articulo.codigo, articulo.precio
+
+
+def registrar_precios(precios, desde=None, nuevos=False):
+    """
+    Agrega al historial el estado nuevo de varios articulos con un solo INSERT (por cada `TAMANO_LOTE`
+    filas). `precios` es un iterable de tuplas (articulo_id, cliente_id, codigo, precio); un precio None
+    registra la baja del articulo. Todas quedan vigentes desde `desde` (por defecto, ahora), y antes un
+    UPDATE por lote cierra en esa fecha la fila vigente de cada articulo; con `nuevos` (articulos recien
+    creados, sin historial) no hay filas que cerrar y se omite.
+    """
+    desde = desde or timezone.now()
+    filas = [
+        PrecioHistorico(articulo_id=articulo_id, cliente_id=cliente_id, codigo=codigo, precio=precio, valid_from=desde)
+        for articulo_id, cliente_id, codigo, precio in precios
+    ]
+    for inicio in range(0, 0 if nuevos else len(filas), TAMANO_LOTE):
+        ids = [fila.articulo_id for fila in filas[inicio:inicio + TAMANO_LOTE]]
+        PrecioHistorico.objects.filter(articulo_id__in=ids, valid_to__isnull=True).update(valid_to=desde)
+    PrecioHistorico.objects.bulk_create(filas, batch_size=TAMANO_LOTE)
+
+
+def precios_vigentes(momento, cliente_id=None):
+    """
+    Devuelve las filas del historial vigentes en `momento` (de un cliente o de todos) como
+    (id, cliente_id, articulo_id, codigo, precio), ordenadas por (cliente_id, id) para paginarlas con
+    `ArticuloCursorPagination`. Solo usa el historial: los articulos borrados despues de `momento` siguen
+    apareciendo y los que cambiaron de codigo o de cliente aparecen como eran entonces.
+
+    Cada articulo tiene una sola fila con valid_from <= momento < valid_to (o valid_to null), asi que no
+    hace falta buscar la ultima fila de cada uno: con el indice (cliente_id, valid_to) la consulta lee solo
+    las filas de ese cliente que seguian vigentes en `momento`, no todo su historial anterior. Los articulos
+    que todavia no existian o ya estaban borrados en `momento` no se incluyen.
+    """
+    historial = PrecioHistorico.objects.filter(
+        Q(valid_to__isnull=True) | Q(valid_to__gt=momento),
+        valid_from__lte=momento,
+        cliente_id__isnull=False,
+        precio__isnull=False,
+    )
+    if cliente_id is not None:
+        historial = historial.filter(cliente_id=cliente_id)
+    return historial.order_by('cliente_id', 'id').values_list('id', 'cliente_id', 'articulo_id', 'codigo', 'precio')
@@ -0,0 +1,26 @@
+import orjson
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Para los tipos que orjson no conoce (Decimal, lazy strings, querysets) se usa el encoder de DRF
+_encoder = JSONEncoder()
+
+
+class OrjsonRenderer(BaseRenderer):
+    """
+    Renderer JSON con orjson, varias veces mas rapido que el `JSONRenderer` de DRF en listados grandes.
+
+    Genera JSON compacto en UTF-8, como `JSONRenderer` con su configuracion por defecto. Con
+    `Accept: application/json; indent=4` la respuesta sale indentada (orjson solo indenta de a 2).
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        opciones = 0
+        if accepted_media_type and 'indent=' in accepted_media_type:
+            opciones = orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_encoder.default, option=opciones)
@@ -1,15 +1,216 @@
-
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Cliente, Articulo
+from .models import Cliente, Articulo, Importacion
+from .cambios import sellar_cambios
+from .jobs import avance_importacion
+from .precios import fila_historial, registrar_precios
 
 class ClienteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cliente
         fields = '__all__'
 
-class ArticuloSerializer(serializers.ModelSerializer):
-    precio = serializers.FloatField()
+def campos_solicitados(request):
+    """
+    Devuelve los campos pedidos con ?fields=codigo,descripcion,precio o None si no se indico ninguno.
+    """
+    if request is None or request.method != 'GET':
+        return None
+    campos = [campo.strip() for campo in request.GET.get('fields', '').split(',') if campo.strip()]
+    return campos or None
+
+class CamposDinamicosMixin:
+    """
+    Limita la representacion a los campos pedidos en ?fields= (sparse fieldsets). Los nombres que no
+    existen en el serializer se ignoran.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos = campos_solicitados(self.context.get('request'))
+        if campos:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
+class ArticuloSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    # `precio` usa el DecimalField por defecto: se devuelve como texto exacto ("10.50"), sin pasar por float
 
     class Meta:
         model = Articulo
-        fields = '__all__'
+        # `actualizado` y `version` son internos del feed de cambios, la representacion del articulo no cambia
+        exclude = ['actualizado', 'version']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Un usuario con cliente solo puede crear o mover articulos a su cliente
+        cliente = self.context.get('cliente_asignado')
+        if cliente is not None and 'cliente' in self.fields:
+            self.fields['cliente'].queryset = Cliente.objects.filter(pk=cliente.pk)
+
+class ArticuloListadoSerializer:
+    """
+    Representacion de solo lectura del listado de articulos, igual a la de `ArticuloSerializer`.
+
+    Trabaja sobre las filas de `values_list(*columnas)` en lugar de instancias del modelo y arma cada dict
+    directamente, sin pasar campo por campo por los `Field` de DRF. Es el camino rapido para paginas grandes.
+    """
+    # campo de la respuesta: columna de la base
+    CAMPOS = {'id': 'id', 'cliente': 'cliente_id', 'codigo': 'codigo', 'descripcion': 'descripcion', 'precio': 'precio'}
+
+    def __init__(self, campos=None):
+        self.nombres = [nombre for nombre in self.CAMPOS if not campos or nombre in campos] or list(self.CAMPOS)
+        # id y cliente_id van siempre primero: los usa la paginacion por cursor
+        self.columnas = ('id', 'cliente_id', *(self.CAMPOS[nombre] for nombre in self.nombres))
+
+    def representar(self, filas):
+        nombres = self.nombres
+        if 'precio' not in nombres:
+            return [dict(zip(nombres, fila[2:])) for fila in filas]
+
+        resultado = []
+        for fila in filas:
+            articulo = dict(zip(nombres, fila[2:]))
+            # El Decimal de la base ya tiene los decimales de la columna: str da "10.00", como DecimalField
+            articulo['precio'] = str(articulo['precio'])
+            resultado.append(articulo)
+        return resultado
+
+def ids_por_clave(claves):
+    """
+    Devuelve {(cliente_id, codigo): id} de los articulos existentes con esas claves, en una sola consulta.
+    """
+    claves = set(claves)
+    clientes = {cliente_id for cliente_id, _ in claves}
+    codigos = {codigo for _, codigo in claves}
+    existentes = Articulo.objects.filter(cliente_id__in=clientes, codigo__in=codigos).values_list('id', 'cliente_id', 'codigo')
+    return {(cliente_id, codigo): pk for pk, cliente_id, codigo in existentes if (cliente_id, codigo) in claves}
+
+class ArticuloBulkListSerializer(serializers.ListSerializer):
+    """
+    Valida y guarda listas de articulos en bloque (/api/v1/articulos/bulk/).
+
+    Cada item se valida con `ArticuloBulkSerializer`, que no consulta la base por la unicidad de
+    (cliente, codigo). Esa restriccion (`unique_articulo_cliente`) se controla para todo el lote con una
+    sola consulta. Los errores se devuelven en una lista alineada con los items recibidos.
+    """
+    maximo_items = 1000
+
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            raise serializers.ValidationError({'non_field_errors': ['Se esperaba una lista de articulos.']})
+        if not data:
+            raise serializers.ValidationError({'non_field_errors': ['La lista de articulos esta vacia.']})
+        if len(data) > self.maximo_items:
+            raise serializers.ValidationError({'non_field_errors': [f'No se pueden enviar mas de {self.maximo_items} articulos.']})
+
+        # En las actualizaciones cada item trae su id y se valida contra su instancia
+        instancias = {articulo.pk: articulo for articulo in self.instance} if self.instance is not None else {}
+
+        validados, errores = [], []
+        for item in data:
+            try:
+                if self.instance is not None:
+                    pk = item.get('id') if isinstance(item, dict) else None
+                    if not isinstance(pk, int) or pk not in instancias:
+                        raise serializers.ValidationError({'id': ['No existe un articulo con este id.']})
+                    self.child.instance = instancias[pk]
+                    self.child.initial_data = item
+                validado = self.child.run_validation(item)
+            except serializers.ValidationError as exc:
+                validados.append(None)
+                errores.append(exc.detail)
+            else:
+                if self.instance is not None:
+                    validado['instancia'] = self.child.instance
+                validados.append(validado)
+                errores.append({})
+
+        self.validar_unicidad(validados, errores)
+
+        if any(errores):
+            raise serializers.ValidationError(errores)
+        return validados
+
+    def validar_unicidad(self, validados, errores):
+        # Clave final (cliente, codigo) de cada item valido, teniendo en cuenta los valores actuales en las actualizaciones
+        claves = {}
+        for posicion, validado in enumerate(validados):
+            if validado is None:
+                continue
+            instancia = validado.get('instancia')
+            cliente_id = validado['cliente'].pk if 'cliente' in validado else instancia.cliente_id
+            codigo = validado['codigo'] if 'codigo' in validado else instancia.codigo
+            claves[posicion] = (cliente_id, codigo)
+
+        if not claves:
+            return
+
+        existentes = ids_por_clave(claves.values())
+        ids_lote = {validados[posicion]['instancia'].pk for posicion in claves if 'instancia' in validados[posicion]}
+
+        vistas = set()
+        for posicion, clave in claves.items():
+            instancia = validados[posicion].get('instancia')
+            existente = existentes.get(clave)
+            # Choca con otro item del lote o con un articulo que no se esta modificando en este lote
+            if clave in vistas or (existente is not None and existente not in ids_lote and (instancia is None or existente != instancia.pk)):
+                errores[posicion] = {**errores[posicion], 'codigo': ['El codigo del articulo ya existe para este cliente']}
+            vistas.add(clave)
+
+    def create(self, validated_data):
+        articulos = Articulo.objects.bulk_create([Articulo(**datos) for datos in validated_data])
+
+        # MySQL no devuelve los ids generados por bulk_create, los buscamos en una sola consulta
+        if any(articulo.pk is None for articulo in articulos):
+            ids = ids_por_clave((articulo.cliente_id, articulo.codigo) for articulo in articulos)
+            for articulo in articulos:
+                articulo.pk = ids[(articulo.cliente_id, articulo.codigo)]
+
+        registrar_precios((fila_historial(articulo) for articulo in articulos), nuevos=True)
+        sellar_cambios((articulo.pk, articulo.cliente_id) for articulo in articulos)
+        return articulos
+
+    def update(self, instance, validated_data):
+        articulos, campos, precios, bajas = [], set(), [], []
+        for datos in validated_data:
+            articulo = datos.pop('instancia')
+            historial_anterior = fila_historial(articulo)
+            for campo, valor in datos.items():
+                setattr(articulo, campo, valor)
+                campos.add(campo)
+            if fila_historial(articulo) != historial_anterior:
+                precios.append(fila_historial(articulo))
+            # Un articulo que pasa a otro cliente es una baja en el feed del cliente anterior
+            _, cliente_anterior, codigo_anterior, _ = historial_anterior
+            if articulo.cliente_id != cliente_anterior:
+                bajas.append((articulo.pk, cliente_anterior, codigo_anterior))
+            articulos.append(articulo)
+
+        if campos:
+            # bulk_update no completa los campos auto_now, la fecha del feed de cambios se pone aca
+            ahora = timezone.now()
+            for articulo in articulos:
+                articulo.actualizado = ahora
+            Articulo.objects.bulk_update(articulos, sorted(campos | {'actualizado'}), batch_size=500)
+        if precios:
+            registrar_precios(precios)
+        if campos:
+            sellar_cambios(((articulo.pk, articulo.cliente_id) for articulo in articulos), bajas)
+        return articulos
+
+class ArticuloBulkSerializer(ArticuloSerializer):
+    class Meta(ArticuloSerializer.Meta):
+        # La unicidad (cliente, codigo) la valida ArticuloBulkListSerializer para todo el lote
+        validators = []
+        list_serializer_class = ArticuloBulkListSerializer
+
+class ImportacionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Importacion
+        exclude = ['archivo']
+
+    def to_representation(self, importacion):
+        data = super().to_representation(importacion)
+        # Mientras corre, el avance esta en el cache (ver `jobs._Avance`); la fila se actualiza al terminar
+        if importacion.estado == Importacion.PROCESANDO:
+            data['procesados'] = avance_importacion(importacion.pk) or data['procesados']
+        return data
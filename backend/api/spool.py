@@ -0,0 +1,215 @@
+import os
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied
+
+from .cache import invalidar_catalogo
+from .clientes import cliente_de_token
+from .exporters import _pyarrow
+from .importers import MAXIMO_ERRORES, TAMANO_LOTE, ArchivoInvalido, _lotes, upsert_articulos, validar_lote
+from .models import Articulo, Cliente, LoteAplicado
+
+# Spool de importaciones: cada carga con ?spool=1 se valida, se escribe en un archivo Arrow IPC propio en
+# settings.SPOOL_DIR y se confirma sin tocar la base. `drenar_spool` (manage.py drenar_spool) aplica los
+# lotes despues, en orden de llegada. Un archivo se escribe una sola vez, de principio a fin, y se publica
+# con un rename cuando ya esta en disco: lo que se confirmo al cliente sobrevive a una caida del proceso.
+# Si la base no respondia al recibir la carga, el archivo guarda la clave del token en lugar del cliente y
+# el cliente se busca al aplicarlo
+EXTENSION = '.arrows'
+PARCIAL = '.parcial'
+ERROR = '.error'
+
+
+class LoteNoAplicable(Exception):
+    """
+    El lote no se puede aplicar nunca (por ejemplo, se borro su cliente). Se aparta con extension `.error`.
+    """
+
+
+def esquema_spool(pa, cliente, nombre, delta, lote, token=None):
+    precio = Articulo._meta.get_field('precio')
+    campos = [
+        ('codigo', pa.string()),
+        ('descripcion', pa.string()),
+        ('precio', pa.decimal128(precio.max_digits, precio.decimal_places)),
+    ]
+    metadata = {'lote': lote, 'cliente': str(cliente.pk) if cliente else '', 'nombre': nombre, 'delta': '1' if delta else '0'}
+    if cliente is None and token is not None:
+        metadata['token'] = token
+    return pa.schema(campos, metadata=metadata)
+
+
+def _ruta(lote, extension=EXTENSION):
+    return Path(settings.SPOOL_DIR) / f'{lote}{extension}'
+
+
+def escribir_lote(cliente, hojas, nombre, delta=True, token=None):
+    """
+    Valida las filas de `hojas` (pares (origen, filas) como los de `leer_archivos`) con las mismas reglas
+    que `upsert_articulos` y las guarda en el spool, de a `TAMANO_LOTE` filas por record batch.
+
+    Si hay filas invalidas se descarta el archivo y se lanza `ArchivoInvalido` con todos los errores. Si no,
+    devuelve el id del lote y la cantidad de filas guardadas. El id empieza con el momento de la carga, asi
+    el orden de los nombres de archivo es el orden de llegada.
+
+    Con `cliente` None (la base no respondia) el lote queda a nombre de la clave `token` del request, o del
+    primer cliente si el request era anonimo.
+    """
+    pa = _pyarrow()
+    lote = f'{time.time_ns():020d}-{uuid.uuid4().hex}'
+    esquema = esquema_spool(pa, cliente, nombre, delta, lote, token)
+    parcial = _ruta(lote, EXTENSION + PARCIAL)
+    parcial.parent.mkdir(parents=True, exist_ok=True)
+
+    vistos = set()
+    errores = []
+    total_errores = filas = 0
+    try:
+        with open(parcial, 'wb') as archivo:
+            with pa.ipc.new_stream(archivo, esquema) as escritor:
+                for origen, lote_filas, primera_fila in _lotes(hojas, TAMANO_LOTE):
+                    validas, errores_lote = validar_lote(lote_filas, primera_fila, vistos)
+                    total_errores += len(errores_lote)
+                    errores.extend({**origen, **error} for error in errores_lote[:MAXIMO_ERRORES - len(errores)])
+                    if total_errores or not validas:
+                        continue
+                    filas += len(validas)
+                    escritor.write_batch(pa.record_batch([list(columna) for columna in zip(*validas)], schema=esquema))
+            archivo.flush()
+            os.fsync(archivo.fileno())
+
+        if total_errores:
+            raise ArchivoInvalido(errores, total_errores)
+    except BaseException:
+        parcial.unlink(missing_ok=True)
+        raise
+
+    os.replace(parcial, _ruta(lote))
+    _sincronizar_directorio(parcial.parent)
+    return lote, filas
+
+
+def _sincronizar_directorio(directorio):
+    # El rename queda en disco recien cuando se sincroniza el directorio (no existe en Windows)
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(directorio, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def lotes_pendientes():
+    """
+    Archivos del spool todavia no aplicados, en orden de llegada.
+    """
+    directorio = Path(settings.SPOOL_DIR)
+    if not directorio.is_dir():
+        return []
+    return sorted(directorio.glob(f'*{EXTENSION}'))
+
+
+def _metadata(lector):
+    return {clave.decode(): valor.decode() for clave, valor in lector.schema.metadata.items()}
+
+
+def _cliente_del_lote(metadata):
+    """
+    Cliente de un lote: el guardado al recibirlo o, si la base no respondia, el del token del request.
+    Devuelve None si el cliente ya no existe; un token invalido o sin cliente lanza `LoteNoAplicable`.
+    """
+    if metadata['cliente']:
+        return Cliente.objects.filter(pk=metadata['cliente']).first()
+    try:
+        return cliente_de_token(metadata.get('token'))
+    except (AuthenticationFailed, PermissionDenied) as e:
+        raise LoteNoAplicable(f"El token del lote {metadata['lote']} no es valido: {e.detail}")
+
+
+def _cliente_del_archivo(ruta):
+    pa = _pyarrow()
+    with pa.OSFile(str(ruta), 'rb') as archivo:
+        metadata = _metadata(pa.ipc.open_stream(archivo))
+    try:
+        cliente = _cliente_del_lote(metadata)
+    except LoteNoAplicable:
+        return None
+    return cliente.pk if cliente else None
+
+
+def estado_lote(lote, cliente=None):
+    """
+    Devuelve ('aplicado', resultado), ('pendiente', None), ('error', None) o None si el lote no existe.
+    Con `cliente`, los lotes de otros clientes se tratan como inexistentes.
+    """
+    aplicados = LoteAplicado.objects.filter(pk=lote)
+    if cliente is not None:
+        aplicados = aplicados.filter(cliente=cliente)
+    aplicado = aplicados.first()
+    if aplicado is not None:
+        return 'aplicado', aplicado.resultado
+
+    for estado, ruta in (('pendiente', _ruta(lote)), ('error', _ruta(lote, EXTENSION + ERROR))):
+        try:
+            if cliente is not None and _cliente_del_archivo(ruta) != cliente.pk:
+                return None
+        except FileNotFoundError:
+            continue
+        if ruta.exists():
+            return estado, None
+    return None
+
+
+def _filas(lector):
+    for batch in lector:
+        yield from zip(*(batch.column(i).to_pylist() for i in range(batch.num_columns)))
+
+
+def aplicar_lote(ruta):
+    """
+    Escribe en la base un lote del spool con `upsert_articulos` y borra su archivo.
+
+    El lote se registra en `LoteAplicado` en la misma transaccion que sus articulos, por lo que aplicarlo
+    de nuevo (el proceso se corto antes de borrar el archivo, o dos drenadores tomaron el mismo lote) no
+    escribe nada. Devuelve el resultado del upsert, o None si el lote ya estaba aplicado.
+    """
+    pa = _pyarrow()
+    with pa.OSFile(str(ruta), 'rb') as archivo:
+        lector = pa.ipc.open_stream(archivo)
+        metadata = _metadata(lector)
+        lote = metadata['lote']
+        resultado = None
+
+        if not LoteAplicado.objects.filter(pk=lote).exists():
+            cliente = _cliente_del_lote(metadata)
+            if cliente is None:
+                raise LoteNoAplicable(f"No existe el cliente {metadata['cliente'] or 'del token'} del lote {lote}")
+
+            hojas = [({'archivo': metadata['nombre'], 'hoja': None}, _filas(lector))]
+            try:
+                with transaction.atomic():
+                    LoteAplicado.objects.create(lote=lote, cliente=cliente, nombre_archivo=metadata['nombre'])
+                    resultado = upsert_articulos(cliente, hojas, delta=metadata['delta'] == '1')
+                    LoteAplicado.objects.filter(pk=lote).update(resultado=resultado)
+            except IntegrityError:
+                # Otro drenador aplico el lote mientras tanto
+                if not LoteAplicado.objects.filter(pk=lote).exists():
+                    raise
+                resultado = None
+            else:
+                # `upsert_articulos` invalida la cache antes de que se confirme la transaccion externa
+                invalidar_catalogo(cliente.pk)
+
+    ruta.unlink(missing_ok=True)
+    return resultado
+
+
+def apartar_lote(ruta):
+    """
+    Renombra un lote que no se puede aplicar para que el drenador no lo vuelva a intentar.
+    """
+    os.replace(ruta, ruta.with_name(ruta.name + ERROR))
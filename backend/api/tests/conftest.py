@@ -0,0 +1,18 @@
+import pytest
+from django.core.cache import cache
+
+from api.clientes import invalidar_clientes
+
+# La cache del catalogo se guarda en archivos: la limpiamos para que ningun test vea respuestas de otro
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+# Lo mismo con la cache de clientes en memoria: el rollback de cada test no dispara las señales que la vacian
+@pytest.fixture(autouse=True)
+def limpiar_clientes():
+    invalidar_clientes()
+    yield
+    invalidar_clientes()
@@ -0,0 +1,29 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.clientes import invalidar_clientes
+
+
+def contar_consultas(funcion):
+    """
+    Ejecuta `funcion` con las caches vacias y devuelve la cantidad de consultas SQL que hizo.
+    """
+    cache.clear()
+    invalidar_clientes()
+    with CaptureQueriesContext(connection) as contexto:
+        funcion()
+    return len(contexto)
+
+
+def assert_consultas_constantes(funcion, agregar_filas, cantidad=10):
+    """
+    Falla si la cantidad de consultas de `funcion` crece con la cantidad de filas (problema N+1).
+
+    Mide las consultas, agrega `cantidad` filas con `agregar_filas(cantidad)` y vuelve a medir: un
+    listado bien resuelto hace las mismas consultas sin importar cuantas filas devuelva.
+    """
+    antes = contar_consultas(funcion)
+    agregar_filas(cantidad)
+    despues = contar_consultas(funcion)
+    assert despues == antes, f"Las consultas crecen con las filas: {antes} con la base inicial, {despues} despues de agregar {cantidad} filas"
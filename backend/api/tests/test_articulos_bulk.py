@@ -0,0 +1,100 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from api.models import Articulo, Cliente
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+@pytest.fixture
+def cliente():
+    return Cliente.objects.create(nombre='Cliente de Pruebas')
+
+@pytest.fixture
+def articulos(cliente):
+    return [
+        Articulo.objects.create(cliente=cliente, codigo=f'COD-{i}', descripcion=f'Articulo {i}', precio=10)
+        for i in range(3)
+    ]
+
+@pytest.mark.django_db
+def test_bulk_create(api_client, cliente, django_assert_max_num_queries):
+    data = [
+        {'cliente': cliente.id, 'codigo': 'NUEVO-1', 'descripcion': 'Nuevo 1', 'precio': 1.5},
+        {'cliente': cliente.id, 'codigo': 'NUEVO-2', 'descripcion': 'Nuevo 2', 'precio': 2.5},
+    ]
+    # Incluye el INSERT en bloque del historial de precios y las 3 consultas del feed de cambios
+    with django_assert_max_num_queries(10):
+        response = api_client.post(reverse('articulo-bulk'), data, format='json')
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert [a['codigo'] for a in response.data] == ['NUEVO-1', 'NUEVO-2']
+    assert all(a['id'] for a in response.data)
+    assert Articulo.objects.filter(cliente=cliente).count() == 2
+
+@pytest.mark.django_db
+def test_bulk_create_reports_per_item_errors(api_client, cliente, articulos):
+    data = [
+        {'cliente': cliente.id, 'codigo': 'NUEVO-1', 'descripcion': 'Nuevo 1', 'precio': 1},
+        {'cliente': cliente.id, 'codigo': 'COD-0', 'descripcion': 'Repite un codigo existente', 'precio': 1},
+        {'cliente': cliente.id, 'codigo': '', 'descripcion': 'Sin codigo', 'precio': 1},
+        {'cliente': cliente.id, 'codigo': 'NUEVO-1', 'descripcion': 'Repite un codigo del lote', 'precio': 1},
+    ]
+    response = api_client.post(reverse('articulo-bulk'), data, format='json')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data[0] == {}
+    assert 'codigo' in response.data[1]
+    assert 'codigo' in response.data[2]
+    assert 'codigo' in response.data[3]
+    assert Articulo.objects.filter(cliente=cliente).count() == 3
+
+@pytest.mark.django_db
+def test_bulk_update(api_client, articulos, django_assert_max_num_queries):
+    data = [
+        {'id': articulos[0].id, 'precio': 99},
+        {'id': articulos[1].id, 'descripcion': 'Cambiada', 'codigo': 'COD-9'},
+    ]
+    # Incluye las 3 consultas del feed de cambios (posicion nueva y marca de los articulos) y el cierre de
+    # las filas vigentes del historial de precios
+    with django_assert_max_num_queries(10):
+        response = api_client.patch(reverse('articulo-bulk'), data, format='json')
+
+    assert response.status_code == status.HTTP_200_OK
+    articulos[0].refresh_from_db()
+    articulos[1].refresh_from_db()
+    assert articulos[0].precio == 99
+    assert articulos[1].descripcion == 'Cambiada'
+    assert articulos[1].codigo == 'COD-9'
+
+@pytest.mark.django_db
+def test_bulk_update_errors(api_client, articulos):
+    data = [
+        {'id': articulos[0].id, 'codigo': 'COD-1'},
+        {'id': 999, 'precio': 1},
+    ]
+    response = api_client.patch(reverse('articulo-bulk'), data, format='json')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'codigo' in response.data[0]
+    assert 'id' in response.data[1]
+    articulos[0].refresh_from_db()
+    assert articulos[0].codigo == 'COD-0'
+
+@pytest.mark.django_db
+def test_bulk_delete(api_client, articulos):
+    response = api_client.delete(reverse('articulo-bulk'), [articulos[0].id, articulos[2].id], format='json')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['eliminados'] == 2
+    assert list(Articulo.objects.values_list('codigo', flat=True)) == ['COD-1']
+
+@pytest.mark.django_db
+def test_bulk_delete_unknown_ids(api_client, articulos):
+    response = api_client.delete(reverse('articulo-bulk'), [articulos[0].id, 999], format='json')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data['ids'] == [999]
+    assert Articulo.objects.count() == 3
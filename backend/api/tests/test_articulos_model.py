@@ -3,6 +3,8 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from api.models import Articulo, Cliente
+from api.pagination import ArticuloCursorPagination
+from api.serializers import ArticuloSerializer
 
 @pytest.fixture
 def api_client():
@@ -32,8 +34,9 @@ def test_list_articulos(api_client, articulo):
     url = reverse('articulo-list')
     response = api_client.get(url)
     assert response.status_code == status.HTTP_200_OK
-    assert len(response.data) == 1
-    assert response.data[0]['codigo'] == articulo.codigo
+    assert len(response.data['results']) == 1
+    assert response.data['results'][0]['codigo'] == articulo.codigo
+    assert response.data['next'] is None
 
 @pytest.mark.django_db
 def test_create_articulo(api_client, articulo_data):
@@ -128,3 +131,90 @@ def test_delete_nonexistent_articulo(api_client):
     url = reverse('articulo-detail', kwargs={'pk': 999})
     response = api_client.delete(url)
     assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+def test_list_articulos_cursor_pagination(api_client, cliente):
+    otro_cliente = Cliente.objects.create(nombre='Otro Cliente')
+    for i in range(3):
+        Articulo.objects.create(cliente=otro_cliente, codigo=f'OTRO-{i}', descripcion='Articulo', precio=1)
+        Articulo.objects.create(cliente=cliente, codigo=f'COD-{i}', descripcion='Articulo', precio=1)
+
+    url = reverse('articulo-list')
+    response = api_client.get(url, {'page_size': 4})
+    assert response.status_code == status.HTTP_200_OK
+    assert [a['codigo'] for a in response.data['results']] == ['COD-0', 'COD-1', 'COD-2', 'OTRO-0']
+    assert response.data['next'] is not None
+
+    response = api_client.get(response.data['next'])
+    assert response.status_code == status.HTTP_200_OK
+    assert [a['codigo'] for a in response.data['results']] == ['OTRO-1', 'OTRO-2']
+    assert response.data['next'] is None
+
+@pytest.mark.django_db
+def test_list_articulos_invalid_cursor(api_client, articulo):
+    response = api_client.get(reverse('articulo-list'), {'cursor': 'no-es-un-cursor'})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+def test_list_articulos_sparse_fields(api_client, articulo):
+    url = reverse('articulo-list')
+    response = api_client.get(url, {'fields': 'codigo,descripcion,precio'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['results'] == [{'codigo': articulo.codigo, 'descripcion': articulo.descripcion, 'precio': '10.00'}]
+
+@pytest.fixture
+def catalogo(cliente):
+    otro_cliente = Cliente.objects.create(nombre='Otro Cliente')
+    Articulo.objects.create(cliente=cliente, codigo='TOR-001', descripcion='Tornillo de acero', precio=5)
+    Articulo.objects.create(cliente=cliente, codigo='TOR-002', descripcion='Tornillo de bronce', precio=15)
+    Articulo.objects.create(cliente=cliente, codigo='TUE-001', descripcion='Tuerca de acero', precio=2)
+    Articulo.objects.create(cliente=otro_cliente, codigo='TOR-001', descripcion='Tornillo de acero', precio=7)
+    return cliente
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params, codigos', [
+    ({'codigo': 'TOR-001'}, ['TOR-001', 'TOR-001']),
+    ({'codigo_prefijo': 'TOR'}, ['TOR-001', 'TOR-002', 'TOR-001']),
+    ({'descripcion': 'acero'}, ['TOR-001', 'TUE-001', 'TOR-001']),
+    ({'precio_min': '5', 'precio_max': '10'}, ['TOR-001', 'TOR-001']),
+])
+def test_list_articulos_filters(api_client, catalogo, params, codigos):
+    response = api_client.get(reverse('articulo-list'), params)
+    assert response.status_code == status.HTTP_200_OK
+    assert [a['codigo'] for a in response.data['results']] == codigos
+
+@pytest.mark.django_db
+def test_list_articulos_filter_by_cliente(api_client, catalogo):
+    response = api_client.get(reverse('articulo-list'), {'cliente': catalogo.id, 'codigo_prefijo': 'TOR'})
+    assert response.status_code == status.HTTP_200_OK
+    assert [a['codigo'] for a in response.data['results']] == ['TOR-001', 'TOR-002']
+
+@pytest.mark.django_db
+def test_list_articulos_invalid_price_filter(api_client, catalogo):
+    response = api_client.get(reverse('articulo-list'), {'precio_min': 'barato'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.django_db
+def test_list_fast_path_matches_model_serializer(api_client, cliente):
+    Articulo.objects.create(cliente=cliente, codigo='0001', descripcion='Artículo con ñ', precio='10.5')
+    Articulo.objects.create(cliente=cliente, codigo='0002', descripcion='Otro', precio='1234.99')
+
+    response = api_client.get(reverse('articulo-list'))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['results'] == ArticuloSerializer(Articulo.objects.all(), many=True).data
+    # Los precios salen como texto exacto y el JSON se genera compacto en UTF-8
+    assert b'"precio":"10.50"' in response.content
+    assert 'Artículo con ñ'.encode() in response.content
+
+
+@pytest.mark.django_db
+def test_list_articulos_paginated_by_default(api_client, cliente, monkeypatch):
+    monkeypatch.setattr(ArticuloCursorPagination, 'page_size', 2)
+    for i in range(3):
+        Articulo.objects.create(cliente=cliente, codigo=f'COD-{i}', descripcion='Articulo', precio=1)
+
+    # Sin parametros el listado no se devuelve completo: trae una pagina y el link a la siguiente
+    response = api_client.get(reverse('articulo-list'))
+    assert [a['codigo'] for a in response.data['results']] == ['COD-0', 'COD-1']
+    assert [a['codigo'] for a in api_client.get(response.data['next']).data['results']] == ['COD-2']
@@ -0,0 +1,101 @@
+import io
+import json
+import pytest
+import pandas as pd
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import AsyncClient
+from django.urls import reverse
+from api.models import Articulo, Cliente, UsuarioCliente
+
+@pytest.fixture
+def cliente():
+    cliente = Cliente.objects.create(nombre='Cliente de Pruebas')
+    Articulo.objects.create(cliente=cliente, codigo='0101', descripcion='Articulo 1', precio=10.5)
+    Articulo.objects.create(cliente=cliente, codigo='0102', descripcion='Articulo 2', precio=20)
+    return cliente
+
+async def contenido(response):
+    return b''.join([bloque async for bloque in response.streaming_content])
+
+@pytest.mark.django_db
+def test_async_list_is_paginated(cliente):
+    response = async_to_sync(AsyncClient().get)(reverse('articulo-list-async'), {'fields': 'codigo,precio', 'page_size': 1})
+
+    assert response.status_code == 200
+    assert response['X-Total-Count'] == '2'
+    # Las consultas del ORM async (pagina y total; la version del catalogo esta en cache aparte) se cuentan en el middleware
+    assert 'desc="2 consultas"' in response['Server-Timing']
+    pagina = json.loads(response.content)
+    assert pagina['results'] == [{'codigo': '0101', 'precio': '10.50'}]
+
+    # La pagina siguiente, como en /api/v1/articulos/
+    response = async_to_sync(AsyncClient().get)(pagina['next'])
+    assert json.loads(response.content) == {'next': None, 'results': [{'codigo': '0102', 'precio': '20.00'}]}
+
+@pytest.mark.django_db
+def test_async_list_cached_response_keeps_total(cliente):
+    url = reverse('articulo-list-async')
+    primera = async_to_sync(AsyncClient().get)(url)
+    segunda = async_to_sync(AsyncClient().get)(url)
+
+    assert 'desc="0 consultas"' in segunda['Server-Timing']
+    assert segunda.content == primera.content
+    assert segunda['X-Total-Count'] == primera['X-Total-Count'] == '2'
+
+@pytest.mark.django_db
+def test_async_list_scopes_session_users_to_their_client(cliente):
+    otro = Cliente.objects.create(nombre='Otro cliente')
+    Articulo.objects.create(cliente=otro, codigo='0201', descripcion='Del otro cliente', precio=1)
+    usuario = User.objects.create_user('sesion', password='clave')
+    UsuarioCliente.objects.create(usuario=usuario, cliente=otro)
+    sin_cliente = User.objects.create_user('sin-cliente', password='clave')
+
+    api_client = AsyncClient()
+    api_client.force_login(usuario)
+    response = async_to_sync(api_client.get)(reverse('articulo-list-async'))
+    assert [articulo['codigo'] for articulo in json.loads(response.content)['results']] == ['0201']
+    assert response['X-Total-Count'] == '1'
+
+    # Un usuario comun sin cliente no ve el catalogo, igual que en la vista sincronica
+    api_client.force_login(sin_cliente)
+    assert async_to_sync(api_client.get)(reverse('articulo-list-async')).status_code == 403
+
+@pytest.mark.django_db
+def test_async_list_invalid_filter(cliente):
+    response = async_to_sync(AsyncClient().get)(reverse('articulo-list-async'), {'precio_min': 'abc'})
+    assert response.status_code == 400
+
+@pytest.mark.django_db
+def test_async_download_csv(cliente):
+    async def descargar():
+        response = await AsyncClient().get(reverse('download-excel-async'), {'format': 'csv'})
+        return response, await contenido(response)
+
+    response, cuerpo = async_to_sync(descargar)()
+
+    assert response.status_code == 200
+    assert response['Content-Disposition'] == f'attachment; filename="articulos_{cliente.nombre}.csv"'
+    assert cuerpo.decode().splitlines()[1:] == [
+        f'{articulo.id},{cliente.id},{articulo.codigo},{articulo.descripcion},{articulo.precio}'
+        for articulo in Articulo.objects.order_by('id')
+    ]
+
+# El XLSX se arma en un hilo del pool de exportacion, que usa su propia conexion: los datos tienen que estar commiteados
+@pytest.mark.django_db(transaction=True)
+def test_async_download_xlsx_in_thread_pool(cliente):
+    async def descargar():
+        response = await AsyncClient().get(reverse('download-excel-async'))
+        return response, await contenido(response)
+
+    response, cuerpo = async_to_sync(descargar)()
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    df = pd.read_excel(io.BytesIO(cuerpo), dtype={'codigo': str})
+    assert df['codigo'].tolist() == ['0101', '0102']
+
+    # La segunda descarga sale de la cache, sin volver a armar el archivo
+    response = async_to_sync(AsyncClient().get)(reverse('download-excel-async'))
+    assert not response.streaming
+    assert response.content == cuerpo
@@ -0,0 +1,87 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from api.cache import invalidar_catalogo, version_catalogo
+from api.models import Articulo, Cliente
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+@pytest.fixture
+def cliente():
+    cliente = Cliente.objects.create(nombre='Cliente de Pruebas')
+    Articulo.objects.create(cliente=cliente, codigo='COD-1', descripcion='Articulo 1', precio=10)
+    return cliente
+
+@pytest.mark.django_db
+def test_list_served_from_cache_until_write(api_client, cliente, django_assert_num_queries):
+    url = reverse('articulo-list')
+    response = api_client.get(url)
+    assert response.status_code == status.HTTP_200_OK
+
+    with django_assert_num_queries(0):
+        cached = api_client.get(url)
+    assert cached.data == response.data
+    assert cached['ETag'] == response['ETag']
+
+    api_client.post(url, {'cliente': cliente.id, 'codigo': 'COD-2', 'descripcion': 'Articulo 2', 'precio': 5}, format='json')
+
+    response = api_client.get(url)
+    assert [a['codigo'] for a in response.data['results']] == ['COD-1', 'COD-2']
+    assert response['ETag'] != cached['ETag']
+
+@pytest.mark.django_db
+def test_list_not_modified(api_client, cliente):
+    url = reverse('articulo-list')
+    response = api_client.get(url)
+
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+@pytest.mark.django_db
+def test_download_cached_and_not_modified(api_client, cliente, django_assert_num_queries):
+    url = reverse('download-excel')
+    response = api_client.get(url, {'format': 'csv'})
+    contenido = b''.join(response.streaming_content)
+
+    # La segunda descarga sale de la cache y el cliente de la cache en memoria: no consulta la base
+    with django_assert_num_queries(0):
+        cached = api_client.get(url, {'format': 'csv'})
+    assert cached.content == contenido
+
+    response = api_client.get(url, {'format': 'csv'}, HTTP_IF_NONE_MATCH=cached['ETag'])
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    articulo = Articulo.objects.get(codigo='COD-1')
+    api_client.patch(reverse('articulo-detail', kwargs={'pk': articulo.id}), {'precio': 99}, format='json')
+
+    response = api_client.get(url, {'format': 'csv'}, HTTP_IF_NONE_MATCH=cached['ETag'])
+    assert response.status_code == status.HTTP_200_OK
+    assert b'99.00' in b''.join(response.streaming_content)
+
+@pytest.mark.django_db
+def test_admin_change_invalidates_cache(api_client, cliente):
+    url = reverse('articulo-list')
+    etag = api_client.get(url)['ETag']
+
+    User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+    admin_client = APIClient()
+    admin_client.login(username='admin', password='admin')
+    articulo = Articulo.objects.get(codigo='COD-1')
+    response = admin_client.post(reverse('admin:api_articulo_delete', args=[articulo.id]), {'post': 'yes'})
+    assert response.status_code == 302
+
+    response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['results'] == []
+
+def test_invalidation_never_reuses_a_version():
+    # Cada invalidacion escribe una version nueva, aunque la clave no estuviera en la cache
+    vistas = {version_catalogo(1), version_catalogo()}
+    for _ in range(3):
+        invalidar_catalogo(1)
+        vistas |= {version_catalogo(1), version_catalogo()}
+    assert len(vistas) == 8
@@ -0,0 +1,175 @@
+import pytest
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from api.cambios import cambios_articulos, codificar_token, decodificar_token
+from api.carga_masiva import cargar_archivo
+from api.importers import upsert_articulos
+from api.models import Articulo, ArticuloEliminado, Cliente, SecuenciaCambios, UsuarioCliente
+
+@pytest.fixture
+def cliente():
+    return Cliente.objects.create(nombre='Cliente de prueba')
+
+def leer_feed(api_client, since=None, **parametros):
+    """
+    Recorre el feed desde `since` siguiendo `next`; devuelve los cambios y el ultimo token.
+    """
+    if since is not None:
+        parametros['since'] = since
+    response = api_client.get(reverse('articulo-changes'), parametros)
+    cambios = []
+    while True:
+        assert response.status_code == 200
+        cambios.extend(response.data['results'])
+        if response.data['next'] is None:
+            return cambios, response.data['since']
+        response = api_client.get(response.data['next'])
+
+@pytest.mark.django_db
+def test_changes_reports_creates_updates_and_deletes(cliente):
+    api_client = APIClient()
+    primero = Articulo.objects.create(cliente=cliente, codigo='A1', descripcion='Uno', precio=10)
+    segundo = Articulo.objects.create(cliente=cliente, codigo='A2', descripcion='Dos', precio=20)
+
+    cambios, token = leer_feed(api_client)
+    assert [(c['id'], c['eliminado']) for c in cambios] == [(primero.pk, False), (segundo.pk, False)]
+    assert cambios[0]['precio'] == '10.00'
+
+    # Desde el token solo llega lo nuevo
+    assert leer_feed(api_client, token)[0] == []
+
+    response = api_client.patch(reverse('articulo-detail', args=[primero.pk]), {'precio': '15.00'}, format='json')
+    assert response.status_code == 200
+    assert api_client.delete(reverse('articulo-detail', args=[segundo.pk])).status_code == 204
+
+    cambios, token = leer_feed(api_client, token)
+    assert [(c['id'], c['eliminado']) for c in cambios] == [(primero.pk, False), (segundo.pk, True)]
+    assert cambios[0]['precio'] == '15.00'
+    assert cambios[1]['codigo'] == 'A2'
+    assert leer_feed(api_client, token)[0] == []
+
+@pytest.mark.django_db
+def test_changes_pages_with_token(cliente):
+    upsert_articulos(cliente, [({'archivo': 'a.xlsx', 'hoja': None}, [(f'P{n}', 'Articulo', n) for n in range(7)])])
+
+    cambios, _ = leer_feed(APIClient(), page_size=3)
+    assert [c['id'] for c in cambios] == list(Articulo.objects.order_by('id').values_list('id', flat=True))
+
+    # Una pagina justa no deja `next`
+    response = APIClient().get(reverse('articulo-changes'), {'page_size': 7})
+    assert response.data['next'] is None
+    assert len(response.data['results']) == 7
+
+@pytest.mark.django_db
+def test_bulk_and_client_deletes_leave_tombstones(cliente):
+    api_client = APIClient()
+    articulos = [Articulo.objects.create(cliente=cliente, codigo=f'B{n}', descripcion='Articulo', precio=1) for n in range(3)]
+    _, token = leer_feed(api_client)
+
+    response = api_client.delete(reverse('articulo-bulk'), [articulos[0].pk], format='json')
+    assert response.status_code == 200
+    assert api_client.delete(reverse('cliente-detail', args=[cliente.pk])).status_code == 204
+
+    cambios, _ = leer_feed(api_client, token)
+    assert sorted(c['id'] for c in cambios) == sorted(a.pk for a in articulos)
+    assert all(c['eliminado'] for c in cambios)
+    assert ArticuloEliminado.objects.count() == 3
+
+@pytest.mark.django_db
+def test_changes_scoped_to_client(cliente):
+    otro = Cliente.objects.create(nombre='Otro cliente')
+    propio = Articulo.objects.create(cliente=cliente, codigo='C1', descripcion='Propio', precio=1)
+    ajeno = Articulo.objects.create(cliente=otro, codigo='C2', descripcion='Ajeno', precio=1)
+
+    assert [c['id'] for c in leer_feed(APIClient(), cliente=otro.pk)[0]] == [ajeno.pk]
+
+    usuario = User.objects.create_user('usuario')
+    UsuarioCliente.objects.create(usuario=usuario, cliente=cliente)
+    api_client = APIClient()
+    api_client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=usuario).key}')
+    # El cliente del token manda sobre el parametro
+    assert [c['id'] for c in leer_feed(api_client, cliente=otro.pk)[0]] == [propio.pk]
+
+@pytest.mark.django_db
+def test_changes_rejects_invalid_parameters():
+    api_client = APIClient()
+    response = api_client.get(reverse('articulo-changes'), {'since': 'no-es-un-token'})
+    assert response.status_code == 400
+    assert 'since' in response.data
+    assert api_client.get(reverse('articulo-changes'), {'cliente': 'abc'}).status_code == 400
+
+@pytest.mark.django_db
+def test_changes_follow_commit_order_not_timestamps(cliente):
+    Articulo.objects.create(cliente=cliente, codigo='T1', descripcion='Primero', precio=1)
+    _, token, _ = cambios_articulos()
+
+    # Una transaccion larga escribe sus filas con una fecha anterior a los cambios ya informados, pero
+    # toma su posicion en el feed al confirmarse
+    with mock.patch('django.utils.timezone.now', return_value=timezone.now() - timedelta(hours=1)):
+        upsert_articulos(cliente, [({'archivo': 'largo.xlsx', 'hoja': None}, [('T2', 'Importacion larga', 2)])])
+
+    cambios, token, hay_mas = cambios_articulos(token)
+    assert [c['codigo'] for c in cambios] == ['T2'] and not hay_mas
+    assert cambios_articulos(token)[0] == []
+
+@pytest.mark.django_db
+def test_bulk_writes_enter_the_feed(cliente, tmp_path):
+    upsert_articulos(cliente, [({'archivo': 'a.xlsx', 'hoja': None}, [('U1', 'Importado', 1)])])
+    ruta = tmp_path / 'articulos.csv'
+    ruta.write_text(f'cliente_id,codigo,descripcion,precio\n{cliente.pk},U2,Cargado,2\n')
+    cargar_archivo(str(ruta), 'api.articulo')
+    APIClient().post(reverse('articulo-bulk'), [{'cliente': cliente.pk, 'codigo': 'U3', 'descripcion': 'Bulk', 'precio': 3}], format='json')
+
+    assert not Articulo.objects.filter(version__isnull=True).exists()
+    assert [c['codigo'] for c in leer_feed(APIClient())[0]] == ['U1', 'U2', 'U3']
+
+def test_token_round_trip():
+    posicion = decodificar_token(None)
+    assert decodificar_token(codificar_token(posicion)) == posicion
+
+@pytest.mark.django_db
+def test_each_client_has_its_own_sequence(cliente):
+    otro = Cliente.objects.create(nombre='Otro cliente')
+    upsert_articulos(cliente, [({'archivo': 'a.xlsx', 'hoja': None}, [(f'A{n}', 'Articulo', n) for n in range(3)])])
+    upsert_articulos(otro, [({'archivo': 'b.xlsx', 'hoja': None}, [('B0', 'Articulo', 1)])])
+    upsert_articulos(otro, [({'archivo': 'b.xlsx', 'hoja': None}, [('B1', 'Articulo', 1)])])
+
+    # Las escrituras de un cliente no avanzan (ni bloquean) la secuencia de otro
+    assert dict(SecuenciaCambios.objects.values_list('cliente_id', 'valor')) == {cliente.pk: 1, otro.pk: 2}
+
+    # El feed de todos los clientes recorre uno por uno, aunque la pagina corte en el medio de un cliente
+    cambios, token = leer_feed(APIClient(), page_size=2)
+    assert [c['codigo'] for c in cambios] == ['A0', 'A1', 'A2', 'B0', 'B1']
+
+    # Sin cambios nuevos solo se lee la secuencia, no los articulos ni las bajas
+    with CaptureQueriesContext(connection) as consultas:
+        assert cambios_articulos(token)[0] == []
+    assert not [q['sql'] for q in consultas.captured_queries if 'api_articulo' in q['sql']]
+
+    upsert_articulos(otro, [({'archivo': 'b.xlsx', 'hoja': None}, [('B2', 'Articulo', 1)])])
+    assert [c['codigo'] for c in cambios_articulos(token)[0]] == ['B2']
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('masivo', [False, True])
+def test_moving_an_article_tombstones_it_in_the_old_client(cliente, masivo):
+    api_client = APIClient()
+    otro = Cliente.objects.create(nombre='Otro cliente')
+    articulo = Articulo.objects.create(cliente=cliente, codigo='M1', descripcion='Movido', precio=1)
+    _, token = leer_feed(api_client)
+
+    if masivo:
+        response = api_client.patch(reverse('articulo-bulk'), [{'id': articulo.pk, 'cliente': otro.pk}], format='json')
+    else:
+        response = api_client.patch(reverse('articulo-detail', args=[articulo.pk]), {'cliente': otro.pk}, format='json')
+    assert response.status_code == 200
+
+    # El espejo del cliente anterior lo borra y el del nuevo lo agrega
+    assert [(c['id'], c['cliente'], c['eliminado']) for c in leer_feed(api_client, token, cliente=cliente.pk)[0]] == [(articulo.pk, cliente.pk, True)]
+    assert [(c['id'], c['cliente'], c['eliminado']) for c in leer_feed(api_client, token, cliente=otro.pk)[0]] == [(articulo.pk, otro.pk, False)]
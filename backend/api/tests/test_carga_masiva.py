@@ -0,0 +1,151 @@
+import io
+import json
+import pytest
+from decimal import Decimal
+from django.core.management import CommandError, call_command
+from api.carga_masiva import DatosInvalidos, clave_archivo, elementos_json
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api.models import Articulo, CargaDatos, Cliente, PrecioHistorico
+
+def cargar(*args):
+    salida = io.StringIO()
+    call_command('cargar_datos', *map(str, args), stdout=salida)
+    return salida.getvalue()
+
+@pytest.fixture
+def cliente():
+    return Cliente.objects.create(pk=7, nombre='Cliente de Prueba')
+
+def escribir_csv(ruta, filas):
+    ruta.write_text('id,cliente_id,codigo,descripcion,precio\n' + ''.join(
+        f'{pk},7,COD-{pk},Articulo {pk},{pk}.50\n' for pk in filas
+    ))
+    return ruta
+
+@pytest.mark.django_db
+def test_loads_seed_fixture_once():
+    salida = cargar('seeds/datos.json')
+
+    assert 'filas/s' in salida
+    assert Cliente.objects.get(pk=1).nombre == 'Cliente 1'
+    assert Articulo.objects.get(pk=2).precio == Decimal('300.25')
+
+    assert 'ya cargado (3 filas)' in cargar('seeds/datos.json')
+    assert Articulo.objects.count() == 2
+
+@pytest.mark.django_db
+def test_loaded_articles_start_their_price_history():
+    cargar('seeds/datos.json')
+    cargar('seeds/datos.json')
+
+    # Una fila por articulo aunque el archivo se cargue dos veces, y la consulta por fecha los encuentra
+    assert sorted(PrecioHistorico.objects.values_list('articulo_id', 'cliente_id', 'codigo', 'precio')) == sorted(
+        Articulo.objects.values_list('id', 'cliente_id', 'codigo', 'precio')
+    )
+    response = APIClient().get(reverse('articulo-precios'), {'page_size': 10000})
+    assert [articulo['id'] for articulo in response.data['results']] == sorted(Articulo.objects.values_list('id', flat=True))
+
+@pytest.mark.django_db
+def test_existing_rows_are_left_as_is():
+    # Bases donde ya se habia corrido loaddata: las filas existentes no fallan ni se pisan
+    cliente = Cliente.objects.create(pk=1, nombre='Cliente 1')
+    Articulo.objects.create(pk=1, cliente=cliente, codigo='Articulo 1', descripcion='Editado', precio=1)
+
+    cargar('seeds/datos.json')
+
+    assert Articulo.objects.get(pk=1).descripcion == 'Editado'
+    assert Articulo.objects.count() == 2
+
+@pytest.mark.django_db
+def test_csv_in_batches(cliente, tmp_path):
+    ruta = escribir_csv(tmp_path / 'articulos.csv', range(1, 6))
+
+    cargar(ruta, '--modelo', 'api.articulo', '--lote', '2')
+
+    assert list(Articulo.objects.order_by('pk').values_list('codigo', flat=True)) == [f'COD-{pk}' for pk in range(1, 6)]
+    assert Articulo.objects.get(pk=3).precio == Decimal('3.50')
+    assert CargaDatos.objects.get(clave=clave_archivo(ruta)).filas == 5
+
+@pytest.mark.django_db
+def test_resumes_after_interruption(cliente, tmp_path):
+    ruta = escribir_csv(tmp_path / 'articulos.csv', range(1, 6))
+    # Como si una carga anterior se hubiera cortado despues del segundo lote de dos filas
+    CargaDatos.objects.create(clave=clave_archivo(ruta), archivo='articulos.csv', filas=4)
+
+    salida = cargar(ruta, '--modelo', 'api.articulo', '--lote', '2')
+
+    assert 'se retomo desde la fila 4' in salida
+    assert list(Articulo.objects.values_list('pk', flat=True)) == [5]
+
+@pytest.mark.django_db
+def test_jsonl_and_parquet(cliente, tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+
+    jsonl = tmp_path / 'articulos.jsonl'
+    jsonl.write_text('\n'.join(json.dumps({'id': pk, 'cliente': 7, 'codigo': f'J-{pk}', 'descripcion': 'JSON', 'precio': '2.00'}) for pk in (1, 2)))
+    parquet = tmp_path / 'articulos.parquet'
+    pq.write_table(pa.table({
+        'id': [3, 4], 'cliente_id': [7, 7], 'codigo': ['P-3', 'P-4'], 'descripcion': ['Parquet'] * 2,
+        'precio': pa.array([Decimal('3.25'), Decimal('4.75')], pa.decimal128(10, 2)),
+    }), parquet)
+
+    cargar(jsonl, parquet, '--modelo', 'api.articulo')
+
+    assert dict(Articulo.objects.values_list('codigo', 'precio')) == {
+        'J-1': Decimal('2.00'), 'J-2': Decimal('2.00'), 'P-3': Decimal('3.25'), 'P-4': Decimal('4.75'),
+    }
+
+@pytest.mark.django_db
+def test_invalid_input(cliente, tmp_path):
+    ruta = escribir_csv(tmp_path / 'articulos.csv', [1])
+    with pytest.raises(CommandError, match='--modelo'):
+        cargar(ruta)
+    with pytest.raises(CommandError, match='No existe el modelo'):
+        cargar(ruta, '--modelo', 'api.inexistente')
+
+    otro = tmp_path / 'otro.csv'
+    otro.write_text('id,color\n1,rojo\n')
+    with pytest.raises(CommandError, match='no tiene el campo color'):
+        cargar(otro, '--modelo', 'api.articulo')
+
+def test_json_is_read_in_blocks():
+    elementos = [{'model': 'api.articulo', 'pk': 12345, 'fields': {'codigo': 'Ñ "x"', 'precio': 1.5}}, 678, [1, 2], 'texto']
+    texto = ' [\n' + ' ,\n '.join(json.dumps(elemento) for elemento in elementos) + '\n] '
+
+    # Bloques de 3 caracteres: los numeros y las cadenas quedan partidos entre bloques
+    assert list(elementos_json(io.StringIO(texto), tamano_bloque=3)) == elementos
+    assert list(elementos_json(io.StringIO(' [ ] '), tamano_bloque=2)) == []
+    for invalido in ('{}', '[1, 2', '[1 2]', '[{"a": }]'):
+        with pytest.raises(DatosInvalidos, match='JSON invalido'):
+            list(elementos_json(io.StringIO(invalido), tamano_bloque=2))
+
+@pytest.mark.django_db
+def test_seals_only_the_batch_articles(cliente, tmp_path):
+    # Un articulo que otra conexion inserto y todavia no sello no es de esta carga
+    ajeno = Articulo.objects.create(pk=99, cliente=cliente, codigo='AJENO', descripcion='Otra conexion', precio=1)
+    Articulo.objects.filter(pk=ajeno.pk).update(version=None)
+    PrecioHistorico.objects.filter(articulo_id=ajeno.pk).delete()
+
+    cargar(escribir_csv(tmp_path / 'articulos.csv', [1, 2]), '--modelo', 'api.articulo')
+
+    assert Articulo.objects.get(pk=ajeno.pk).version is None
+    assert not PrecioHistorico.objects.filter(articulo_id=ajeno.pk).exists()
+    assert set(PrecioHistorico.objects.values_list('articulo_id', flat=True)) == {1, 2}
+
+@pytest.mark.django_db
+def test_missing_foreign_keys_are_rejected(cliente, tmp_path):
+    ruta = tmp_path / 'articulos.csv'
+    ruta.write_text('id,cliente_id,codigo,descripcion,precio\n1,7,A,A,1\n2,8,B,B,1\n')
+
+    with pytest.raises(CommandError, match=r'api.Articulo.cliente apunta a api.Cliente que no existen: 8'):
+        cargar(ruta, '--modelo', 'api.articulo')
+    assert not Articulo.objects.exists()
+
+@pytest.mark.django_db
+def test_reports_skipped_articles():
+    cliente = Cliente.objects.create(pk=1, nombre='Cliente 1')
+    Articulo.objects.create(pk=1, cliente=cliente, codigo='Articulo 1', descripcion='Editado', precio=1)
+
+    assert '1 articulos no se insertaron' in cargar('seeds/datos.json')
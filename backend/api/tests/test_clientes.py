@@ -0,0 +1,172 @@
+import io
+import pytest
+import pandas as pd
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from api.clientes import cliente_asignado, primer_cliente
+from api.models import Articulo, Cliente, Importacion, UsuarioCliente
+from api.spool import escribir_lote
+
+@pytest.fixture
+def clientes():
+    primero = Cliente.objects.create(nombre='Cliente Uno')
+    segundo = Cliente.objects.create(nombre='Cliente Dos')
+    Articulo.objects.create(cliente=primero, codigo='0101', descripcion='Articulo uno', precio=10)
+    Articulo.objects.create(cliente=segundo, codigo='0201', descripcion='Articulo dos', precio=20)
+    return primero, segundo
+
+def cliente_api(usuario):
+    api_client = APIClient()
+    api_client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.get_or_create(user=usuario)[0].key}')
+    return api_client
+
+@pytest.fixture
+def usuario(clientes):
+    """
+    Usuario asignado al segundo cliente.
+    """
+    usuario = User.objects.create_user('usuario')
+    UsuarioCliente.objects.create(usuario=usuario, cliente=clientes[1])
+    return usuario
+
+@pytest.mark.django_db
+def test_token_scopes_list(clientes, usuario):
+    response = cliente_api(usuario).get(reverse('articulo-list'))
+    assert response.status_code == 200
+    assert [articulo['codigo'] for articulo in response.data['results']] == ['0201']
+
+    # Pedir otro cliente no saltea el filtro
+    response = cliente_api(usuario).get(reverse('articulo-list'), {'cliente': clientes[0].pk})
+    assert response.data['results'] == []
+
+@pytest.mark.django_db
+def test_anonymous_list_is_not_scoped(clientes):
+    response = APIClient().get(reverse('articulo-list'))
+    assert [articulo['codigo'] for articulo in response.data['results']] == ['0101', '0201']
+
+@pytest.mark.django_db
+def test_token_cannot_touch_other_client(clientes, usuario):
+    api_client = cliente_api(usuario)
+    ajeno = Articulo.objects.get(codigo='0101')
+
+    assert api_client.get(reverse('articulo-detail', args=[ajeno.pk])).status_code == 404
+    assert api_client.delete(reverse('articulo-detail', args=[ajeno.pk])).status_code == 404
+    response = api_client.post(reverse('articulo-list'), {'cliente': clientes[0].pk, 'codigo': 'X', 'descripcion': 'X', 'precio': 1}, format='json')
+    assert response.status_code == 400
+    assert 'cliente' in response.data
+
+    response = api_client.delete(reverse('articulo-bulk'), [ajeno.pk], format='json')
+    assert response.status_code == 400
+    assert Articulo.objects.filter(pk=ajeno.pk).exists()
+
+@pytest.mark.django_db
+def test_user_without_client_is_forbidden(clientes):
+    response = cliente_api(User.objects.create_user('sin_cliente')).get(reverse('articulo-list'))
+    assert response.status_code == 403
+
+@pytest.mark.django_db
+def test_invalid_token(clientes):
+    api_client = APIClient()
+    api_client.credentials(HTTP_AUTHORIZATION='Token invalido')
+    assert api_client.get(reverse('articulo-list')).status_code == 401
+
+@pytest.mark.django_db
+def test_upload_uses_token_client(clientes, usuario):
+    archivo = io.BytesIO()
+    pd.DataFrame({'CODIGO': ['0301'], 'DESCRIPCION': ['Nuevo'], 'PRECIO': [5]}).to_excel(archivo, index=False)
+    archivo.seek(0)
+    archivo.name = 'catalogo.xlsx'
+
+    response = cliente_api(usuario).post(reverse('upload-excel'), {'file': archivo}, format='multipart')
+
+    assert response.status_code == 200
+    assert Articulo.objects.get(codigo='0301').cliente == clientes[1]
+
+@pytest.mark.django_db
+def test_download_uses_token_client(clientes, usuario):
+    response = cliente_api(usuario).get(reverse('download-excel'), {'format': 'csv'})
+    assert response.status_code == 200
+    assert response['Content-Disposition'] == 'attachment; filename="articulos_Cliente Dos.csv"'
+
+    response = APIClient().get(reverse('download-excel'), {'format': 'csv'})
+    assert response['Content-Disposition'] == 'attachment; filename="articulos_Cliente Uno.csv"'
+
+@pytest.mark.django_db
+def test_async_views_use_token_client(clientes, usuario):
+    token = Token.objects.create(user=usuario).key
+
+    async def pedir():
+        headers = {'Authorization': f'Token {token}'}
+        lista = await AsyncClient().get(reverse('articulo-list-async'), headers=headers)
+        descarga = await AsyncClient().get(reverse('download-excel-async'), {'format': 'csv'}, headers=headers)
+        return lista['X-Total-Count'], descarga['Content-Disposition']
+
+    assert async_to_sync(pedir)() == ('1', 'attachment; filename="articulos_Cliente Dos.csv"')
+
+@pytest.mark.django_db
+def test_client_is_cached_and_invalidated(clientes, usuario):
+    assert cliente_asignado(usuario) == clientes[1]
+    with CaptureQueriesContext(connection) as contexto:
+        assert cliente_asignado(usuario) == clientes[1]
+        assert primer_cliente() == clientes[0]
+        assert primer_cliente() == clientes[0]
+    assert len(contexto) == 1
+
+    # Reasignar el usuario vacia la cache
+    UsuarioCliente.objects.filter(usuario=usuario).update(cliente=clientes[0])
+    assert cliente_asignado(usuario) == clientes[1]
+    usuario.usuario_cliente.refresh_from_db()
+    usuario.usuario_cliente.save()
+    assert cliente_asignado(usuario) == clientes[0]
+
+@pytest.mark.django_db
+def test_token_scopes_clients(clientes, usuario):
+    primero, segundo = clientes
+    api_client = cliente_api(usuario)
+
+    assert [cliente['id'] for cliente in api_client.get(reverse('cliente-list')).data] == [segundo.pk]
+    assert api_client.get(reverse('cliente-detail', args=[primero.pk])).status_code == 404
+    assert api_client.patch(reverse('cliente-detail', args=[primero.pk]), {'nombre': 'Otro'}, format='json').status_code == 404
+    assert api_client.delete(reverse('cliente-detail', args=[primero.pk])).status_code == 404
+    assert api_client.post(reverse('cliente-list'), {'nombre': 'Nuevo'}, format='json').status_code == 403
+    assert Cliente.objects.filter(pk=primero.pk).exists()
+    assert Articulo.objects.filter(cliente=primero).count() == 1
+
+@pytest.mark.django_db
+def test_token_cannot_touch_other_client_uploads(clientes, usuario):
+    importacion = Importacion.objects.create(
+        cliente=clientes[0], archivo='tmp/ajena.xlsx', nombre_archivo='ajena.xlsx', tamano=4, estado=Importacion.SUBIENDO,
+    )
+    api_client = cliente_api(usuario)
+    url = reverse('carga-detail', kwargs={'pk': importacion.pk})
+
+    assert api_client.get(url).status_code == 404
+    assert api_client.put(f'{url}?offset=0', b'abcd', content_type='application/octet-stream').status_code == 404
+    assert api_client.post(reverse('carga-finalizar', kwargs={'pk': importacion.pk})).status_code == 404
+    assert api_client.get(reverse('importacion-detail', args=[importacion.pk])).status_code == 404
+
+    importacion.refresh_from_db()
+    assert importacion.recibidos == 0
+    assert importacion.estado == Importacion.SUBIENDO
+
+@pytest.mark.django_db
+def test_token_cannot_see_other_client_spool_batches(clientes, usuario, settings, tmp_path):
+    settings.SPOOL_DIR = tmp_path / 'spool'
+    primero, segundo = clientes
+    ajeno, _ = escribir_lote(primero, [({'archivo': 'a.xlsx', 'hoja': None}, [('0101', 'Uno', 1)])], 'a.xlsx')
+    propio, _ = escribir_lote(segundo, [({'archivo': 'b.xlsx', 'hoja': None}, [('0201', 'Dos', 2)])], 'b.xlsx')
+    api_client = cliente_api(usuario)
+
+    assert api_client.get(reverse('spool-lote', args=[ajeno])).status_code == 404
+    assert api_client.get(reverse('spool-lote', args=[propio])).data['estado'] == 'pendiente'
+
+    call_command('drenar_spool', una_vez=True, stdout=io.StringIO())
+    assert api_client.get(reverse('spool-lote', args=[ajeno])).status_code == 404
+    assert api_client.get(reverse('spool-lote', args=[propio])).data['estado'] == 'aplicado'
@@ -0,0 +1,47 @@
+import itertools
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api.models import Articulo, Cliente
+from api.tests.helpers import assert_consultas_constantes
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+@pytest.fixture
+def agregar_articulos():
+    cliente = Cliente.objects.create(nombre='Cliente de Pruebas')
+    otro_cliente = Cliente.objects.create(nombre='Otro Cliente')
+    numeros = itertools.count()
+
+    def agregar(cantidad):
+        Articulo.objects.bulk_create([
+            Articulo(cliente=[cliente, otro_cliente][n % 2], codigo=f'COD-{n}', descripcion=f'Articulo {n}', precio=n)
+            for n in itertools.islice(numeros, cantidad)
+        ])
+
+    agregar(2)
+    return agregar
+
+@pytest.mark.django_db
+def test_list_articulos_queries(api_client, agregar_articulos):
+    assert_consultas_constantes(lambda: api_client.get(reverse('articulo-list')), agregar_articulos)
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('formato', ['xlsx', 'csv'])
+def test_download_queries(api_client, agregar_articulos, formato):
+    def descargar():
+        response = api_client.get(reverse('download-excel'), {'format': formato})
+        b''.join(response.streaming_content)
+
+    assert_consultas_constantes(descargar, agregar_articulos)
+
+@pytest.mark.django_db
+def test_admin_changelist_queries(agregar_articulos):
+    User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+    client = APIClient()
+    client.login(username='admin', password='admin')
+
+    assert_consultas_constantes(lambda: client.get(reverse('admin:api_articulo_changelist')), agregar_articulos)
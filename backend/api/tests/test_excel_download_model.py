@@ -36,7 +36,7 @@ def test_download_excel_view(setup_data):
     assert response['Content-Type'] == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     assert f'attachment; filename="articulos_{setup_data.nombre}.xlsx"' in response['Content-Disposition']
 
-    excel_data = io.BytesIO(response.content)
+    excel_data = io.BytesIO(b''.join(response.streaming_content))
     df = pd.read_excel(excel_data)
 
     assert df.shape == (2, 5)
@@ -60,7 +60,60 @@ def test_download_excel_view_no_data(setup_data):
     assert response['Content-Type'] == 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     assert f'attachment; filename="articulos_{setup_data.nombre}.xlsx"' in response['Content-Disposition']
 
-    excel_data = io.BytesIO(response.content)
+    excel_data = io.BytesIO(b''.join(response.streaming_content))
     df = pd.read_excel(excel_data)
 
     assert df.shape == (2, 5)
+
+@pytest.mark.django_db
+def test_download_csv_view(setup_data):
+    factory = RequestFactory()
+    url = reverse('download-excel')
+    request = factory.get(url, {'format': 'csv'})
+    view = DownloadExcelView.as_view()
+
+    response = view(request)
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert response['Content-Type'] == 'text/csv; charset=utf-8'
+    assert f'attachment; filename="articulos_{setup_data.nombre}.csv"' in response['Content-Disposition']
+
+    df = pd.read_csv(io.StringIO(b''.join(response.streaming_content).decode('utf-8')), dtype={'codigo': str})
+
+    assert list(df.columns) == ['id', 'cliente_id', 'codigo', 'descripcion', 'precio']
+    assert list(df['codigo']) == ['123', '456']
+    assert list(df['precio']) == [10.0, 20.0]
+
+@pytest.mark.django_db
+def test_download_invalid_format(setup_data):
+    factory = RequestFactory()
+    request = factory.get(reverse('download-excel'), {'format': 'pdf'})
+
+    response = DownloadExcelView.as_view()(request)
+
+    assert response.status_code == 400
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('formato', ['parquet', 'arrow'])
+def test_download_columnar_view(setup_data, formato):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+    from decimal import Decimal
+
+    factory = RequestFactory()
+    request = factory.get(reverse('download-excel'), {'format': formato})
+    response = DownloadExcelView.as_view()(request)
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert f'attachment; filename="articulos_{setup_data.nombre}.{formato}"' in response['Content-Disposition']
+
+    contenido = pa.BufferReader(b''.join(response.streaming_content))
+    tabla = pq.read_table(contenido) if formato == 'parquet' else pa.ipc.open_stream(contenido).read_all()
+
+    assert tabla.column_names == ['id', 'cliente_id', 'codigo', 'descripcion', 'precio']
+    assert tabla.schema.field('codigo').type == pa.string()
+    assert tabla.schema.field('precio').type == pa.decimal128(10, 2)
+    assert tabla.column('codigo').to_pylist() == ['123', '456']
+    assert tabla.column('precio').to_pylist() == [Decimal('10.00'), Decimal('20.00')]
@@ -1,10 +1,17 @@
+import glob
+import io
 import os
+import tempfile
+import time
 import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from api.models import Cliente, Articulo
+from decimal import Decimal
+from api.importers import upsert_articulos, validar_lote
+from api.lectores import leer_archivos, leer_filas_xlsx, pool_de_procesos
 import pandas as pd
 
 # Despues de todas las pruebas, eliminamos los archivos temporales que se hayan generado
@@ -88,3 +95,246 @@ def test_upload_excel_view_invalid_file_format():
 
     # Elimino el archivo de prueba
     os.remove('prueba.txt')
+
+@pytest.mark.django_db
+def test_upload_excel_view_bulk_upsert():
+    client = APIClient()
+
+    cliente = Cliente.objects.create(nombre="Cliente de Prueba")
+    Articulo.objects.create(codigo='101', descripcion='Descripcion vieja', precio=1.0, cliente=cliente)
+    Articulo.objects.create(codigo='999', descripcion='No figura en el archivo', precio=5.0, cliente=cliente)
+
+    df = pd.DataFrame({
+        'codigo': ['101', '102', '103'],
+        'descripcion': ['Artículo 1', 'Artículo 2', 'Artículo 3'],
+        'precio': [100.0, 200.0, 300.0]
+    })
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine='xlsxwriter')
+
+    uploaded_file = SimpleUploadedFile('prueba.xlsx', buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    url = reverse('upload-excel')
+
+    response = client.post(url, {'file': uploaded_file}, format='multipart')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['procesados'] == 3
+    assert response.data['insertados'] == 2
+    assert response.data['actualizados'] == 1
+    assert response.data['sin_cambios'] == 1
+
+    assert Articulo.objects.filter(cliente=cliente).count() == 4
+    articulo = Articulo.objects.get(cliente=cliente, codigo='101')
+    assert articulo.descripcion == 'Artículo 1'
+    assert articulo.precio == 100.0
+
+@pytest.mark.django_db
+def test_upload_excel_view_missing_columns():
+    client = APIClient()
+    Cliente.objects.create(nombre="Cliente de Prueba")
+
+    df = pd.DataFrame({'codigo': ['101'], 'descripcion': ['Artículo 1']})
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine='xlsxwriter')
+
+    uploaded_file = SimpleUploadedFile('prueba.xlsx', buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    response = client.post(reverse('upload-excel'), {'file': uploaded_file}, format='multipart')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data['error'] == 'Error reading file: Missing columns: precio'
+    assert Articulo.objects.count() == 0
+
+def test_leer_filas_xlsx_only_reads_import_columns():
+    df = pd.DataFrame({
+        'id': [1, 2],
+        'precio': [100.5, 200.0],
+        'Codigo': ['A-1', 'A-2'],
+        'descripcion': ['Artículo 1', 'Artículo 2'],
+    })
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine='xlsxwriter')
+    buffer.seek(0)
+
+    assert list(leer_filas_xlsx(buffer)) == [
+        ('A-1', 'Artículo 1', 100.5),
+        ('A-2', 'Artículo 2', 200),
+    ]
+
+@pytest.mark.django_db
+def test_upload_excel_view_reports_all_invalid_rows():
+    client = APIClient()
+    cliente = Cliente.objects.create(nombre="Cliente de Prueba")
+
+    df = pd.DataFrame({
+        'codigo': ['0101', '102', None, '0101', 'X' * 51],
+        'descripcion': ['Artículo 1', None, 'Artículo 3', 'Artículo 4', 'Artículo 5'],
+        'precio': [100.0, 'caro', 300.0, 400.0, 123456789.0],
+    })
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine='xlsxwriter')
+
+    uploaded_file = SimpleUploadedFile('prueba.xlsx', buffer.getvalue())
+    response = client.post(reverse('upload-excel'), {'file': uploaded_file}, format='multipart')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data['total_errores'] == 6
+    assert [(e['fila'], e['columna']) for e in response.data['errores']] == [
+        (3, 'descripcion'),
+        (3, 'precio'),
+        (4, 'codigo'),
+        (5, 'codigo'),
+        (6, 'codigo'),
+        (6, 'precio'),
+    ]
+    # La primera fila era valida pero no se graba nada
+    assert Articulo.objects.filter(cliente=cliente).count() == 0
+
+def test_validar_lote_normaliza_columnas():
+    # `vistos` guarda los codigos como los compara la base (ver `clave_codigo`)
+    vistos = {'ya-visto'}
+    lote = [
+        ('0101', '  Artículo 1 ', 10.004),
+        (102, 'Artículo 2', '20'),
+        (103.0, 'Artículo 3', 30),
+        (None, None, None),
+        ('YA-VISTO', 'Artículo 5', 1),
+        # 2.675 es 2.67499999... como float: se redondea desde el texto
+        ('Ñandú', 'Artículo 7', 2.675),
+        # Para la collation de MySQL es el mismo codigo que el anterior
+        ('NANDU', 'Artículo 8', 1),
+    ]
+
+    filas, errores = validar_lote(lote, 2, vistos)
+
+    assert filas == [
+        ('0101', 'Artículo 1', Decimal('10.00')),
+        ('102', 'Artículo 2', Decimal('20.00')),
+        ('103', 'Artículo 3', Decimal('30.00')),
+        ('Ñandú', 'Artículo 7', Decimal('2.68')),
+    ]
+    assert errores == [
+        {'fila': 6, 'columna': 'codigo', 'error': 'El codigo esta repetido en el archivo'},
+        {'fila': 8, 'columna': 'codigo', 'error': 'El codigo esta repetido en el archivo'},
+    ]
+    assert vistos == {'ya-visto', '0101', '102', '103', 'nandu'}
+
+def test_validar_lote_precio_redondeado_fuera_de_rango():
+    filas, errores = validar_lote([('A', 'A', 99999999.995), ('B', 'B', 'inf'), ('C', 'C', 99999999.99)], 2, set())
+
+    assert filas == [('C', 'C', Decimal('99999999.99'))]
+    assert [(error['fila'], error['columna']) for error in errores] == [(2, 'precio'), (3, 'precio')]
+
+@pytest.mark.django_db
+def test_upload_matches_existing_codes_like_the_unique_index():
+    cliente = Cliente.objects.create(nombre="Cliente de Prueba")
+    existente = Articulo.objects.create(codigo='ABC', descripcion='Viejo', precio=1, cliente=cliente)
+
+    resultado = upsert_articulos(cliente, [({'archivo': 'a.xlsx', 'hoja': None}, [('abc', 'Nuevo', 2), ('XYZ', 'Otro', 3)])])
+
+    # "abc" es el articulo "ABC" para el indice unico: se actualiza con su codigo grabado
+    assert (resultado['insertados'], resultado['actualizados'], resultado['sin_cambios']) == (1, 1, 0)
+    assert sorted(Articulo.objects.values_list('codigo', 'descripcion')) == [('ABC', 'Nuevo'), ('XYZ', 'Otro')]
+    assert Articulo.objects.get(codigo='ABC').pk == existente.pk
+
+@pytest.mark.django_db
+def test_upload_excel_view_delta_skips_unchanged_rows(django_assert_max_num_queries):
+    client = APIClient()
+    cliente = Cliente.objects.create(nombre="Cliente de Prueba")
+    Articulo.objects.create(codigo='101', descripcion='Artículo 1', precio=100, cliente=cliente)
+    Articulo.objects.create(codigo='102', descripcion='Artículo 2', precio=200, cliente=cliente)
+
+    def subir(precios, params=''):
+        df = pd.DataFrame({'codigo': ['101', '102'], 'descripcion': ['Artículo 1', 'Artículo 2'], 'precio': precios})
+        buffer = io.BytesIO()
+        df.to_excel(buffer, index=False, engine='xlsxwriter')
+        uploaded_file = SimpleUploadedFile('prueba.xlsx', buffer.getvalue())
+        return client.post(reverse('upload-excel') + params, {'file': uploaded_file}, format='multipart')
+
+    response = subir([100.0, 250.0])
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['actualizados'] == 1
+    assert response.data['omitidos'] == 1
+    assert Articulo.objects.get(cliente=cliente, codigo='102').precio == 250
+
+    # Sin cambios no se escribe nada: solo el cliente, los articulos existentes y la transaccion
+    with django_assert_max_num_queries(4):
+        response = subir([100.0, 250.0])
+    assert response.data['actualizados'] == 0
+    assert response.data['omitidos'] == 2
+
+    response = subir([100.0, 250.0], '?delta=0')
+    assert response.data['actualizados'] == 2
+    assert response.data['omitidos'] == 0
+
+def libro_xlsx(hojas):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
+        for nombre, filas in hojas.items():
+            pd.DataFrame(filas, columns=['codigo', 'descripcion', 'precio']).to_excel(writer, sheet_name=nombre, index=False)
+    return buffer.getvalue()
+
+@pytest.mark.django_db
+def test_upload_excel_view_multiple_sheets_and_files():
+    client = APIClient()
+    cliente = Cliente.objects.create(nombre="Cliente de Prueba")
+
+    libro = libro_xlsx({
+        'Hoja A': [('101', 'Artículo 1', 100.0), ('102', 'Artículo 2', 200.0)],
+        'Hoja B': [('103', 'Artículo 3', 300.0)],
+    })
+    otro = libro_xlsx({'Unica': [('104', 'Artículo 4', 400.0)]})
+
+    response = client.post(reverse('upload-excel'), {
+        'file': [SimpleUploadedFile('libro.xlsx', libro), SimpleUploadedFile('otro.xlsx', otro)],
+    }, format='multipart')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['procesados'] == 4
+    assert response.data['insertados'] == 4
+    assert sorted(Articulo.objects.filter(cliente=cliente).values_list('codigo', flat=True)) == ['101', '102', '103', '104']
+
+@pytest.mark.django_db
+def test_upload_excel_view_duplicates_across_sheets():
+    client = APIClient()
+    Cliente.objects.create(nombre="Cliente de Prueba")
+
+    libro = libro_xlsx({
+        'Hoja A': [('101', 'Artículo 1', 100.0)],
+        'Hoja B': [('102', 'Artículo 2', 200.0), ('101', 'Repetido', 300.0)],
+    })
+    response = client.post(reverse('upload-excel'), {'file': SimpleUploadedFile('libro.xlsx', libro)}, format='multipart')
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data['errores'] == [{
+        'archivo': 'libro.xlsx', 'hoja': 'Hoja B', 'fila': 3, 'columna': 'codigo', 'error': 'El codigo esta repetido en el archivo',
+    }]
+    assert Articulo.objects.count() == 0
+
+def temporales_de_hojas():
+    return glob.glob(os.path.join(tempfile.gettempdir(), 'hoja-*.bloques'))
+
+def test_leer_archivos_reutiliza_el_pool_y_borra_los_temporales():
+    antes = set(temporales_de_hojas())
+    libro = libro_xlsx({
+        'Hoja A': [('101', 'Artículo 1', 100.0), (102, 'Artículo 2', 200.5)],
+        'Hoja B': [('103', 'Artículo 3', 300.0)],
+    })
+
+    def leer():
+        return [(origen['hoja'], list(filas)) for origen, filas in leer_archivos([(io.BytesIO(libro), 'libro.xlsx')], 2)]
+
+    # Las celdas llegan con su tipo, como al leer la hoja en este proceso
+    esperado = [('Hoja A', [('101', 'Artículo 1', 100), (102, 'Artículo 2', 200.5)]), ('Hoja B', [('103', 'Artículo 3', 300)])]
+    assert leer() == esperado
+    pool = pool_de_procesos()
+    assert leer() == esperado
+    assert pool_de_procesos() is pool
+
+    # Una importacion cortada en la primera hoja no deja las demas en disco
+    hojas = leer_archivos([(io.BytesIO(libro), 'libro.xlsx')], 2)
+    next(hojas)
+    hojas.close()
+    limite = time.monotonic() + 10
+    while set(temporales_de_hojas()) - antes and time.monotonic() < limite:
+        time.sleep(0.05)
+    assert set(temporales_de_hojas()) - antes == set()
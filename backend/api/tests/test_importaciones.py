@@ -0,0 +1,219 @@
+import io
+import os
+from datetime import timedelta
+import pytest
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from api import jobs
+from api.jobs import CargaDesfasada, agregar_parte, iniciar_carga, procesar_importacion, recuperar_importaciones, tomar_importacion
+from api.models import Articulo, Cliente, Importacion
+
+@pytest.fixture(autouse=True)
+def cleanup_files():
+    yield
+    for file in os.listdir('tmp'):
+        if not file.endswith('MOCK_DATA.xlsx'):
+            os.remove(os.path.join('tmp', file))
+
+def archivo_excel(nombre='prueba.xlsx'):
+    df = pd.DataFrame({
+        'codigo': ['101', '102'],
+        'descripcion': ['Artículo 1', 'Artículo 2'],
+        'precio': [100.0, 200.0]
+    })
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine='xlsxwriter')
+    return SimpleUploadedFile(nombre, buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+@pytest.mark.django_db
+def test_upload_async_encola_importacion():
+    client = APIClient()
+    cliente = Cliente.objects.create(nombre="Cliente de Prueba")
+
+    response = client.post(reverse('upload-excel') + '?async=1', {'file': archivo_excel()}, format='multipart')
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.data['estado'] == Importacion.PENDIENTE
+    assert response.data['procesados'] == 0
+
+    importacion = Importacion.objects.get(pk=response.data['id'])
+    assert importacion.cliente == cliente
+    assert os.path.exists(importacion.archivo)
+    assert Articulo.objects.count() == 0
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_procesa_importaciones_pendientes():
+    client = APIClient()
+    cliente = Cliente.objects.create(nombre="Cliente de Prueba")
+    Articulo.objects.create(codigo='101', descripcion='Descripcion vieja', precio=1.0, cliente=cliente)
+
+    response = client.post(reverse('upload-excel') + '?async=1', {'file': archivo_excel()}, format='multipart')
+    importacion = Importacion.objects.get(pk=response.data['id'])
+
+    call_command('procesar_importaciones', workers=1, una_vez=True, stdout=io.StringIO())
+
+    response = client.get(reverse('importacion-detail', kwargs={'pk': importacion.pk}))
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['estado'] == Importacion.FINALIZADA
+    assert response.data['procesados'] == 2
+    assert response.data['insertados'] == 1
+    assert response.data['actualizados'] == 1
+    assert response.data['finalizada'] is not None
+
+    assert Articulo.objects.get(cliente=cliente, codigo='101').descripcion == 'Artículo 1'
+    assert not os.path.exists(importacion.archivo)
+
+@pytest.mark.django_db(transaction=True)
+def test_worker_registra_errores_de_importacion():
+    cliente = Cliente.objects.create(nombre="Cliente de Prueba")
+    client = APIClient()
+
+    df = pd.DataFrame({'codigo': ['101']})
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine='xlsxwriter')
+    archivo = SimpleUploadedFile('prueba.xlsx', buffer.getvalue())
+
+    response = client.post(reverse('upload-excel') + '?async=1', {'file': archivo}, format='multipart')
+    call_command('procesar_importaciones', workers=1, una_vez=True, stdout=io.StringIO())
+
+    importacion = Importacion.objects.get(pk=response.data['id'])
+    assert importacion.estado == Importacion.ERROR
+    assert importacion.errores == ['Missing columns: descripcion, precio']
+    assert Articulo.objects.filter(cliente=cliente).count() == 0
+
+@pytest.mark.django_db(transaction=True)
+def test_carga_por_partes_reanudable():
+    client = APIClient()
+    Cliente.objects.create(nombre="Cliente de Prueba")
+    contenido = archivo_excel().read()
+    mitad = len(contenido) // 2
+
+    response = client.post(reverse('carga-list'), {'nombre': 'grande.xlsx', 'tamano': len(contenido)}, format='json')
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.data['estado'] == Importacion.SUBIENDO
+    pk = response.data['id']
+    url = reverse('carga-detail', kwargs={'pk': pk})
+
+    def enviar(offset, parte):
+        return client.put(f'{url}?offset={offset}', parte, content_type='application/octet-stream')
+
+    assert enviar(0, contenido[:mitad]).data['recibidos'] == mitad
+
+    # Un reintento con un offset viejo informa desde donde seguir
+    response = enviar(0, contenido[:mitad])
+    assert response.status_code == status.HTTP_409_CONFLICT
+    assert response.data['recibidos'] == mitad
+
+    # No se puede finalizar una carga incompleta
+    response = client.post(reverse('carga-finalizar', kwargs={'pk': pk}))
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    assert client.get(url).data['recibidos'] == mitad
+    assert enviar(mitad, contenido[mitad:]).data['recibidos'] == len(contenido)
+
+    response = client.post(reverse('carga-finalizar', kwargs={'pk': pk}))
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.data['estado'] == Importacion.PENDIENTE
+
+    importacion = Importacion.objects.get(pk=pk)
+    with open(importacion.archivo, 'rb') as archivo:
+        assert archivo.read() == contenido
+
+    call_command('procesar_importaciones', workers=1, una_vez=True, stdout=io.StringIO())
+    importacion.refresh_from_db()
+    assert importacion.estado == Importacion.FINALIZADA
+    assert Articulo.objects.count() == 2
+
+@pytest.mark.django_db
+def test_carga_por_partes_rechaza_bytes_de_mas():
+    client = APIClient()
+    Cliente.objects.create(nombre="Cliente de Prueba")
+
+    response = client.post(reverse('carga-list'), {'nombre': 'grande.xlsx', 'tamano': 10}, format='json')
+    url = reverse('carga-detail', kwargs={'pk': response.data['id']})
+
+    response = client.put(f'{url}?offset=0', b'x' * 11, content_type='application/octet-stream')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get(url).data['recibidos'] == 0
+
+    assert client.post(reverse('carga-list'), {'nombre': 'grande.csv', 'tamano': 10}, format='json').status_code == status.HTTP_400_BAD_REQUEST
+
+@pytest.mark.django_db
+def test_carga_por_partes_no_pisa_una_parte_confirmada():
+    importacion = iniciar_carga(Cliente.objects.create(nombre="Cliente de Prueba"), 'grande.xlsx', 8)
+
+    class CuerpoLento(io.BytesIO):
+        # Mientras se lee este cuerpo llega un reintento de la misma parte por otra conexion y se confirma
+        def read(self, *args):
+            if self.tell() == 0:
+                agregar_parte(importacion.pk, 0, io.BytesIO(b'AAAA'))
+            return super().read(*args)
+
+    with pytest.raises(CargaDesfasada) as error:
+        agregar_parte(importacion.pk, 0, CuerpoLento(b'BBBB'))
+    assert error.value.recibidos == 4
+
+    with open(importacion.archivo, 'rb') as archivo:
+        assert archivo.read() == b'AAAA'
+    assert not [nombre for nombre in os.listdir(os.path.dirname(importacion.archivo)) if nombre.endswith('.parte')]
+    os.remove(importacion.archivo)
+
+@pytest.mark.django_db(transaction=True)
+def test_avance_visible_mientras_la_importacion_corre(monkeypatch):
+    client = APIClient()
+    Cliente.objects.create(nombre="Cliente de Prueba")
+    response = client.post(reverse('upload-excel') + '?async=1', {'file': archivo_excel()}, format='multipart')
+    url = reverse('importacion-detail', kwargs={'pk': response.data['id']})
+
+    # Lotes de una fila; despues de cada uno se consulta la importacion con la transaccion del import abierta
+    vistos = []
+    upsert = jobs.upsert_articulos
+    def upsert_por_fila(cliente, hojas, al_procesar_lote):
+        def consultar(procesados):
+            al_procesar_lote(procesados)
+            data = client.get(url).data
+            vistos.append((data['estado'], data['procesados']))
+        return upsert(cliente, hojas, tamano_lote=1, al_procesar_lote=consultar)
+    monkeypatch.setattr(jobs, 'upsert_articulos', upsert_por_fila)
+
+    procesar_importacion(tomar_importacion())
+
+    assert vistos == [(Importacion.PROCESANDO, 1), (Importacion.PROCESANDO, 2)]
+    assert client.get(url).data['procesados'] == 2
+
+@pytest.mark.django_db
+def test_recupera_importaciones_de_un_worker_caido(settings):
+    cliente = Cliente.objects.create(nombre="Cliente de Prueba")
+    hace_un_rato = timezone.now() - timedelta(seconds=settings.IMPORTACION_VENCIMIENTO + 1)
+
+    def en_proceso(intentos, iniciada=hace_un_rato):
+        return Importacion.objects.create(
+            cliente=cliente, archivo='tmp/no-existe.xlsx', nombre_archivo='caida.xlsx',
+            estado=Importacion.PROCESANDO, iniciada=iniciada, intentos=intentos,
+        )
+    caida = en_proceso(1)
+    agotada = en_proceso(settings.IMPORTACION_REINTENTOS)
+    reciente = en_proceso(1, iniciada=timezone.now())
+    # Una importacion larga sigue publicando su latido aunque haya empezado hace mucho
+    viva = en_proceso(1)
+    jobs._Avance(viva).detenido.set()
+
+    assert recuperar_importaciones() == 2
+
+    caida.refresh_from_db()
+    assert (caida.estado, caida.iniciada) == (Importacion.PENDIENTE, None)
+    agotada.refresh_from_db()
+    assert agotada.estado == Importacion.ERROR
+    assert agotada.finalizada is not None
+    assert Importacion.objects.get(pk=reciente.pk).estado == Importacion.PROCESANDO
+    assert Importacion.objects.get(pk=viva.pk).estado == Importacion.PROCESANDO
+
+    # Al volver a tomarla se cuenta el intento
+    assert tomar_importacion().pk == caida.pk
+    caida.refresh_from_db()
+    assert (caida.estado, caida.intentos) == (Importacion.PROCESANDO, 2)
@@ -0,0 +1,69 @@
+import io
+import pytest
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from api.metrics import registro
+from api.models import Articulo, Cliente
+
+@pytest.fixture(autouse=True)
+def reiniciar_registro():
+    registro.reiniciar()
+    yield
+    registro.reiniciar()
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+@pytest.fixture
+def cliente():
+    cliente = Cliente.objects.create(nombre='Cliente de Pruebas')
+    Articulo.objects.create(cliente=cliente, codigo='COD-1', descripcion='Articulo 1', precio=10)
+    Articulo.objects.create(cliente=cliente, codigo='COD-2', descripcion='Articulo 2', precio=20)
+    return cliente
+
+def metricas(api_client):
+    response = api_client.get(reverse('metrics'))
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    return response.content.decode()
+
+@pytest.mark.django_db
+def test_list_reports_server_timing_and_metrics(api_client, cliente):
+    response = api_client.get(reverse('articulo-list'))
+
+    assert response.status_code == status.HTTP_200_OK
+    assert 'db;dur=' in response['Server-Timing']
+    assert 'total;dur=' in response['Server-Timing']
+
+    texto = metricas(api_client)
+    assert 'api_request_duration_seconds_count{route="articulo-list",method="GET",status="200"} 1' in texto
+    assert 'api_request_duration_seconds_bucket{route="articulo-list",method="GET",status="200",le="+Inf"} 1' in texto
+    assert 'api_rows_serialized_total{route="articulo-list"} 2' in texto
+    assert f'api_response_bytes_total{{route="articulo-list"}} {len(response.content)}' in texto
+
+@pytest.mark.django_db
+def test_streaming_download_records_render_phase(api_client, cliente):
+    response = api_client.get(reverse('download-excel'), {'format': 'csv'})
+    contenido = b''.join(response.streaming_content)
+    response.close()
+
+    texto = metricas(api_client)
+    assert 'api_request_duration_seconds_count{route="download-excel",method="GET",status="200"} 1' in texto
+    assert 'api_phase_duration_seconds_count{route="download-excel",phase="render"} 1' in texto
+    assert 'api_rows_serialized_total{route="download-excel"} 2' in texto
+    assert f'api_response_bytes_total{{route="download-excel"}} {len(contenido)}' in texto
+
+@pytest.mark.django_db
+def test_upload_reports_parse_phase(api_client, cliente):
+    buffer = io.BytesIO()
+    pd.DataFrame({'codigo': ['101'], 'descripcion': ['Artículo 1'], 'precio': [100.0]}).to_excel(buffer, index=False, engine='xlsxwriter')
+
+    response = api_client.post(reverse('upload-excel'), {'file': SimpleUploadedFile('prueba.xlsx', buffer.getvalue())}, format='multipart')
+
+    assert response.status_code == status.HTTP_200_OK
+    assert 'parse;dur=' in response['Server-Timing']
+    assert 'api_phase_duration_seconds_count{route="upload-excel",phase="parse"} 1' in metricas(api_client)
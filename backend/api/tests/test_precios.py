@@ -0,0 +1,140 @@
+import io
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+import pytest
+import pandas as pd
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from api.models import Articulo, Cliente, PrecioHistorico
+
+@pytest.fixture
+def api_client():
+    return APIClient()
+
+@pytest.fixture
+def cliente():
+    return Cliente.objects.create(nombre='Cliente de Pruebas')
+
+def subir(api_client, precios):
+    df = pd.DataFrame({
+        'codigo': [f'COD-{n}' for n in range(len(precios))],
+        'descripcion': [f'Articulo {n}' for n in range(len(precios))],
+        'precio': precios,
+    })
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine='xlsxwriter')
+    return api_client.post(reverse('upload-excel'), {'file': SimpleUploadedFile('precios.xlsx', buffer.getvalue())}, format='multipart')
+
+def historial(articulo):
+    return list(PrecioHistorico.objects.filter(articulo=articulo).order_by('valid_from', 'id').values_list('precio', flat=True))
+
+@pytest.mark.django_db
+def test_upload_records_price_changes_in_one_insert(api_client, cliente):
+    assert subir(api_client, [10.0, 20.0, 30.0]).status_code == status.HTTP_200_OK
+    assert PrecioHistorico.objects.count() == 3
+
+    with CaptureQueriesContext(connection) as consultas:
+        response = subir(api_client, [10.0, 25.0, 35.0])
+    assert response.status_code == status.HTTP_200_OK
+
+    inserts = [q['sql'] for q in consultas.captured_queries if q['sql'].startswith('INSERT INTO "api_preciohistorico"')]
+    assert len(inserts) == 1
+    assert historial(Articulo.objects.get(codigo='COD-0')) == [Decimal('10.00')]
+    assert historial(Articulo.objects.get(codigo='COD-1')) == [Decimal('20.00'), Decimal('25.00')]
+    assert historial(Articulo.objects.get(codigo='COD-2')) == [Decimal('30.00'), Decimal('35.00')]
+
+@pytest.mark.django_db
+def test_edits_record_price_changes(api_client, cliente):
+    response = api_client.post(reverse('articulo-list'), {'cliente': cliente.id, 'codigo': 'A', 'descripcion': 'A', 'precio': 5}, format='json')
+    articulo = Articulo.objects.get(pk=response.data['id'])
+
+    api_client.patch(reverse('articulo-detail', args=[articulo.id]), {'descripcion': 'Sin cambio de precio'}, format='json')
+    api_client.patch(reverse('articulo-detail', args=[articulo.id]), {'precio': 6}, format='json')
+    api_client.patch(reverse('articulo-bulk'), [{'id': articulo.id, 'precio': 7}], format='json')
+
+    assert historial(articulo) == [Decimal('5.00'), Decimal('6.00'), Decimal('7.00')]
+
+@pytest.mark.django_db
+def test_price_snapshot_at_date(api_client, cliente, django_assert_num_queries):
+    enero, febrero, marzo = (datetime(2024, mes, 1, tzinfo=timezone.utc) for mes in (1, 2, 3))
+    viejo = Articulo.objects.create(cliente=cliente, codigo='VIEJO', descripcion='Viejo', precio=12)
+    nuevo = Articulo.objects.create(cliente=cliente, codigo='NUEVO', descripcion='Nuevo', precio=50)
+    PrecioHistorico.objects.bulk_create([
+        PrecioHistorico(articulo=viejo, cliente_id=cliente.id, codigo='VIEJO', precio=10, valid_from=enero, valid_to=febrero),
+        PrecioHistorico(articulo=viejo, cliente_id=cliente.id, codigo='VIEJO', precio=11, valid_from=febrero, valid_to=marzo),
+        PrecioHistorico(articulo=viejo, cliente_id=cliente.id, codigo='VIEJO', precio=12, valid_from=marzo),
+        PrecioHistorico(articulo=nuevo, cliente_id=cliente.id, codigo='NUEVO', precio=50, valid_from=marzo),
+    ])
+    url = reverse('articulo-precios')
+
+    with django_assert_num_queries(1):
+        response = api_client.get(url, {'fecha': (febrero + timedelta(days=3)).isoformat(), 'cliente': cliente.id})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['results'] == [{'id': viejo.id, 'cliente': cliente.id, 'codigo': 'VIEJO', 'precio': '11.00'}]
+
+    # Una fecha sin hora incluye todo ese dia
+    response = api_client.get(url, {'fecha': '2024-03-01'})
+    assert [(a['codigo'], a['precio']) for a in response.data['results']] == [('VIEJO', '12.00'), ('NUEVO', '50.00')]
+
+    assert api_client.get(url, {'fecha': '2023-12-31'}).data['results'] == []
+
+@pytest.mark.django_db
+def test_price_snapshot_invalid_date(api_client, cliente):
+    response = api_client.get(reverse('articulo-precios'), {'fecha': 'ayer'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert 'fecha' in response.data
+
+@pytest.mark.django_db
+def test_price_snapshot_keeps_deleted_and_renamed_articles(api_client, cliente):
+    otro = Cliente.objects.create(nombre='Otro cliente')
+    borrado = api_client.post(reverse('articulo-list'), {'cliente': cliente.id, 'codigo': 'BORRADO', 'descripcion': 'B', 'precio': 5}, format='json').data
+    renombrado = api_client.post(reverse('articulo-list'), {'cliente': cliente.id, 'codigo': 'ANTES', 'descripcion': 'R', 'precio': 7}, format='json').data
+    antes = datetime.now(timezone.utc).isoformat()
+
+    api_client.delete(reverse('articulo-detail', args=[borrado['id']]))
+    api_client.patch(reverse('articulo-detail', args=[renombrado['id']]), {'codigo': 'DESPUES', 'cliente': otro.id}, format='json')
+    url = reverse('articulo-precios')
+
+    # Antes de los cambios el catalogo era el de entonces, aunque un articulo ya no exista
+    response = api_client.get(url, {'fecha': antes, 'cliente': cliente.id})
+    assert [(a['id'], a['codigo'], a['precio']) for a in response.data['results']] == [
+        (borrado['id'], 'BORRADO', '5.00'), (renombrado['id'], 'ANTES', '7.00'),
+    ]
+
+    # Ahora el borrado no aparece y el otro figura con su codigo y cliente nuevos
+    assert api_client.get(url, {'cliente': cliente.id}).data['results'] == []
+    assert api_client.get(url, {'cliente': otro.id}).data['results'] == [
+        {'id': renombrado['id'], 'cliente': otro.id, 'codigo': 'DESPUES', 'precio': '7.00'},
+    ]
+
+@pytest.mark.django_db
+def test_price_history_rows_are_closed_by_the_next_one(api_client, cliente):
+    articulo = api_client.post(reverse('articulo-list'), {'cliente': cliente.id, 'codigo': 'A', 'descripcion': 'A', 'precio': 5}, format='json').data
+    api_client.patch(reverse('articulo-detail', args=[articulo['id']]), {'precio': 6}, format='json')
+    api_client.delete(reverse('articulo-detail', args=[articulo['id']]))
+
+    filas = list(PrecioHistorico.objects.filter(articulo_id=articulo['id']).order_by('id').values_list('precio', 'valid_from', 'valid_to'))
+    assert [precio for precio, _, _ in filas] == [Decimal('5.00'), Decimal('6.00'), None]
+    # Cada fila queda vigente hasta la siguiente; solo la ultima sigue abierta
+    assert [hasta for _, _, hasta in filas] == [filas[1][1], filas[2][1], None]
+
+@pytest.mark.django_db
+def test_price_snapshot_is_paginated(api_client, cliente):
+    for n in range(5):
+        api_client.post(reverse('articulo-list'), {'cliente': cliente.id, 'codigo': f'P{n}', 'descripcion': 'P', 'precio': n}, format='json')
+
+    codigos, url, params = [], reverse('articulo-precios'), {'page_size': 2}
+    while url:
+        response = api_client.get(url, params)
+        if not codigos:
+            api_client.post(reverse('articulo-list'), {'cliente': cliente.id, 'codigo': 'DESPUES', 'descripcion': 'P', 'precio': 1}, format='json')
+        assert len(response.data['results']) <= 2
+        codigos += [a['codigo'] for a in response.data['results']]
+        url, params = response.data['next'], None
+        # Las paginas siguientes conservan el momento de la primera
+        assert url is None or 'fecha=' in url
+    assert codigos == ['P0', 'P1', 'P2', 'P3', 'P4']
@@ -0,0 +1,60 @@
+import pytest
+from django.core.management import CommandError
+from django.db import connection
+from api.management.commands.prueba_carga import ClienteLocal, PruebaCarga, clasificar, leer_mezcla
+from api.models import Articulo, Cliente
+
+def test_leer_mezcla():
+    assert leer_mezcla('lectura=3,upload=1') == {'lectura': 3.0, 'upload': 1.0}
+    with pytest.raises(CommandError):
+        leer_mezcla('lectura=3,borrado=1')
+    with pytest.raises(CommandError):
+        leer_mezcla('lectura=0')
+
+@pytest.mark.parametrize('estado, texto, resultado', [
+    (201, '', 'ok'),
+    (400, '{"error": "Error reading file: (1213, \'Deadlock found when trying to get lock\')"}', 'deadlock'),
+    (500, "(1205, 'Lock wait timeout exceeded; try restarting transaction')", 'bloqueo'),
+    (500, 'database is locked', 'bloqueo'),
+    (400, '{"non_field_errors": ["The fields cliente, codigo must make a unique set."]}', 'conflicto'),
+    (400, '{"precio": ["A valid number is required."]}', 'error'),
+    (400, '{"codigo": ["El codigo del articulo ya existe para este cliente"]}', 'conflicto'),
+    (0, 'Connection refused', 'error'),
+])
+def test_clasificar(estado, texto, resultado):
+    assert clasificar(estado, texto) == resultado
+
+@pytest.mark.django_db(transaction=True)
+def test_prueba_carga_local():
+    cliente = Cliente.objects.create(nombre='Prueba de carga')
+    articulos = [Articulo.objects.create(cliente=cliente, codigo=f'ART-{n}', descripcion='Articulo', precio=1) for n in range(5)]
+
+    prueba = PruebaCarga(
+        ClienteLocal(), cliente.pk, [a.pk for a in articulos], [a.codigo for a in articulos],
+        leer_mezcla('lectura=1,escritura=1,download=1'), filas_upload=5, codigos_alta=3, semilla=1,
+    )
+    resultado = prueba.correr(hilos=1, duracion=30, requests=30)
+
+    assert 30 <= resultado['requests'] <= 45
+    assert resultado['error'] == resultado['deadlock'] == 0
+    assert {operacion['operacion'] for operacion in resultado['operaciones']} >= {'listar', 'detalle', 'modificar', 'download'}
+
+# La base de test de SQLite es en memoria con cache compartida: los hilos se bloquean por tabla y fallan en el
+# acto ("database table is locked") en lugar de esperar. `prueba_carga` sin tests usa un archivo; aca la prueba
+# concurrente corre solo con una base real (MySQL)
+@pytest.mark.skipif(connection.vendor == 'sqlite', reason='La base de test de SQLite no admite escrituras concurrentes entre hilos')
+@pytest.mark.django_db(transaction=True)
+def test_prueba_carga_local_concurrente():
+    cliente = Cliente.objects.create(nombre='Prueba de carga')
+    articulos = [Articulo.objects.create(cliente=cliente, codigo=f'ART-{n}', descripcion='Articulo', precio=1) for n in range(20)]
+
+    prueba = PruebaCarga(
+        ClienteLocal(), cliente.pk, [a.pk for a in articulos], [a.codigo for a in articulos],
+        leer_mezcla('lectura=2,escritura=2,upload=1,download=1'), filas_upload=20, codigos_alta=3, semilla=1,
+    )
+    resultado = prueba.correr(hilos=4, duracion=30, requests=80)
+
+    # Los bloqueos y deadlocks se cuentan como tales; nada termina como error inesperado
+    assert 80 <= resultado['requests'] <= 160
+    assert resultado['error'] == 0
+    assert resultado['ok'] > 0
@@ -0,0 +1,175 @@
+import contextlib
+import io
+from unittest import mock
+import pytest
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connections
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from api.models import Articulo, Cliente, LoteAplicado, PrecioHistorico, UsuarioCliente
+from api.spool import aplicar_lote, escribir_lote, lotes_pendientes
+
+@pytest.fixture(autouse=True)
+def spool_dir(settings, tmp_path):
+    settings.SPOOL_DIR = tmp_path / 'spool'
+    return settings.SPOOL_DIR
+
+@pytest.fixture
+def cliente():
+    return Cliente.objects.create(nombre='Cliente de Prueba')
+
+def archivo_excel(codigos, precios, nombre='prueba.xlsx'):
+    buffer = io.BytesIO()
+    pd.DataFrame({
+        'codigo': codigos,
+        'descripcion': [f'Articulo {codigo}' for codigo in codigos],
+        'precio': precios,
+    }).to_excel(buffer, index=False, engine='xlsxwriter')
+    return SimpleUploadedFile(nombre, buffer.getvalue())
+
+def subir(archivo, token=None):
+    api_client = APIClient()
+    if token is not None:
+        api_client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+    return api_client.post(reverse('upload-excel') + '?spool=1', {'file': archivo}, format='multipart')
+
+def base_caida():
+    return mock.patch.object(connections['default'], 'cursor', side_effect=OperationalError('Base caida'))
+
+@pytest.mark.django_db
+def test_spool_acknowledges_without_writing(cliente, spool_dir):
+    response = subir(archivo_excel(['0101', '0102'], [10.5, 20]))
+
+    assert response.status_code == status.HTTP_202_ACCEPTED
+    assert response.data['procesados'] == 2
+    assert Articulo.objects.count() == 0
+    assert [ruta.stem for ruta in lotes_pendientes()] == [response.data['lote']]
+
+    estado = APIClient().get(reverse('spool-lote', args=[response.data['lote']]))
+    assert estado.data == {'lote': response.data['lote'], 'estado': 'pendiente'}
+
+@pytest.mark.django_db
+def test_spool_rejects_invalid_rows(cliente, spool_dir):
+    response = subir(archivo_excel(['0101', '0101'], [10, 'abc']))
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data['total_errores'] == 2
+    assert list(spool_dir.iterdir()) == []
+
+@pytest.mark.django_db
+def test_drain_applies_batches_in_order(cliente):
+    primero = subir(archivo_excel(['0101', '0102'], [10.5, 20])).data['lote']
+    segundo = subir(archivo_excel(['0101'], [11])).data['lote']
+
+    call_command('drenar_spool', '--una-vez')
+
+    assert lotes_pendientes() == []
+    assert dict(Articulo.objects.values_list('codigo', 'precio')) == {'0101': pytest.approx(11), '0102': pytest.approx(20)}
+    assert PrecioHistorico.objects.count() == 3
+
+    estado = APIClient().get(reverse('spool-lote', args=[primero]))
+    assert estado.data['estado'] == 'aplicado'
+    assert estado.data['insertados'] == 2
+    assert LoteAplicado.objects.get(pk=segundo).resultado['actualizados'] == 1
+
+@pytest.mark.django_db
+def test_apply_is_idempotent(cliente):
+    lote, _ = escribir_lote(cliente, [({'archivo': 'a.xlsx', 'hoja': None}, [('0101', 'Articulo', 10)])], 'a.xlsx')
+    ruta = lotes_pendientes()[0]
+    copia = ruta.read_bytes()
+
+    assert aplicar_lote(ruta)['insertados'] == 1
+
+    # Como si el proceso se hubiera cortado antes de borrar el archivo
+    ruta.write_bytes(copia)
+    assert aplicar_lote(ruta) is None
+    assert not ruta.exists()
+    assert Articulo.objects.count() == 1
+    assert PrecioHistorico.objects.count() == 1
+
+@pytest.mark.django_db
+def test_drain_sets_aside_batches_of_deleted_clients(cliente, spool_dir):
+    escribir_lote(cliente, [({'archivo': 'a.xlsx', 'hoja': None}, [('0101', 'Articulo', 10)])], 'a.xlsx')
+    cliente.delete()
+
+    call_command('drenar_spool', '--una-vez')
+
+    assert lotes_pendientes() == []
+    assert [ruta.suffix for ruta in spool_dir.iterdir()] == ['.error']
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('falla', ['truncado', 'filas_invalidas', 'integridad'])
+def test_drain_sets_aside_batches_that_always_fail(cliente, spool_dir, falla):
+    escribir_lote(cliente, [({'archivo': 'a.xlsx', 'hoja': None}, [(f'{n:04}', 'Articulo', 10) for n in range(1000)])], 'a.xlsx')
+    ruta = lotes_pendientes()[0]
+    siguiente, _ = escribir_lote(cliente, [({'archivo': 'b.xlsx', 'hoja': None}, [('B1', 'Articulo', 20)])], 'b.xlsx')
+
+    if falla == 'truncado':
+        contenido = ruta.read_bytes()
+        ruta.write_bytes(contenido[:len(contenido) // 2])
+        upsert = contextlib.nullcontext()
+    else:
+        error = ValueError('precio invalido') if falla == 'filas_invalidas' else IntegrityError('FOREIGN KEY constraint failed')
+        upsert = mock.patch('api.spool.upsert_articulos', side_effect=[error, {'insertados': 1}])
+
+    stderr = io.StringIO()
+    with upsert:
+        call_command('drenar_spool', '--una-vez', stderr=stderr)
+
+    # El lote se aparta y el drenador sigue con los siguientes
+    assert lotes_pendientes() == []
+    assert sorted(r.name for r in spool_dir.iterdir()) == sorted([ruta.name + '.error'])
+    assert 'se aparta el lote' in stderr.getvalue()
+    assert LoteAplicado.objects.filter(pk=siguiente).exists()
+
+@pytest.mark.django_db
+def test_drain_retries_connection_errors(cliente, spool_dir):
+    escribir_lote(cliente, [({'archivo': 'a.xlsx', 'hoja': None}, [('0101', 'Articulo', 10)])], 'a.xlsx')
+
+    with mock.patch('api.spool.upsert_articulos', side_effect=OperationalError('Base caida')):
+        call_command('drenar_spool', '--una-vez', stderr=io.StringIO())
+    assert len(lotes_pendientes()) == 1
+
+    call_command('drenar_spool', '--una-vez')
+    assert lotes_pendientes() == []
+    assert Articulo.objects.count() == 1
+
+@pytest.mark.django_db
+def test_spool_lote_not_found():
+    response = APIClient().get(reverse('spool-lote', args=['0' * 20 + '-' + 'a' * 32]))
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+@pytest.mark.django_db
+def test_spool_accepts_uploads_with_the_database_down(cliente, spool_dir):
+    otro = Cliente.objects.create(nombre='Cliente del token')
+    usuario = User.objects.create_user('usuario')
+    UsuarioCliente.objects.create(usuario=usuario, cliente=otro)
+    token = Token.objects.create(user=usuario).key
+
+    with base_caida():
+        response = subir(archivo_excel(['0101'], [10]), token)
+        invalido = subir(archivo_excel(['0102'], [20]), 'no-existe')
+    assert response.status_code == invalido.status_code == status.HTTP_202_ACCEPTED
+
+    # El cliente del token se resuelve cuando la base vuelve: el lote se consulta y se aplica a ese cliente
+    api_client = APIClient()
+    api_client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+    assert api_client.get(reverse('spool-lote', args=[response.data['lote']])).data['estado'] == 'pendiente'
+    assert api_client.get(reverse('spool-lote', args=[invalido.data['lote']])).status_code == status.HTTP_404_NOT_FOUND
+
+    call_command('drenar_spool', '--una-vez')
+
+    assert list(Articulo.objects.values_list('cliente_id', 'codigo')) == [(otro.pk, '0101')]
+    assert [ruta.name for ruta in spool_dir.iterdir()] == [f"{invalido.data['lote']}.arrows.error"]
+
+@pytest.mark.django_db
+def test_upload_without_spool_fails_with_the_database_down(cliente):
+    api_client = APIClient(raise_request_exception=False)
+    with base_caida():
+        response = api_client.post(reverse('upload-excel'), {'file': archivo_excel(['0101'], [10])}, format='multipart')
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -1,16 +1,26 @@
-from django.urls import include, path
+from django.urls import include, path, re_path
 from . import views
 from rest_framework.routers import DefaultRouter
-from .views import UploadExcelView, DownloadExcelView
+from .views import UploadExcelView, DownloadExcelView, MetricasView, CargaPorPartesView, ParteCargaView, FinalizarCargaView, LoteSpoolView
+from .async_views import ArticuloListAsyncView, DownloadAsyncView
 
 router =  DefaultRouter()
 router.register(r'clientes', views.ClienteViewSet)
 router.register(r'articulos', views.ArticuloViewSet)
+router.register(r'imports', views.ImportacionViewSet)
 
 # Aplicamos api versioning
 urlpatterns = [
     path('api/v1/', include(router.urls)),
     path('api/v1/upload/', UploadExcelView.as_view(), name='upload-excel'),
+    path('api/v1/uploads/', CargaPorPartesView.as_view(), name='carga-list'),
+    path('api/v1/uploads/<int:pk>/', ParteCargaView.as_view(), name='carga-detail'),
+    path('api/v1/uploads/<int:pk>/finalizar/', FinalizarCargaView.as_view(), name='carga-finalizar'),
+    re_path(r'^api/v1/spool/(?P<lote>\d{20}-[0-9a-f]{32})/$', LoteSpoolView.as_view(), name='spool-lote'),
     path('api/v1/download/', DownloadExcelView.as_view(), name='download-excel'),
+    path('api/v1/metrics/', MetricasView.as_view(), name='metrics'),
+    # Versiones async del listado y la descarga, para servir con ASGI (app/asgi.py)
+    path('api/v1/async/articulos/', ArticuloListAsyncView.as_view(), name='articulo-list-async'),
+    path('api/v1/async/download/', DownloadAsyncView.as_view(), name='download-excel-async'),
 
 ]
\ No newline at end of file
@@ -1,105 +1,450 @@
 import io
-import os
+from datetime import datetime, time
+from django.db import DatabaseError, transaction
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework import viewsets, status as st
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-import pandas as pd
-from .models import Cliente, Articulo
-from .serializers import ClienteSerializer, ArticuloSerializer
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from rest_framework.utils.urls import replace_query_param
+from .models import Cliente, Articulo, Importacion
+from .serializers import ClienteSerializer, ArticuloSerializer, ArticuloBulkSerializer, ArticuloListadoSerializer, ImportacionSerializer, campos_solicitados
+from .pagination import ArticuloCursorPagination
+from .clientes import clave_token, cliente_asignado, cliente_de
+from .cambios import cambios_articulos, eliminar_articulos
+from .filters import filtrar_articulos
+from .cache import cachear_contenido, clave_respuesta, etag, etag_coincide, invalidar_catalogo, version_catalogo
+from django.conf import settings
+from django.core.cache import cache
+from .importers import ArchivoInvalido, upsert_articulos
+from .lectores import leer_archivos
+from .jobs import CargaDesfasada, CargaInvalida, agregar_parte, cargas_de, encolar_importacion, finalizar_carga, iniciar_carga
+from .exporters import EXPORTADORES
+from .metrics import cronometrar, registro
+from .precios import fila_historial, precios_vigentes, registrar_precios
+from .spool import escribir_lote, estado_lote
 from rest_framework.parsers import MultiPartParser, FormParser
-import time
+
+def momento_consultado(valor):
+    """
+    Interpreta el parametro `fecha`: fecha y hora ISO 8601 o solo fecha, que se toma hasta el final del dia.
+    Sin zona horaria se usa la de settings.TIME_ZONE.
+    """
+    try:
+        dia = parse_date(valor)
+        momento = datetime.combine(dia, time.max) if dia else parse_datetime(valor)
+    except ValueError:
+        momento = None
+    if momento is None:
+        raise ValidationError({'fecha': 'Debe ser una fecha (AAAA-MM-DD) o fecha y hora ISO 8601.'})
+    return timezone.make_aware(momento) if timezone.is_naive(momento) else momento
 
 # Create your views here.
 class ClienteViewSet(viewsets.ModelViewSet):
     queryset = Cliente.objects.all()
     serializer_class = ClienteSerializer
 
+    def get_queryset(self):
+        # Un usuario con cliente solo ve, modifica o borra el suyo
+        cliente = cliente_asignado(self.request.user)
+        if cliente is None:
+            return super().get_queryset()
+        return super().get_queryset().filter(pk=cliente.pk)
+
+    def perform_create(self, serializer):
+        if cliente_asignado(self.request.user) is not None:
+            raise PermissionDenied('Un usuario con cliente asignado no puede crear clientes.')
+        super().perform_create(serializer)
+
+    def perform_destroy(self, instance):
+        # Los articulos se borrarian en cascada sin marca de baja: se borran antes, en la misma transaccion
+        with transaction.atomic():
+            eliminar_articulos(instance.articulos.all())
+            super().perform_destroy(instance)
+        invalidar_catalogo(instance.pk)
+
 class ArticuloViewSet(viewsets.ModelViewSet):
     queryset = Articulo.objects.all()
     serializer_class = ArticuloSerializer
+    pagination_class = ArticuloCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # Los usuarios con cliente solo ven sus articulos: el filtro usa el indice unico (cliente, codigo)
+        cliente = cliente_asignado(self.request.user)
+        if cliente is not None:
+            queryset = queryset.filter(cliente=cliente)
+        if self.action == 'list':
+            queryset = filtrar_articulos(queryset, self.request.query_params)
+
+        # Con ?fields= solo traemos de la base las columnas pedidas (y las que necesita el cursor)
+        campos = campos_solicitados(self.request)
+        if campos:
+            columnas = {f.name for f in Articulo._meta.concrete_fields} & set(campos)
+            queryset = queryset.only('id', 'cliente', *columnas)
+
+        return queryset
+
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), 'cliente_asignado': cliente_asignado(self.request.user)}
+
+    def list(self, request, *args, **kwargs):
+        # Las paginas del listado se cachean por cliente y version del catalogo. Cualquier escritura
+        # incrementa la version, por lo que nunca se sirve una pagina desactualizada. Para los usuarios
+        # con cliente la clave es la de su cliente, asi nunca comparten paginas con otro
+        cliente = cliente_asignado(request.user)
+        cliente_id = cliente.pk if cliente is not None else request.query_params.get('cliente')
+        clave = clave_respuesta('lista', cliente_id, version_catalogo(cliente_id), request)
+        valor_etag = etag(clave)
+        if etag_coincide(request, valor_etag):
+            return Response(status=st.HTTP_304_NOT_MODIFIED, headers={'ETag': valor_etag})
+
+        data = cache.get(clave)
+        if data is None:
+            response = self.listar(request)
+            cache.set(clave, response.data, settings.CATALOGO_CACHE_TIMEOUT)
+        else:
+            response = Response(data)
+
+        response['ETag'] = valor_etag
+        return response
+
+    def listar(self, request):
+        # Camino rapido del listado: filas de values_list serializadas por ArticuloListadoSerializer
+        serializer = ArticuloListadoSerializer(campos_solicitados(request))
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*serializer.columnas)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializer.representar(page))
+        return Response(serializer.representar(queryset))
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            registrar_precios([fila_historial(serializer.instance)], nuevos=True)
+        invalidar_catalogo(serializer.instance.cliente_id)
+
+    def perform_update(self, serializer):
+        cliente_anterior = serializer.instance.cliente_id
+        historial_anterior = fila_historial(serializer.instance)
+        with transaction.atomic():
+            super().perform_update(serializer)
+            if fila_historial(serializer.instance) != historial_anterior:
+                registrar_precios([fila_historial(serializer.instance)])
+        invalidar_catalogo(cliente_anterior, serializer.instance.cliente_id)
+
+    def perform_destroy(self, instance):
+        # Las bajas dejan una marca para el feed de cambios
+        eliminar_articulos(Articulo.objects.filter(pk=instance.pk))
+        invalidar_catalogo(instance.cliente_id)
+
+    # Precios del catalogo en una fecha: /api/v1/articulos/precios/?fecha=2024-01-31T12:00:00&cliente=1
+    @action(detail=False, methods=['get'], url_path='precios')
+    def precios(self, request, *args, **kwargs):
+        fecha = request.query_params.get('fecha')
+        momento = momento_consultado(fecha) if fecha else timezone.now()
+
+        cliente_id = request.query_params.get('cliente')
+        if cliente_id is not None and not cliente_id.isdigit():
+            raise ValidationError({'cliente': 'Debe ser un id de cliente.'})
+        cliente = cliente_asignado(request.user)
+        if cliente is not None:
+            cliente_id = cliente.pk
+
+        # Se pagina como el listado, sobre las filas del historial (cliente_id, id)
+        pagina = self.paginate_queryset(precios_vigentes(momento, cliente_id))
+        # SQLite no ajusta los decimales (devuelve "11" en lugar de "11.00"), se formatea aca
+        response = self.get_paginated_response([
+            {'id': pk, 'cliente': cliente, 'codigo': codigo, 'precio': f'{precio:.2f}'}
+            for _, cliente, pk, codigo, precio in pagina
+        ])
+        # Sin `fecha`, las paginas siguientes siguen mostrando el momento de la primera
+        if not fecha and response.data['next']:
+            response.data['next'] = replace_query_param(response.data['next'], 'fecha', momento.isoformat())
+        return response
+
+    # Cambios del catalogo para mantener una copia sincronizada: /api/v1/articulos/changes/?since=<token>.
+    # Sin `since` empieza desde el principio; cada respuesta trae el `since` del proximo pedido y `next`
+    # mientras queden cambios. Las bajas vienen con "eliminado": true
+    @action(detail=False, methods=['get'], url_path='changes')
+    def changes(self, request, *args, **kwargs):
+        cliente_id = request.query_params.get('cliente')
+        if cliente_id is not None and not cliente_id.isdigit():
+            raise ValidationError({'cliente': 'Debe ser un id de cliente.'})
+        cliente = cliente_asignado(request.user)
+        if cliente is not None:
+            cliente_id = cliente.pk
+
+        cambios, token, hay_mas = cambios_articulos(
+            request.query_params.get('since'), cliente_id, self.paginator.get_page_size(request),
+        )
+        return Response({
+            'results': cambios,
+            'since': token,
+            'next': replace_query_param(request.build_absolute_uri(), 'since', token) if hay_mas else None,
+        })
+
+    # Alta (POST), modificacion (PATCH) y baja (DELETE) de muchos articulos en un solo request.
+    # Todo el lote se valida de una vez y se guarda con bulk_create / bulk_update / un unico DELETE
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        if request.method == 'DELETE':
+            return self.bulk_destroy(request)
+
+        if request.method == 'PATCH':
+            ids = [item.get('id') for item in request.data if isinstance(item, dict)] if isinstance(request.data, list) else []
+            instancias = list(self.get_queryset().filter(pk__in=[pk for pk in ids if isinstance(pk, int)]))
+            clientes = {articulo.cliente_id for articulo in instancias}
+            serializer = ArticuloBulkSerializer(instancias, data=request.data, many=True, partial=True, context=self.get_serializer_context())
+        else:
+            clientes = set()
+            serializer = ArticuloBulkSerializer(data=request.data, many=True, context=self.get_serializer_context())
+
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            articulos = serializer.save()
+
+        invalidar_catalogo(*clientes, *{articulo.cliente_id for articulo in articulos})
+        return Response(serializer.data, status=st.HTTP_201_CREATED if request.method == 'POST' else st.HTTP_200_OK)
+
+    def bulk_destroy(self, request):
+        ids = request.data
+        if not isinstance(ids, list) or not ids or not all(isinstance(pk, int) for pk in ids):
+            return Response({"error": "Se esperaba una lista de ids de articulos"}, status=st.HTTP_400_BAD_REQUEST)
+
+        encontrados = dict(self.get_queryset().filter(pk__in=ids).values_list('id', 'cliente_id'))
+        no_encontrados = [pk for pk in ids if pk not in encontrados]
+        if no_encontrados:
+            return Response({"error": "No existen articulos con estos ids", "ids": no_encontrados}, status=st.HTTP_400_BAD_REQUEST)
+
+        eliminados = eliminar_articulos(Articulo.objects.filter(pk__in=encontrados))
+        invalidar_catalogo(*set(encontrados.values()))
+        return Response({"eliminados": eliminados}, status=st.HTTP_200_OK)
+
+# Estado de las importaciones encoladas con /api/v1/upload/?async=1
+class ImportacionViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Importacion.objects.all()
+    serializer_class = ImportacionSerializer
+
+    def get_queryset(self):
+        cliente = cliente_asignado(self.request.user)
+        if cliente is None:
+            return super().get_queryset()
+        return super().get_queryset().filter(cliente=cliente)
 
 
 class UploadExcelView(APIView):
     parser_classes = (MultiPartParser, FormParser)
 
+    def perform_authentication(self, request):
+        # El usuario se autentica recien al buscar el cliente (request.user es lazy): con ?spool=1 una base
+        # caida no debe cortar el request antes de guardar el archivo
+        pass
+
     def post(self, request, *args, **kwargs):
-        xlsx_file = request.FILES.get('file')
+        # Se pueden enviar varios archivos en el mismo campo `file`, se importan todas sus hojas
+        xlsx_files = request.FILES.getlist('file')
         
-        if not xlsx_file:
+        if not xlsx_files:
             return Response({'error': 'No file was submitted'}, status=st.HTTP_400_BAD_REQUEST)
 
         # Verificamos que sea un archivo XLSX. Acá faltaria validar que realmente sea un archivo XLSX para evitar brechas de seguridad
-        if not xlsx_file.name.endswith('.xlsx') and not xlsx_file.name.endswith('.xls'):
-            return Response({'error': f'File must be XLSX format: {xlsx_file.name}'}, status=st.HTTP_400_BAD_REQUEST)
+        for xlsx_file in xlsx_files:
+            if not xlsx_file.name.endswith('.xlsx') and not xlsx_file.name.endswith('.xls'):
+                return Response({'error': f'File must be XLSX format: {xlsx_file.name}'}, status=st.HTTP_400_BAD_REQUEST)
 
-        # Guardo el archivo de manera temporal adjuntando al nombre el timestamp
-        timestamp = int(time.time())
-        path = default_storage.save(f'tmp/{timestamp}_{xlsx_file.name}', ContentFile(xlsx_file.read()))
-        full_path = os.path.join(default_storage.location, path)
+        # Con ?async=1 el archivo se encola y lo procesa el worker (manage.py procesar_importaciones).
+        # El avance se consulta en /api/v1/imports/<id>/
+        asincrona = request.query_params.get('async') in ('1', 'true')
+        # Con ?spool=1 las filas validadas se guardan en el spool local (settings.SPOOL_DIR) y se responde sin
+        # esperar a la base, que puede estar caida o lenta. `manage.py drenar_spool` las escribe despues y el
+        # estado se consulta en /api/v1/spool/<lote>/
+        spool = not asincrona and request.query_params.get('spool') in ('1', 'true')
 
+        # El cliente del usuario del token; los requests anonimos usan el primer cliente
+        token = None
         try:
-            df = pd.read_excel(full_path)
-
-            # Eliminamos el archivo temporal
-            default_storage.delete(path)
-            procesados = 0
+            cliente = cliente_de(request)
+        except DatabaseError:
+            # Sin base el spool igual recibe la carga: guarda la clave del token y el drenador busca el cliente
+            # al aplicar el lote (un token invalido lo aparta). Una sesion no se puede leer sin la base
+            if not spool or settings.SESSION_COOKIE_NAME in request.COOKIES:
+                raise
+            cliente, token = None, clave_token(request)
+        else:
+            if not cliente:
+                return Response({"error": "No se encontró ningún cliente"}, status=st.HTTP_400_BAD_REQUEST)
 
-            # Obtenemos el primer cliente de la base de datos. Emulamos por ahora que es el primer cliente, 
-            # pero en un futuro se deberia obtener el cliente del usuario que subio el archivo a traves de un token JWT
-            cliente = Cliente.objects.all().first()
+        if asincrona:
+            if len(xlsx_files) > 1:
+                return Response({'error': 'Asynchronous imports accept a single file'}, status=st.HTTP_400_BAD_REQUEST)
+            importacion = encolar_importacion(cliente, xlsx_files[0])
+            return Response(ImportacionSerializer(importacion).data, status=st.HTTP_202_ACCEPTED)
 
-            for _, row in df.iterrows():
-                codigo = row['codigo']
-                descripcion = row['descripcion']
-                precio = row['precio']
+        try:
+            # Un unico XLSX de una hoja se lee fila a fila directamente desde el archivo subido. Con varias
+            # hojas o archivos cada hoja se decodifica en un proceso aparte y se escriben en orden
+            hojas = leer_archivos([(xlsx_file, xlsx_file.name) for xlsx_file in xlsx_files], settings.IMPORTACION_PROCESOS)
+            # El tiempo de lectura del Excel se informa aparte del de la base (Server-Timing y /api/v1/metrics/)
+            hojas = ((origen, cronometrar('parse', filas)) for origen, filas in cronometrar('parse', hojas))
 
-                # Actualizo o creo el registro en la base de datos
-                Articulo.objects.update_or_create(
-                    codigo=codigo,
-                    defaults={'descripcion': descripcion, 'precio': precio, 'cliente': cliente}
-                )
-                procesados += 1
+            # Insertamos o actualizamos en bloque dentro de una unica transaccion. Salvo con ?delta=0,
+            # las filas iguales a lo que ya esta grabado no se escriben
+            delta = request.query_params.get('delta') not in ('0', 'false')
+            if spool:
+                lote, procesados = escribir_lote(cliente, hojas, ', '.join(xlsx_file.name for xlsx_file in xlsx_files), delta, token)
+            else:
+                resultado = upsert_articulos(cliente, hojas, delta=delta)
 
+        except ArchivoInvalido as e:
+            # Se rechaza todo el archivo y se informan todos los errores juntos
+            return Response({
+                "error": "El archivo tiene filas invalidas",
+                "total_errores": e.total,
+                "errores": e.errores
+            }, status=st.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({"error": f"Error reading file: {str(e)}"}, status=st.HTTP_400_BAD_REQUEST)
 
+        if spool:
+            return Response({
+                "mensaje": "Archivo recibido, se aplicara en segundo plano",
+                "lote": lote,
+                "procesados": procesados,
+            }, status=st.HTTP_202_ACCEPTED)
+
         return Response({
             "mensaje": "Archivo procesado exitosamente",
-            "procesados": procesados
+            **resultado
         }, status=st.HTTP_200_OK)
     
-from django.http import HttpResponse
+# Carga por partes de archivos grandes, reanudable si se corta la conexion:
+#   POST /api/v1/uploads/ {"nombre": "catalogo.xlsx", "tamano": 104857600} -> id de la carga
+#   PUT  /api/v1/uploads/<id>/?offset=<bytes recibidos> con una parte del archivo como cuerpo (se repite)
+#   GET  /api/v1/uploads/<id>/ devuelve `recibidos`, desde donde seguir despues de un corte
+#   POST /api/v1/uploads/<id>/finalizar/ encola la importacion, el avance se consulta en /api/v1/imports/<id>/
+class CargaPorPartesView(APIView):
+    def post(self, request, *args, **kwargs):
+        nombre = request.data.get('nombre')
+        tamano = request.data.get('tamano')
+
+        if not isinstance(nombre, str) or not nombre.endswith(('.xlsx', '.xls')):
+            return Response({'error': 'File must be XLSX format'}, status=st.HTTP_400_BAD_REQUEST)
+        if not isinstance(tamano, int) or not 0 < tamano <= settings.CARGA_TAMANO_MAXIMO:
+            return Response(
+                {'error': f'El tamaño debe ser un entero entre 1 y {settings.CARGA_TAMANO_MAXIMO} bytes'},
+                status=st.HTTP_400_BAD_REQUEST,
+            )
+
+        # El cliente del usuario del token, igual que UploadExcelView
+        cliente = cliente_de(request)
+        if not cliente:
+            return Response({"error": "No se encontró ningún cliente"}, status=st.HTTP_400_BAD_REQUEST)
+
+        importacion = iniciar_carga(cliente, nombre, tamano)
+        return Response(ImportacionSerializer(importacion).data, status=st.HTTP_201_CREATED)
+
+class ParteCargaView(APIView):
+    def get(self, request, pk, *args, **kwargs):
+        importacion = get_object_or_404(cargas_de(cliente_asignado(request.user)), pk=pk)
+        return Response(ImportacionSerializer(importacion).data)
+
+    def put(self, request, pk, *args, **kwargs):
+        try:
+            offset = int(request.query_params.get('offset', ''))
+        except ValueError:
+            return Response({'error': 'Falta el parametro offset'}, status=st.HTTP_400_BAD_REQUEST)
+
+        # El cuerpo no pasa por los parsers de DRF: se copia del stream al archivo por bloques
+        try:
+            importacion = agregar_parte(pk, offset, request.stream or io.BytesIO(), cliente_asignado(request.user))
+        except Importacion.DoesNotExist:
+            return Response({'error': 'No existe una carga en curso con este id'}, status=st.HTTP_404_NOT_FOUND)
+        except CargaDesfasada as e:
+            return Response({'error': str(e), 'recibidos': e.recibidos}, status=st.HTTP_409_CONFLICT)
+        except CargaInvalida as e:
+            return Response({'error': str(e)}, status=st.HTTP_400_BAD_REQUEST)
+
+        return Response(ImportacionSerializer(importacion).data)
+
+class FinalizarCargaView(APIView):
+    def post(self, request, pk, *args, **kwargs):
+        try:
+            importacion = finalizar_carga(pk, cliente_asignado(request.user))
+        except Importacion.DoesNotExist:
+            return Response({'error': 'No existe una carga con este id'}, status=st.HTTP_404_NOT_FOUND)
+        except CargaDesfasada as e:
+            return Response({'error': 'La carga esta incompleta', 'recibidos': e.recibidos}, status=st.HTTP_409_CONFLICT)
+        except CargaInvalida as e:
+            return Response({'error': str(e)}, status=st.HTTP_400_BAD_REQUEST)
+
+        return Response(ImportacionSerializer(importacion).data, status=st.HTTP_202_ACCEPTED)
+
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
 
 class DownloadExcelView(APIView):
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= elige el formato del archivo exportado, no el renderer de DRF
+        return super().perform_content_negotiation(request, force=True)
+
     def get(self, request, *args, **kwargs):
+        # El cliente del usuario del token, igual que UploadExcelView
+        cliente = cliente_de(request)
+        if not cliente:
+            return Response({"error": "No se encontró ningún cliente"}, status=st.HTTP_400_BAD_REQUEST)
+
         try:
-            # Obtenemos el primer cliente de la base de datos. Emulamos por ahora que es el primer cliente,
-            # pero en un futuro se deberia obtener el cliente del usuario que subio el archivo a traves de un token JWT
-            cliente = Cliente.objects.all().first()
-            if not cliente:
-                return Response({"error": "No se encontró ningún cliente"}, status=st.HTTP_400_BAD_REQUEST)
-            
-            articulos = Articulo.objects.filter(cliente=cliente)
-            
-            if not articulos:
-                return Response({"error": "No se encontraron artículos para el cliente"}, status=st.HTTP_400_BAD_REQUEST)
-            
-            df = pd.DataFrame(list(articulos.values()))
-            filename = f"articulos_{cliente.nombre}.xlsx"
-            
-            # Create a BytesIO buffer to hold the Excel file
-            excel_buffer = io.BytesIO()
-            writer = pd.ExcelWriter(excel_buffer, engine='xlsxwriter')
-            df.to_excel(writer, index=False, sheet_name='Articulos')
-            writer.close()  # Use writer.close() instead of writer.save()
-            excel_buffer.seek(0)
-            
-            response = HttpResponse(excel_buffer.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+            formato = request.query_params.get('format', 'xlsx')
+            if formato not in EXPORTADORES:
+                return Response({"error": f"Formato no soportado: {formato}"}, status=st.HTTP_400_BAD_REQUEST)
+
+            # Mientras no cambie la version del catalogo el archivo es el mismo: se responde 304 a quien
+            # ya lo tiene y el resto lo recibe desde la cache
+            clave = clave_respuesta('descarga', cliente.pk, version_catalogo(cliente.pk), request)
+            valor_etag = etag(clave)
+            if etag_coincide(request, valor_etag):
+                return HttpResponseNotModified(headers={'ETag': valor_etag})
+
+            exportar, content_type = EXPORTADORES[formato]
+            contenido = cache.get(clave)
+            if contenido is not None:
+                response = HttpResponse(contenido, content_type=content_type)
+            else:
+                articulos = Articulo.objects.filter(cliente=cliente).order_by('id')
+                
+                if not articulos.exists():
+                    return Response({"error": "No se encontraron artículos para el cliente"}, status=st.HTTP_400_BAD_REQUEST)
+                
+                # El archivo se genera a medida que se envia, leyendo los articulos por chunks
+                response = StreamingHttpResponse(cachear_contenido(cronometrar('render', exportar(articulos)), clave), content_type=content_type)
+
+            filename = f"articulos_{cliente.nombre}.{formato}"
             response['Content-Disposition'] = f'attachment; filename="{filename}"'
+            response['ETag'] = valor_etag
             response.status_code = st.HTTP_200_OK
             
             return response        
         except Exception as e:
             return Response({"error": f"{str(e)}"}, status=st.HTTP_400_BAD_REQUEST)
+
+
+# Estado de un lote encolado con /api/v1/upload/?spool=1: pendiente, aplicado (con el resultado) o error
+class LoteSpoolView(APIView):
+    def get(self, request, lote, *args, **kwargs):
+        estado = estado_lote(lote, cliente_asignado(request.user))
+        if estado is None:
+            return Response({'error': 'No existe un lote con este id'}, status=st.HTTP_404_NOT_FOUND)
+        estado, resultado = estado
+        return Response({'lote': lote, 'estado': estado, **(resultado or {})})
+
+
+class MetricasView(APIView):
+    """
+    Metricas de los requests atendidos por este proceso, en formato de texto de Prometheus.
+    """
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(registro.exportar(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,11 +41,14 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
+    'rest_framework.authtoken',
     'corsheaders',
     'api.apps.ApiConfig',
 ]
 
 MIDDLEWARE = [
+    # Primero, para que el tiempo medido incluya al resto de los middlewares
+    'api.middleware.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -79,21 +83,85 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
-    # 'default': {
-    #     'ENGINE': 'django.db.backends.sqlite3',
-    #     'NAME': BASE_DIR / 'db.sqlite3',
-    # }
+# La conexion se configura con las variables DB_* (las define docker-compose.yml). Sin ellas se usan los
+# valores del contenedor `db`. DB_ENGINE=sqlite sirve para correr sin MySQL (DB_NAME es la ruta del archivo)
+DB_ENGINE = os.environ.get('DB_ENGINE', 'mysql')
+
+if DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            'NAME': os.environ.get('DB_NAME', 'ait_db'),
+            'USER': os.environ.get('DB_USER', 'ait_user'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', 'ait_password'),
+            'HOST': os.environ.get('DB_HOST', 'db'),
+            'PORT': os.environ.get('DB_PORT', '3306'),
+            # Conexiones persistentes: con DB_CONN_MAX_AGE > 0 cada hilo reutiliza su conexion durante esos
+            # segundos en lugar de abrir una (TCP + autenticacion) por request. Antes de reutilizarla se
+            # verifica que siga viva, por si MySQL la cerro (wait_timeout) o se reinicio.
+            # Django 5.1 no tiene pool de conexiones para MySQL (solo para PostgreSQL), asi que solo sirven
+            # con hilos fijos. Por defecto es 0: bajo ASGI (uvicorn) cada request corre en un hilo nuevo y
+            # una conexion persistente no se reutiliza, queda abierta hasta vencer, y runserver tambien abre
+            # un hilo por request. app/wsgi.py la activa (60 segundos) para los servidores WSGI con hilos
+            # fijos (gunicorn, mod_wsgi).
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+            'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') not in ('0', 'false'),
+        }
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Se usa un backend en archivos para que las invalidaciones que hace el worker de importaciones
+# (otro proceso) lleguen tambien a los procesos web. Ver api/cache.py
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'ait_db',
-        'USER': 'ait_user',
-        'PASSWORD': 'ait_password',
-        'HOST': 'db',
-        'PORT': '3306',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', BASE_DIR / '.cache'),
     }
 }
 
+# Segundos que se mantiene en cache una respuesta del catalogo (las escrituras la invalidan antes)
+CATALOGO_CACHE_TIMEOUT = 60 * 60
+
+# Las descargas mas grandes que esto se generan en cada pedido en lugar de guardarse en cache
+CATALOGO_CACHE_MAX_BYTES = 20 * 1024 * 1024
+
+
+# Procesos que leen en paralelo las hojas de una carga con varios archivos u hojas (None: uno por CPU)
+IMPORTACION_PROCESOS = None
+
+# Cada cuantos segundos publica un latido el worker que procesa una importacion, y despues de cuantos sin
+# latido se la da por caida: vuelve a la cola hasta IMPORTACION_REINTENTOS veces y despues queda con error.
+# El latido se guarda en el cache, que tiene que ser compartido por todos los workers
+IMPORTACION_LATIDO = 30
+IMPORTACION_VENCIMIENTO = 5 * 60
+IMPORTACION_REINTENTOS = 2
+
+
+# Directorio del spool de importaciones (/api/v1/upload/?spool=1), lo vacia `manage.py drenar_spool`
+SPOOL_DIR = os.environ.get('SPOOL_DIR', BASE_DIR / 'tmp' / 'spool')
+
+
+# Tamaño maximo de un archivo subido por partes (/api/v1/uploads/)
+CARGA_TAMANO_MAXIMO = 1024 * 1024 * 1024
+
+
+# Hilos que arman los archivos de las descargas async (/api/v1/async/download/)
+EXPORTACION_HILOS = 4
+
+
+# Segundos que cada proceso guarda en memoria el cliente de un usuario (api.clientes)
+CLIENTE_CACHE_TTL = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -136,6 +204,20 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+REST_FRAMEWORK = {
+    # Los clientes de la API se identifican con `Authorization: Token <key>` (ver api.clientes); la sesion
+    # queda para el admin y el browsable API
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.TokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    # JSON con orjson; el browsable API sigue disponible desde el navegador
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.OrjsonRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:3000',
 ]
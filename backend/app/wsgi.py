@@ -12,5 +12,8 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+# Los servidores WSGI reutilizan sus hilos entre requests: ahi las conexiones persistentes ahorran abrir una
+# por request (ver DATABASES en settings). Bajo ASGI quedan en 0
+os.environ.setdefault('DB_CONN_MAX_AGE', '60')
 
 application = get_wsgi_application()
@@ -11,15 +11,25 @@ import AddProductBulkModal from './components/AddProductBulkModal';
 import AddProductModal from './components/AddProductModal';
 import React from 'react';
 import DownloadButton from './components/DownloadProductsList';
+import { formatearPrecio } from './formato';
 
 export type Articulo = {
     id: number;
     codigo: string;
     descripcion: string;
     cliente: number;
-    precio: number;
+    // Texto decimal exacto, como lo devuelve la API ("10.50")
+    precio: string;
 }
 
+type PaginaArticulos = {
+    next: string | null;
+    results: Articulo[];
+}
+
+// Articulos por pedido a la API: la grilla pide la pagina siguiente recien cuando se llega al final de lo cargado
+const PRIMERA_PAGINA = 'http://localhost:8000/api/v1/articulos/?page_size=100';
+
 function App() {
     const [isLoggedIn, setIsLoggedIn] = useState(false);
     const [showEditModal, setShowEditModal] = useState(false);
@@ -29,18 +39,34 @@ function App() {
     const [selectedProductToEdit, setSelectedProductToEdit] = useState<Articulo | null>(null);
     const [selectedProductToDelete, setSelectedProductToDelete] = useState<Articulo | null>(null);
     const [datos, setDatos] = useState<Articulo[]>([]);
+    const [siguiente, setSiguiente] = useState<string | null>(null);
     const [clienteId, setClienteId] = useState(0);
 
     useEffect(() => {
         fetchProducts()
     }, [clienteId, isLoggedIn]);
 
+    // El listado viene por paginas: se agrega una a lo ya cargado y se guarda `next` para la proxima
+    const cargarPagina = async (url: string, anteriores: Articulo[]) => {
+        try {
+            const response = await fetch(url);
+            const pagina: PaginaArticulos = await response.json();
+            setDatos([...anteriores, ...pagina.results]);
+            setSiguiente(pagina.next);
+        } catch (error) {
+            console.error('Error fetching articulos:', error);
+        }
+    };
+
     const fetchProducts = () => {
         if (isLoggedIn) {
-            fetch('http://localhost:8000/api/v1/articulos')
-                .then(response => response.json())
-                .then(data => setDatos(data))
-                .catch(error => console.error('Error fetching articulos:', error));
+            cargarPagina(PRIMERA_PAGINA, []);
+        }
+    };
+
+    const cargarMas = () => {
+        if (siguiente) {
+            cargarPagina(siguiente, datos);
         }
     };
 
@@ -76,7 +102,7 @@ function App() {
         }),
         columnHelper.accessor('precio', {
             header: 'Precio',
-            cell: info => info.getValue().toFixed(2),
+            cell: info => formatearPrecio(info.getValue()),
         }),
         columnHelper.accessor('id', {
             id: 'action',
@@ -171,7 +197,7 @@ function App() {
                 </div>
                 {isLoggedIn && showAddModal && clienteId > 0 && <AddProductModal show={showAddModal} onHide={onHideAddModal} onConfirm={onConfirmAddModal} cliente_id={clienteId} onError={onError} />}
                 {isLoggedIn && showAddBulkModal && clienteId > 0 && <AddProductBulkModal show={showAddBulkModal} onHide={onHideAddBulkModal} onConfirm={onConfirmAddBulkModal} onError={onError} />}
-                {isLoggedIn && datos.length > 0 && <ProductsTable data={datos} columns={columns} />}
+                {isLoggedIn && datos.length > 0 && <ProductsTable data={datos} columns={columns} hayMas={siguiente !== null} onCargarMas={cargarMas} />}
 
             </div>
         </>
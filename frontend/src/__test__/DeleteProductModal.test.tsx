@@ -14,7 +14,7 @@ describe("DeleteProductModal", () => {
         cliente: 100,
         codigo: "COD-PRUEBA",
         descripcion: "Descripcion del Producto de Prueba",
-        precio: 100.01,
+        precio: '100.01',
     };
 
     afterAll(() => {
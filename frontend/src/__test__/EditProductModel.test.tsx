@@ -13,7 +13,7 @@ describe('EditProductModal', () => {
         cliente: 100,
         codigo: 'ABC123',
         descripcion: 'Producto de prueba',
-        precio: 10.99,
+        precio: '10.99',
     };
 
     beforeEach(() => {
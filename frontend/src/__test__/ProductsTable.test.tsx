@@ -93,3 +93,21 @@ describe('ProductsTable', () => {
         expect(botonSiguiente).toBeDisabled();
     });
 });
+
+describe('ProductsTable con paginas del servidor', () => {
+    it('Pide la pagina siguiente solo al pasar la ultima pagina cargada', () => {
+        const onCargarMas = jest.fn();
+        const { rerender } = render(<ProductsTable data={datos.slice(0, 10)} columns={columnas} hayMas={true} onCargarMas={onCargarMas} />);
+        expect(screen.getByText('Mostrando 10 de 10+ Articulo(s)')).toBeInTheDocument();
+        expect(onCargarMas).not.toHaveBeenCalled();
+
+        fireEvent.click(screen.getByText('>'));
+        expect(onCargarMas).toHaveBeenCalledTimes(1);
+        // Mientras llega la pagina no se vuelve a pedir
+        expect(screen.getByText('>')).toBeDisabled();
+
+        rerender(<ProductsTable data={datos} columns={columnas} hayMas={false} onCargarMas={onCargarMas} />);
+        expect(screen.getByText('Producto 11')).toBeInTheDocument();
+        expect(screen.getByText('>')).toBeDisabled();
+    });
+});
@@ -0,0 +1,16 @@
+import { formatearPrecio } from '../formato';
+
+describe('formatearPrecio', () => {
+    it('Muestra los precios de texto que devuelve la API', () => {
+        expect(formatearPrecio('1.00')).toBe('1.00');
+        expect(formatearPrecio('1234.5')).toBe('1234.50');
+    });
+
+    it('Muestra los precios numericos con dos decimales', () => {
+        expect(formatearPrecio(10)).toBe('10.00');
+    });
+
+    it('Deja sin cambios un valor que no es un numero', () => {
+        expect(formatearPrecio('abc')).toBe('abc');
+    });
+});
@@ -27,7 +27,7 @@ const DeleteProductModal: React.FC<ModalProps> = ({ show, onHide, onConfirm, onE
             setValue('cliente', productData.cliente);
             setValue('codigo', productData.codigo);
             setValue('descripcion', productData.descripcion);
-            setValue('precio', productData.precio);
+            setValue('precio', Number(productData.precio));
         }
     }, [productData, setValue]);
 
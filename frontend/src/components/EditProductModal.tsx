@@ -34,13 +34,13 @@ const EditProductModal: React.FC<ModalProps> = ({ show, onHide, onConfirm, produ
                 cliente: productData.cliente,
                 codigo: productData.codigo,
                 descripcion: productData.descripcion,
-                precio: productData.precio,
+                precio: Number(productData.precio),
             });
             setValue('id', productData.id);
             setValue('cliente', productData.cliente);
             setValue('codigo', productData.codigo);
             setValue('descripcion', productData.descripcion);
-            setValue('precio', productData.precio);
+            setValue('precio', Number(productData.precio));
         }
     }, [productData, setValue]);
 
@@ -7,19 +7,24 @@ import {
   getPaginationRowModel,
 } from '@tanstack/react-table';
 import React from 'react';
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
 
 interface TableProps<T extends object> {
   data: T[];
   columns: ColumnDef<T, any>[];
+  // Quedan filas en el servidor: al pasar la ultima pagina cargada se piden con `onCargarMas`
+  hayMas?: boolean;
+  onCargarMas?: () => void;
 }
 
-function ProductsTable<T extends object>({ data, columns }: TableProps<T>) {
+function ProductsTable<T extends object>({ data, columns, hayMas = false, onCargarMas }: TableProps<T>) {
 
   const [pagination, setPagination] = useState<PaginationState>({
     pageIndex: 0,
     pageSize: 10,
   });
+  // Se pidio la pagina siguiente al servidor y se avanza cuando llegan las filas
+  const [cargando, setCargando] = useState(false);
 
   const table = useReactTable({
     data,
@@ -31,12 +36,36 @@ function ProductsTable<T extends object>({ data, columns }: TableProps<T>) {
       maxSize: 500,
     },
     getPaginationRowModel: getPaginationRowModel(),
+    // Las filas que llegan se agregan al final: no se vuelve a la primera pagina
+    autoResetPageIndex: false,
     onPaginationChange: setPagination,
     state: {
       pagination,
     }
   });
 
+  useEffect(() => {
+    const ultima = Math.max(table.getPageCount() - 1, 0);
+    if (cargando) {
+      setCargando(false);
+      if (pagination.pageIndex < ultima) {
+        table.nextPage();
+      }
+    } else if (pagination.pageIndex > ultima) {
+      // Se recargo el listado con menos filas
+      table.setPageIndex(ultima);
+    }
+  }, [data]);
+
+  const siguiente = () => {
+    if (table.getCanNextPage()) {
+      table.nextPage();
+    } else if (hayMas && onCargarMas && !cargando) {
+      setCargando(true);
+      onCargarMas();
+    }
+  };
+
   return (
     <div className="flex flex-col min-w-full">
       <table className="divide-y divide-gray-200">
@@ -78,7 +107,7 @@ function ProductsTable<T extends object>({ data, columns }: TableProps<T>) {
       <div className='mt-2 flex justify-between'>
         <div>
           Mostrando {table.getRowModel().rows.length.toLocaleString()} de{' '}
-          {table.getRowCount().toLocaleString()} Articulo(s)
+          {table.getRowCount().toLocaleString()}{hayMas ? '+' : ''} Articulo(s)
         </div>
         <div className='flex items-center'>
           <button
@@ -100,14 +129,14 @@ function ProductsTable<T extends object>({ data, columns }: TableProps<T>) {
           <span className='mx-2'>
             Página{' '}
             <strong>
-              {table.getState().pagination.pageIndex + 1} de {table.getPageCount()}
+              {table.getState().pagination.pageIndex + 1} de {table.getPageCount()}{hayMas ? '+' : ''}
             </strong>
           </span>
           <button
             type='button'
             className='px-2 py-1 bg-gray-200 rounded mx-1'
-            onClick={() => table.nextPage()}
-            disabled={!table.getCanNextPage()}
+            onClick={siguiente}
+            disabled={!table.getCanNextPage() && (!hayMas || cargando)}
           >
             {'>'}
           </button>
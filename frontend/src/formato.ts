@@ -0,0 +1,6 @@
+// La API devuelve los precios como texto decimal exacto ("10.50"); los archivos leidos en el navegador
+// traen numeros. Ambos se muestran con dos decimales
+export const formatearPrecio = (precio: string | number): string => {
+    const valor = Number(precio);
+    return Number.isFinite(valor) ? valor.toFixed(2) : String(precio);
+};